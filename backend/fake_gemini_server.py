@@ -0,0 +1,253 @@
+"""
+Fake Gemini server for load and failure testing without an API key
+Answers generateContent over REST like Gemini does: query validation,
+itineraries and chat replies, after a configurable latency (plus, with
+output_tokens_per_second, time to "generate" each reply). Full itinerary
+updates come back with as many days as the prompt says the trip has, and
+targeted ones with just the days asked for. It can also
+behave like an overloaded upstream - a requests-per-second quota answered
+with 429s, a share of 503s - and be reconfigured while running:
+    python fake_gemini_server.py [port] [latency seconds]
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8001 uvicorn main:app
+
+    POST /_control {"latency": 2, "error_rate": 0.5, "rate_limit": 5}
+    GET  /_stats
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULTS = {
+    "latency": 1.0,  # seconds per call
+    "jitter": 0.2,  # +- fraction of latency
+    "rate_limit": 0,  # calls per second before 429s, 0 = unlimited
+    "error_rate": 0.0,  # share of calls answered with a 503
+    "output_tokens_per_second": 0,  # generation speed, 0 = replies take no time
+}
+
+def make_day(day: int) -> dict:
+    return {
+        "day": day,
+        "date": f"2026-11-{day:02d}",
+        "theme": "Explore",
+        "activities": [
+            {
+                "time": "09:00",
+                "activity": "Visit Ward's Lake",
+                "location": "Ward's Lake",
+                "duration": "2 hours",
+                "cost": 100,
+                "description": "Boating and a walk",
+                "coordinates": {"lat": 25.5788, "lng": 91.8933},
+            },
+            {
+                "time": "12:00",
+                "activity": "Lunch at Police Bazaar",
+                "location": "Police Bazaar",
+                "duration": "1 hour",
+                "cost": 600,
+                "description": "Local Khasi food",
+                "coordinates": {"lat": 25.5745, "lng": 91.8827},
+            },
+        ],
+    }
+
+
+def make_itinerary(days: int) -> dict:
+    return {
+        "message": "Here is your itinerary",
+        "itinerary": {
+            "destination": "Shillong",
+            "duration": f"{days} days",
+            "total_estimated_cost": 700 * days,
+            "currency": "INR",
+            "days": [make_day(day) for day in range(1, days + 1)],
+        },
+    }
+
+
+ITINERARY = make_itinerary(2)
+
+
+class FakeGemini:
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULTS, **settings)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_calls = 0
+        self.stats = {
+            "calls": 0,
+            "ok": 0,
+            "throttled": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def admit(self) -> int:
+        """HTTP status to answer this call with"""
+        with self.lock:
+            self.stats["calls"] += 1
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_calls = now, 0
+            self.window_calls += 1
+            limit = self.settings["rate_limit"]
+            if limit and self.window_calls > limit:
+                self.stats["throttled"] += 1
+                return 429
+            if random.random() < self.settings["error_rate"]:
+                self.stats["errors"] += 1
+                return 503
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(
+                self.stats["max_in_flight"], self.stats["in_flight"]
+            )
+            return 200
+
+    def finish(self, prompt_tokens: int, output_tokens: int):
+        with self.lock:
+            self.stats["in_flight"] -= 1
+            self.stats["ok"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["output_tokens"] += output_tokens
+
+    def latency(self, output_tokens: int = 0) -> float:
+        latency = self.settings["latency"]
+        jitter = self.settings["jitter"]
+        speed = self.settings["output_tokens_per_second"]
+        if speed:
+            latency += output_tokens / speed
+        return max(latency * random.uniform(1 - jitter, 1 + jitter), 0)
+
+
+def reply_for(prompt: str) -> str:
+    if "query validator" in prompt:
+        return json.dumps({"is_valid": True, "reason": "Travel related"})
+    if "Create a detailed travel itinerary" in prompt:
+        return json.dumps(ITINERARY, ensure_ascii=False)
+    if "COMPLETE updated itinerary" in prompt:
+        days = re.search(r"- Days: (\d+)", prompt)
+        return json.dumps(
+            make_itinerary(int(days.group(1)) if days else 2), ensure_ascii=False
+        )
+    targeted = re.search(r"change ONLY day\(s\) \[([\d, ]*)\]", prompt)
+    if targeted:
+        days = [int(day) for day in re.findall(r"\d+", targeted.group(1))]
+        return json.dumps(
+            {"message": "Updated", "days": [make_day(day) for day in days]},
+            ensure_ascii=False,
+        )
+    return json.dumps({"message": "Happy to help with your trip!"})
+
+
+def make_handler(fake: FakeGemini):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up waiting
+
+        def do_GET(self):
+            if self.path.startswith("/_stats"):
+                with fake.lock:
+                    self.send_json(200, dict(fake.stats, **fake.settings))
+            else:
+                self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path.startswith("/_control"):
+                with fake.lock:
+                    fake.settings.update(body)
+                self.send_json(200, fake.settings)
+                return
+
+            status = fake.admit()
+            if status == 429:
+                self.send_json(
+                    429,
+                    {
+                        "error": {
+                            "code": 429,
+                            "message": "Resource has been exhausted (e.g. check quota).",
+                            "status": "RESOURCE_EXHAUSTED",
+                        }
+                    },
+                )
+                return
+            if status == 503:
+                time.sleep(fake.latency() / 4)
+                self.send_json(
+                    503,
+                    {
+                        "error": {
+                            "code": 503,
+                            "message": "The model is overloaded. Please try again later.",
+                            "status": "UNAVAILABLE",
+                        }
+                    },
+                )
+                return
+
+            prompt = " ".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            text = reply_for(prompt)
+            time.sleep(fake.latency(len(text) // 4))
+            fake.finish(len(prompt) // 4, len(text) // 4)
+            self.send_json(
+                200,
+                {
+                    "candidates": [
+                        {
+                            "content": {"parts": [{"text": text}], "role": "model"},
+                            "finishReason": "STOP",
+                        }
+                    ],
+                    "usageMetadata": {
+                        "promptTokenCount": len(prompt) // 4,
+                        "candidatesTokenCount": len(text) // 4,
+                    },
+                },
+            )
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve_fake_gemini(port: int = 0, **settings):
+    """Start the fake server in a thread; returns (server, fake, base_url)"""
+    fake = FakeGemini(**settings)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULTS["latency"]
+    server, fake, base_url = serve_fake_gemini(port, latency=latency)
+    print(f"Fake Gemini at {base_url} ({latency}s per call)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
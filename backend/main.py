@@ -3,6 +3,7 @@ Vandreren Travel API - Main Application
 Modular FastAPI backend for AI-powered travel planning with group collaboration
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,8 +12,37 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 
 # Import database and models to ensure tables are created
-from models.database import Base, engine
-from models import user, conversation, itinerary, group, progress, notification
+from models.database import (
+    Base,
+    engine,
+    add_missing_columns,
+    add_missing_indexes,
+    convert_compressed_columns,
+)
+from models import (
+    user,
+    conversation,
+    itinerary,
+    group,
+    progress,
+    notification,
+    review,
+    destination,
+    llm_job,
+)
+
+from utils.http_cache import CompressionMiddleware
+from utils.auth import (
+    calibrate_bcrypt_rounds,
+    get_password_hash_stats,
+    password_executor,
+)
+from services.notification_hub import notification_hub
+from services.collaboration_service import collaboration_hub
+from services.review_ingestion import run_review_ingestion
+from services.llm_jobs import llm_client
+from services.embedding_service import get_embedding_service
+from utils.config import REVIEW_INGESTION_ENABLED, REVIEW_INGEST_INTERVAL_MINUTES
 
 # Import routers
 from routes import (
@@ -26,6 +56,9 @@ from routes import (
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+add_missing_indexes(engine)
+convert_compressed_columns(engine)
 
 # Background scheduler for self-ping
 scheduler = BackgroundScheduler()
@@ -35,6 +68,12 @@ scheduler = BackgroundScheduler()
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
     # Startup
+    calibrate_bcrypt_rounds()
+    notification_hub.start(asyncio.get_running_loop())
+    collaboration_hub.start(asyncio.get_running_loop())
+    # Gemini calls run in worker processes, off this event loop
+    llm_client.start()
+
     scheduler.add_job(
         lambda: httpx.get("http://localhost:8000/ping", timeout=10.0),
         "interval",
@@ -42,6 +81,16 @@ async def lifespan(app: FastAPI):
         id="self_ping",
         replace_existing=True,
     )
+    if REVIEW_INGESTION_ENABLED:
+        # Crawls and embeds reviews off the request path; first run right away
+        scheduler.add_job(
+            run_review_ingestion,
+            "interval",
+            minutes=REVIEW_INGEST_INTERVAL_MINUTES,
+            id="review_ingestion",
+            next_run_time=datetime.now(),
+            replace_existing=True,
+        )
     scheduler.start()
     print(f"[{datetime.now()}] Self-ping scheduler started - pinging every 10 minutes")
 
@@ -49,6 +98,10 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     scheduler.shutdown()
+    password_executor.shutdown(wait=False)
+    llm_client.stop()
+    notification_hub.stop()
+    collaboration_hub.stop()
     print(f"[{datetime.now()}] Self-ping scheduler stopped")
 
 
@@ -77,6 +130,9 @@ app.add_middleware(
     max_age=3600,
 )
 
+# gzip/brotli for large JSON responses (itineraries); SSE streams pass through
+app.add_middleware(CompressionMiddleware)
+
 # Register routers with appropriate prefixes and tags
 # Note: Using empty prefixes to maintain backward compatibility with old API paths
 app.include_router(auth_router, prefix="", tags=["Authentication"])
@@ -111,6 +167,34 @@ async def ping():
     }
 
 
+@app.get("/metrics/password-hashing", tags=["Health"])
+async def password_hashing_metrics():
+    """Queue depth and timings of the bcrypt thread pool"""
+    return get_password_hash_stats()
+
+
+@app.get("/metrics/llm-jobs", tags=["Health"])
+async def llm_job_metrics():
+    """Queue depth and timings of the LLM worker pool"""
+    return llm_client.get_stats()
+
+
+@app.get("/metrics/embeddings", tags=["Health"])
+async def embedding_metrics():
+    """Batch sizes, throughput and queue wait of the embedding service"""
+    return get_embedding_service().metrics()
+
+
+@app.get("/metrics/streams", tags=["Health"])
+async def stream_metrics():
+    """Open Server-Sent Events streams on this worker"""
+    return {
+        "notification_streams": notification_hub.connection_count(),
+        "itinerary_streams": collaboration_hub.connection_count(),
+        "fanout": "postgres" if notification_hub.use_postgres else "local",
+    }
+
+
 @app.options("/{path:path}", tags=["CORS"])
 async def options_handler(path: str):
     """Handle preflight OPTIONS requests for CORS"""
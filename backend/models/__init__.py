@@ -1,9 +1,9 @@
 from .database import Base, engine, SessionLocal, get_db
 from .user import User
 from .conversation import Conversation, Message
-from .itinerary import Itinerary
+from .itinerary import Itinerary, ItineraryDay, ItineraryActivity, ItineraryRevision
 from .group import TravelGroup, GroupMember
-from .progress import ActivityProgress
+from .progress import ActivityProgress, ProgressSummary
 from .notification import Notification
 
 __all__ = [
@@ -15,8 +15,12 @@ __all__ = [
     "Conversation",
     "Message",
     "Itinerary",
+    "ItineraryDay",
+    "ItineraryActivity",
+    "ItineraryRevision",
     "TravelGroup",
     "GroupMember",
     "ActivityProgress",
+    "ProgressSummary",
     "Notification",
 ]
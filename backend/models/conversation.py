@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime
 from datetime import datetime
-from .database import Base
+from .database import Base, CompressedText
 
 
 class Conversation(Base):
@@ -18,6 +18,11 @@ class Message(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, index=True)
-    content = Column(Text)
+    content = Column(CompressedText)
     role = Column(String)  # "user" or "assistant"
+    # Assistant messages that produced the current version of an itinerary
+    # point at it instead of holding a second copy (content is None). When
+    # that version is superseded the document is moved back into content.
+    itinerary_id = Column(Integer, index=True, nullable=True)
+    itinerary_version = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.types import TypeDecorator
 from utils.config import DATABASE_URL
+from utils.compression import compress_text, decompress_text
 
 # Database setup with connection pooling for PostgreSQL
 # For SQLite, connect_args with check_same_thread is used
@@ -22,9 +24,154 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+class CompressedText(TypeDecorator):
+    """Text column stored zstd-compressed; reads and writes plain str"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def add_missing_columns(bind=engine):
+    """
+    Add columns that exist on the models but not in the database yet.
+    create_all() only creates missing tables, so new nullable columns on
+    existing tables (e.g. itinerary counters) are added here with ALTER TABLE.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(
+                    text(
+                        f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                    )
+                )
+                print(f"Added missing column {table.name}.{column.name}")
+
+
+# Completed counts recomputed after duplicate progress rows are removed
+RECOUNT_PROGRESS_SUMMARIES = """
+UPDATE progress_summaries SET completed_activities = (
+    SELECT COALESCE(SUM(completed), 0) FROM activity_progress p
+    WHERE p.itinerary_id = progress_summaries.itinerary_id
+    AND p.user_id = progress_summaries.user_id
+)
+"""
+
+
+def drop_duplicate_rows(conn, table, columns) -> int:
+    """
+    Delete all but one row per value of columns, keeping the most recently
+    updated (or, without updated_at, the newest) row. Rows with a NULL in
+    columns are left alone - a unique index doesn't compare them.
+    """
+    keys = ", ".join(f'"{c}"' for c in columns)
+    order = '"id" DESC'
+    if "updated_at" in table.c:
+        # Postgres sorts NULLs first in DESC order, SQLite last
+        order = f'"updated_at" IS NULL, "updated_at" DESC, {order}'
+    not_null = " AND ".join(f'"{c}" IS NOT NULL' for c in columns)
+    result = conn.execute(
+        text(
+            f"DELETE FROM {table.name} WHERE id IN ("
+            f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+            f"(PARTITION BY {keys} ORDER BY {order}) AS position "
+            f"FROM {table.name} WHERE {not_null}) ranked "
+            f"WHERE position > 1)"
+        )
+    )
+    return result.rowcount
+
+
+def add_missing_indexes(bind=engine):
+    """
+    Create named indexes declared on existing tables (create_all() skips them).
+    Duplicate legacy rows are removed before a unique index is created; if it
+    still can't be created, startup fails rather than leaving the upserts that
+    rely on it to fail on every request.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            with bind.begin() as conn:
+                if index.unique:
+                    columns = [c.name for c in index.columns]
+                    removed = drop_duplicate_rows(conn, table, columns)
+                    if removed:
+                        print(f"Removed {removed} duplicate rows from {table.name}")
+                        if table.name == "activity_progress":
+                            # Completed counts may include the deleted rows
+                            conn.execute(text(RECOUNT_PROGRESS_SUMMARIES))
+                try:
+                    index.create(conn)
+                except Exception as e:
+                    raise RuntimeError(
+                        f"Could not create index {index.name} on {table.name}: {e}"
+                    ) from e
+            print(f"Added missing index {index.name} on {table.name}")
+
+
+def convert_compressed_columns(bind=engine):
+    """
+    Switch TEXT columns that are now CompressedText to BYTEA on PostgreSQL.
+    SQLite stores either type in any column, so only Postgres needs this;
+    existing values are kept as UTF-8 bytes and read back unchanged.
+    """
+    if bind.dialect.name != "postgresql":
+        return
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            column_types = {
+                c["name"]: str(c["type"]).upper()
+                for c in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if not isinstance(column.type, CompressedText):
+                    continue
+                if column_types.get(column.name) not in ("TEXT", "VARCHAR"):
+                    continue
+                conn.execute(
+                    text(
+                        f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" '
+                        f"TYPE BYTEA USING convert_to(\"{column.name}\", 'UTF8')"
+                    )
+                )
+                print(f"Converted {table.name}.{column.name} to compressed storage")
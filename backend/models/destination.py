@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
+from datetime import datetime
+from .database import Base
+
+
+class DestinationPOI(Base):
+    """
+    A place that generated itineraries keep visiting at a destination, with
+    its coordinates, typical duration and cost aggregated over all of them
+    """
+
+    __tablename__ = "destination_pois"
+    __table_args__ = (
+        Index("ux_destination_pois_key", "destination", "poi_key", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    destination = Column(String, index=True)  # normalize_label()
+    poi_key = Column(String)  # normalized place name
+    name = Column(String)  # as first written
+    mentions = Column(Integer, default=0)  # itineraries that include it
+    # Running mean of the coordinates seen; readings far from it count as
+    # conflicts, and mostly-conflicting places ("Hotel") aren't trusted
+    lat = Column(Float, nullable=True)
+    lng = Column(Float, nullable=True)
+    coord_count = Column(Integer, default=0)
+    coord_conflicts = Column(Integer, default=0)
+    duration_minutes = Column(Float, nullable=True)  # mean
+    duration_count = Column(Integer, default=0)
+    cost_min = Column(Float, nullable=True)  # INR
+    cost_max = Column(Float, nullable=True)
+    cost_avg = Column(Float, nullable=True)
+    cost_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Index
+from sqlalchemy.orm import deferred
 from datetime import datetime
-from .database import Base
+from .database import Base, CompressedText
 
 
 class Itinerary(Base):
@@ -14,8 +15,73 @@ class Itinerary(Base):
     start_date = Column(String)
     end_date = Column(String)
     budget = Column(Float)
-    itinerary_data = Column(Text)  # JSON string of the full itinerary
+    # JSON string of the full itinerary - deferred so list/progress queries
+    # don't pull the blob; structured copy lives in itinerary_days/activities
+    itinerary_data = deferred(Column(CompressedText))
     is_group = Column(Integer, default=0)  # 0 for individual, 1 for group
     group_id = Column(Integer, index=True, nullable=True)
+    # 1 for a stand-in built while Gemini was unavailable (never copied again)
+    degraded = Column(Integer, default=0)
+    # Denormalized counters maintained at write time (NULL = not synced yet)
+    day_count = Column(Integer, nullable=True)
+    total_activities = Column(Integer, nullable=True)
+    total_cost = Column(Float, nullable=True)
+    # Bumped on every write; clients send it back for optimistic concurrency
+    version = Column(Integer, default=1)
+    # Bumped by every progress write; see services/progress_service.py
+    progress_revision = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ItineraryDay(Base):
+    __tablename__ = "itinerary_days"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, index=True)
+    day = Column(Integer)  # day number as written in the itinerary
+    position = Column(Integer)  # order of the day within the itinerary
+    date = Column(String, nullable=True)
+    theme = Column(String, nullable=True)
+    activity_count = Column(Integer, default=0)
+    total_cost = Column(Float, default=0)
+    extra = Column(Text, nullable=True)  # JSON of any other day-level keys
+
+
+class ItineraryActivity(Base):
+    __tablename__ = "itinerary_activities"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, index=True)
+    day = Column(Integer, index=True)
+    activity_index = Column(Integer)  # position within the day
+    time = Column(String, nullable=True)
+    activity = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+    duration = Column(String, nullable=True)
+    cost = Column(Float, nullable=True)  # first number of the cost as written
+    # Index into services.cost_analytics.CATEGORIES, set when the row is written
+    category = Column(Integer, nullable=True)
+    description = Column(Text, nullable=True)
+    lat = Column(Float, nullable=True)
+    lng = Column(Float, nullable=True)
+    extra = Column(Text, nullable=True)  # JSON of any other activity-level keys
+
+
+class ItineraryRevision(Base):
+    """JSON Patch from version - 1 to version, used to resync live editors"""
+
+    __tablename__ = "itinerary_revisions"
+    __table_args__ = (
+        # One patch per version - a second writer of the same version fails
+        Index(
+            "ux_itinerary_revisions_version", "itinerary_id", "version", unique=True
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, index=True)
+    version = Column(Integer, index=True)
+    user_id = Column(Integer, nullable=True)
+    patch = Column(Text)  # JSON list of add/remove/replace operations
+    created_at = Column(DateTime, default=datetime.utcnow)
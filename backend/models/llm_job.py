@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from .database import Base
+
+
+class LLMJob(Base):
+    """Gemini call queued for the database-backed LLM workers (services/llm_jobs.py)"""
+
+    __tablename__ = "llm_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String)  # GeminiTravelAgent method
+    payload = Column(Text)  # JSON keyword arguments
+    # queued, running, done, failed
+    status = Column(String, default="queued", index=True)
+    result = Column(Text, nullable=True)  # JSON return value
+    error_status = Column(Integer, nullable=True)  # HTTP status of a failed call
+    error = Column(Text, nullable=True)
+    worker = Column(String, nullable=True)  # host:pid that claimed it
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,10 +1,23 @@
-from sqlalchemy import Column, Integer, DateTime, Text
+from sqlalchemy import Column, Integer, DateTime, Text, Index, UniqueConstraint
 from datetime import datetime
 from .database import Base
 
 
 class ActivityProgress(Base):
     __tablename__ = "activity_progress"
+    __table_args__ = (
+        # One row per user per activity - target of the bulk sync upsert
+        Index(
+            "ux_activity_progress_activity",
+            "itinerary_id",
+            "user_id",
+            "day",
+            "activity_index",
+            unique=True,
+        ),
+        # Sync delta: rows of an itinerary written after a revision
+        Index("ix_activity_progress_revision", "itinerary_id", "revision"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     itinerary_id = Column(Integer, index=True)
@@ -14,3 +27,25 @@ class ActivityProgress(Base):
     completed = Column(Integer, default=0)  # 0 or 1
     completed_at = Column(DateTime, nullable=True)
     notes = Column(Text, nullable=True)
+    # When the change was made on the device (offline edits sync later) and
+    # when the server stored it (drives the sync delta)
+    client_updated_at = Column(DateTime, nullable=True)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True
+    )
+    # Itinerary's progress revision when the row was last written; sync tokens
+    # are revisions, so a delta never depends on clocks
+    revision = Column(Integer, nullable=True)
+
+
+class ProgressSummary(Base):
+    """Per-itinerary, per-user completed count, kept in step with ActivityProgress"""
+
+    __tablename__ = "progress_summaries"
+    __table_args__ = (UniqueConstraint("itinerary_id", "user_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    itinerary_id = Column(Integer, index=True)
+    user_id = Column(Integer, index=True)
+    completed_activities = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
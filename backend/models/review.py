@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from .database import Base
+
+
+class ReviewIngestion(Base):
+    """Review crawl state per destination, driven by the background ingestion job"""
+
+    __tablename__ = "review_ingestions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    destination = Column(String, unique=True, index=True)  # normalize_label()
+    status = Column(String, default="pending")  # pending, running, ok, failed
+    review_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    requested_at = Column(DateTime, default=datetime.utcnow)
+    last_ingested_at = Column(DateTime, nullable=True, index=True)
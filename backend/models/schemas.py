@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+import re
+
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+from typing import Optional, Dict, Any, List, Union
+from datetime import datetime
 
 
 class UserCreate(BaseModel):
@@ -38,6 +41,12 @@ class ChatMessage(BaseModel):
 class ItineraryUpdate(BaseModel):
     itinerary_id: int
     update_request: str
+    base_version: Optional[int] = None
+
+
+class ItineraryPatch(BaseModel):
+    base_version: int
+    patch: List[Dict[str, Any]]
 
 
 class GroupCreate(BaseModel):
@@ -55,3 +64,141 @@ class ActivityProgressUpdate(BaseModel):
     activity_index: int
     completed: bool
     notes: Optional[str] = None
+
+
+class DayProgressUpdate(BaseModel):
+    itinerary_id: int
+    day: int
+    completed: bool
+
+
+class ProgressChange(BaseModel):
+    day: int
+    activity_index: int
+    completed: bool
+    notes: Optional[str] = None
+    client_timestamp: datetime
+
+
+class ProgressSyncRequest(BaseModel):
+    itinerary_id: int
+    since_token: Optional[str] = None
+    changes: List[ProgressChange] = []
+
+
+NUMBER_PATTERN = re.compile(r"-?\d[\d,]*(?:\.\d+)?")
+
+
+def to_number(value) -> Optional[float]:
+    """
+    Coerce LLM cost values like 500, "500", "₹1,200", "Rs. 500" into floats.
+    The first number in a string is used, so "₹500 - ₹800" is 500
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def _clean_number(value):
+    number = to_number(value)
+    if number is not None and number.is_integer():
+        return int(number)
+    return number
+
+
+def _day_number(value):
+    # "Day 1" or "1" from the model; anything else falls back to the list position
+    if isinstance(value, str):
+        match = re.search(r"\d+", value)
+        return int(match.group()) if match else None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def wrap_bare_itinerary(data):
+    # Some responses (and blobs stored before documents were validated) are
+    # the inner itinerary object without the {"itinerary": ...} wrapper
+    if isinstance(data, dict) and "itinerary" not in data and "days" in data:
+        return {"itinerary": data}
+    return data
+
+
+# Itinerary documents as generated by Gemini. Validated once when they enter
+# the system; unknown keys are kept so nothing the model returned is lost.
+
+
+class Coordinates(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+    _numbers = field_validator("lat", "lng", mode="before")(to_number)
+
+
+class ActivityPlan(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+    time: Optional[str] = None
+    activity: Optional[str] = None
+    location: Optional[str] = None
+    duration: Optional[str] = None
+    cost: Optional[Union[int, float]] = None
+    cost_text: Optional[str] = None
+    description: Optional[str] = None
+    coordinates: Optional[Coordinates] = None
+
+    _cost = field_validator("cost", mode="before")(_clean_number)
+
+    @model_validator(mode="before")
+    @classmethod
+    def keep_cost_text(cls, data):
+        # "₹500 - ₹800" or "Free" is kept as written; cost holds its first number
+        if isinstance(data, dict) and isinstance(data.get("cost"), str):
+            cost = data["cost"].strip()
+            if cost and not NUMBER_PATTERN.fullmatch(cost) and "cost_text" not in data:
+                data = dict(data, cost_text=cost)
+        return data
+
+
+class DayPlan(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+    day: Optional[int] = None
+    date: Optional[str] = None
+    theme: Optional[str] = None
+    activities: List[ActivityPlan] = []
+
+    _day = field_validator("day", mode="before")(_day_number)
+
+
+class ItineraryPlan(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+
+    destination: Optional[str] = None
+    duration: Optional[str] = None
+    total_estimated_cost: Optional[Union[int, float]] = None
+    currency: Optional[str] = None
+    days: List[DayPlan] = []
+
+    _cost = field_validator("total_estimated_cost", mode="before")(_clean_number)
+
+    @model_validator(mode="after")
+    def number_days(self):
+        for position, day in enumerate(self.days):
+            if day.day is None:
+                day.day = position + 1
+        return self
+
+
+class ItineraryDocument(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    message: Optional[str] = None
+    itinerary: ItineraryPlan
+
+    _wrap = model_validator(mode="before")(wrap_bare_itinerary)
@@ -8,8 +8,9 @@ from models.schemas import UserCreate, UserLogin, UserPreferences
 from utils.auth import (
     create_access_token,
     get_current_user,
-    verify_password,
-    hash_password,
+    verify_password_async,
+    hash_password_async,
+    password_needs_rehash,
 )
 
 router = APIRouter()
@@ -28,8 +29,12 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     if existing_username:
         raise HTTPException(status_code=400, detail="Username already taken")
 
+    # Give the connection back to the pool while bcrypt runs; with many
+    # concurrent requests the pool would otherwise run dry
+    db.rollback()
+
     # Create new user
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
     new_user = User(
         email=user.email,
         username=user.username,
@@ -61,10 +66,18 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
 @router.post("/login")  # Alternative path
 async def login(user: UserLogin, db: Session = Depends(get_db)):
     db_user = db.query(User).filter(User.username == user.username).first()
+    stored_hash = db_user.hashed_password if db_user else None
+    # Give the connection back to the pool while bcrypt runs
+    db.rollback()
 
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    if not db_user or not await verify_password_async(user.password, stored_hash):
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
+    # Transparently upgrade hashes made with a lower bcrypt cost
+    if password_needs_rehash(stored_hash):
+        db_user.hashed_password = await hash_password_async(user.password)
+        db.commit()
+
     token = create_access_token({"user_id": db_user.id})
 
     return {
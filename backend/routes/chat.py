@@ -10,8 +10,25 @@ from models.conversation import Conversation, Message
 from models.itinerary import Itinerary
 from models.schemas import ChatMessage
 from utils.auth import get_current_user
+from utils.json_repair import parse_llm_json, dumps_compact, JsonRepairError
 from utils.route_optimizer import optimize_itinerary_routes
-from services.gemini_service import gemini_agent
+from services.llm_jobs import llm_client
+from services.destination_knowledge import (
+    get_destination_knowledge,
+    fill_coordinates,
+    learn_from_itinerary,
+)
+from services.itinerary_store_service import (
+    sync_itinerary_structure,
+    validate_itinerary_document,
+    ItineraryFormatError,
+)
+from services.collaboration_service import (
+    save_itinerary_version,
+    broadcast_itinerary_change,
+    link_message_to_itinerary,
+    resolve_message_contents,
+)
 
 router = APIRouter()
 
@@ -49,7 +66,8 @@ async def chat(
     )
 
     conversation_history = [
-        {"role": msg.role, "content": msg.content} for msg in messages
+        {"role": msg.role, "content": content}
+        for msg, content in zip(messages, resolve_message_contents(db, messages))
     ]
 
     # Get user preferences
@@ -58,7 +76,9 @@ async def chat(
     )
 
     # Validate the query first
-    validation_result = await gemini_agent.validate_query(chat_request.message)
+    validation_result = await llm_client.validate_query(
+        chat_request.message, user_id=current_user.id
+    )
 
     if not validation_result["is_valid"]:
         # Return a polite rejection message
@@ -85,8 +105,11 @@ async def chat(
         }
 
     # Generate response
-    response = await gemini_agent.chat_response(
-        chat_request.message, conversation_history, user_preferences
+    response = await llm_client.chat_response(
+        chat_request.message,
+        conversation_history,
+        user_preferences,
+        user_id=current_user.id,
     )
 
     # Save messages
@@ -104,22 +127,34 @@ async def chat(
     conversation.updated_at = datetime.utcnow()
 
     # Check if response contains an itinerary (JSON format)
+    itinerary_change = None
+    created_itinerary = None
+    itinerary_conflict = None
+    itinerary_error = None
     try:
-        response_json = json.loads(response)
+        response_json, _ = parse_llm_json(response)
 
         # If response contains an itinerary object, save/update it
         if "itinerary" in response_json and isinstance(
             response_json["itinerary"], dict
         ):
-            itinerary_data = response_json["itinerary"]
+            document, response = validate_itinerary_document(response_json)
 
             # Optimize routes in the itinerary
             try:
-                optimized_itinerary = optimize_itinerary_routes(response_json)
-                response = json.dumps(optimized_itinerary)
-                itinerary_data = optimized_itinerary["itinerary"]
+                # Known places supply coordinates the model left out
+                fill_coordinates(
+                    document,
+                    get_destination_knowledge(
+                        db, document["itinerary"].get("destination")
+                    ),
+                )
+                document = optimize_itinerary_routes(document)
             except Exception as e:
                 print(f"Route optimization failed: {str(e)}")
+            response = dumps_compact(document)
+
+            itinerary_data = document["itinerary"]
 
             # Extract destination and dates from itinerary
             destination = itinerary_data.get("destination", "Unknown")
@@ -145,8 +180,11 @@ async def chat(
             )
 
             if existing_itinerary:
-                # Update existing itinerary with latest version
-                existing_itinerary.itinerary_data = response
+                # Update existing itinerary with latest version (first, so a
+                # version conflict leaves the itinerary's fields untouched)
+                itinerary_change = save_itinerary_version(
+                    db, existing_itinerary, document, current_user.id
+                )
                 existing_itinerary.destination = destination
                 if start_date:
                     existing_itinerary.start_date = start_date
@@ -154,7 +192,7 @@ async def chat(
                     existing_itinerary.end_date = end_date
                 if budget:
                     existing_itinerary.budget = budget
-                existing_itinerary.updated_at = datetime.utcnow()
+                link_message_to_itinerary(assistant_message, existing_itinerary)
                 print(f"Updated existing itinerary: {existing_itinerary.id}")
             else:
                 # Create new itinerary
@@ -169,21 +207,40 @@ async def chat(
                     itinerary_data=response,
                 )
                 db.add(new_itinerary)
+                sync_itinerary_structure(db, new_itinerary, document)
+                link_message_to_itinerary(assistant_message, new_itinerary)
+                created_itinerary = (destination, document)
                 print(f"Created new itinerary for conversation {conversation.id}")
 
-            # Update the assistant message with the optimized response
-            assistant_message.content = response
-
-    except json.JSONDecodeError:
+    except JsonRepairError:
         # Response is not JSON, just a regular chat message
         pass
+    except ItineraryFormatError as e:
+        # The reply is kept as chat; the client is told no itinerary was saved
+        itinerary_error = str(e)
+    except HTTPException as e:
+        if e.status_code != 409:
+            raise
+        # Someone else saved a newer version first. Nothing of the itinerary
+        # was written, so the messages are still saved, and the client is
+        # told the itinerary wasn't updated
+        itinerary_conflict = e.detail
     except Exception as e:
         print(f"Error processing itinerary in chat: {str(e)}")
         # Continue without failing the chat
 
     db.commit()
+    if itinerary_change:
+        broadcast_itinerary_change(itinerary_change)
+    if created_itinerary:
+        learn_from_itinerary(*created_itinerary)
 
-    return {"conversation_id": conversation.id, "response": response}
+    result = {"conversation_id": conversation.id, "response": response}
+    if itinerary_conflict:
+        result["itinerary_conflict"] = itinerary_conflict
+    if itinerary_error:
+        result["itinerary_error"] = itinerary_error
+    return result
 
 
 @router.get("/conversations")
@@ -235,9 +292,9 @@ async def get_messages(
     return [
         {
             "id": msg.id,
-            "content": msg.content,
+            "content": content,
             "role": msg.role,
             "created_at": msg.created_at,
         }
-        for msg in messages
+        for msg, content in zip(messages, resolve_message_contents(db, messages))
     ]
@@ -10,8 +10,22 @@ from models.conversation import Conversation
 from models.notification import Notification
 from models.schemas import GroupCreate, GroupInvite, TripRequest
 from utils.auth import get_current_user
+from utils.permissions import invalidate_user_groups
+from utils.json_repair import JsonRepairError, parse_llm_json, dumps_compact
+from services.notification_hub import notification_hub
 from utils.route_optimizer import optimize_itinerary_routes
-from services.gemini_service import gemini_agent
+from services.llm_jobs import llm_client
+from services.itinerary_fallback import generate_with_fallback
+from services.destination_knowledge import (
+    get_destination_knowledge,
+    fill_coordinates,
+    learn_from_itinerary,
+)
+from services.itinerary_store_service import (
+    sync_itinerary_structure,
+    validate_itinerary_document,
+    ItineraryFormatError,
+)
 
 router = APIRouter()
 
@@ -36,6 +50,7 @@ async def create_group(
     member = GroupMember(group_id=group.id, user_id=current_user.id, role="creator")
     db.add(member)
     db.commit()
+    invalidate_user_groups(current_user.id)
 
     return {
         "id": group.id,
@@ -137,6 +152,9 @@ async def get_group_details(
             "start_date": it.start_date,
             "end_date": it.end_date,
             "budget": it.budget,
+            "day_count": it.day_count,
+            "total_activities": it.total_activities,
+            "total_cost": it.total_cost,
         }
         for it in itineraries
     ]
@@ -220,6 +238,25 @@ async def invite_to_group(
     )
     db.add(notification)
     db.commit()
+    invalidate_user_groups(invited_user.id)
+    notification_hub.publish(
+        invited_user.id,
+        {
+            "type": "notification_created",
+            "notification": {
+                "id": notification.id,
+                "type": notification.type,
+                "title": notification.title,
+                "message": notification.message,
+                "status": notification.status,
+                "created_at": notification.created_at.isoformat(),
+                "read_at": None,
+                "group_id": group_id,
+                "group_name": group.name,
+                "inviter_name": current_user.full_name,
+            },
+        },
+    )
 
     return {"message": "Invitation sent successfully"}
 
@@ -249,7 +286,9 @@ async def create_group_itinerary(
     if trip_request.preferences:
         validation_query += f" with preferences: {trip_request.preferences}"
 
-    validation_result = await gemini_agent.validate_query(validation_query)
+    validation_result = await llm_client.validate_query(
+        validation_query, priority="group", user_id=current_user.id
+    )
 
     if not validation_result["is_valid"]:
         raise HTTPException(
@@ -263,17 +302,43 @@ async def create_group_itinerary(
     )
 
     # Generate itinerary
-    itinerary_text = await gemini_agent.generate_itinerary(
-        trip_request, user_preferences
+    knowledge = get_destination_knowledge(db, trip_request.destination)
+    itinerary_text, degraded = await generate_with_fallback(
+        db,
+        llm_client.generate_itinerary(
+            trip_request,
+            user_preferences,
+            destination_knowledge=knowledge.prompt(),
+            priority="group",
+            user_id=current_user.id,
+        ),
+        trip_request,
+        knowledge,
+        current_user.id,
     )
 
+    # Repair and parse in one pass; store the canonical serialization
+    try:
+        itinerary_json, itinerary_text = parse_llm_json(itinerary_text)
+    except JsonRepairError as e:
+        print(f"✗ JSON validation failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Generated itinerary has invalid JSON format at position {e.pos}: {e.msg}",
+        )
+    try:
+        itinerary_json, itinerary_text = validate_itinerary_document(itinerary_json)
+    except ItineraryFormatError as e:
+        print(f"✗ Itinerary schema validation failed: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    fill_coordinates(itinerary_json, knowledge)
+
     # Optimize routes
     try:
-        itinerary_json = json.loads(itinerary_text)
-        optimized_itinerary = optimize_itinerary_routes(itinerary_json)
-        itinerary_text = json.dumps(optimized_itinerary)
+        itinerary_json = optimize_itinerary_routes(itinerary_json)
     except Exception as e:
         print(f"Route optimization failed: {str(e)}")
+    itinerary_text = dumps_compact(itinerary_json)
 
     # Create conversation
     conversation = Conversation(
@@ -295,15 +360,23 @@ async def create_group_itinerary(
         itinerary_data=itinerary_text,
         is_group=1,
         group_id=group_id,
+        degraded=int(degraded),
     )
     db.add(itinerary)
+    try:
+        sync_itinerary_structure(db, itinerary, itinerary_json)
+    except ValueError as e:
+        print(f"Could not build structured itinerary rows: {str(e)}")
     db.commit()
     db.refresh(itinerary)
+    if not degraded:
+        learn_from_itinerary(trip_request.destination, itinerary_text)
 
     return {
         "itinerary_id": itinerary.id,
         "conversation_id": conversation.id,
         "itinerary": itinerary_text,
+        "degraded": degraded,
     }
 
 
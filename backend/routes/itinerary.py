@@ -1,77 +1,79 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
+import asyncio
 import json
-import re
 import string
 import time
-from models.database import get_db
+from models.database import get_db, SessionLocal
 from models.user import User
 from models.itinerary import Itinerary
 from models.conversation import Conversation, Message
-from models.group import GroupMember
-from models.schemas import TripRequest, ItineraryUpdate
-from utils.auth import get_current_user
+from models.schemas import TripRequest, ItineraryUpdate, ItineraryPatch, to_number
+from utils.auth import get_current_user, create_stream_ticket, decode_stream_ticket
+from utils.json_patch import apply_patch, JsonPatchError
+from utils.json_repair import parse_llm_json, dumps_compact, JsonRepairError
+from utils.http_cache import (
+    make_etag,
+    etag_matches,
+    not_modified,
+    cached_json_response,
+)
+from utils.permissions import (
+    get_accessible_itinerary,
+    get_visible_itinerary,
+    can_access_itinerary,
+)
 
 # Route optimizer import kept for potential future use
 # from utils.route_optimizer import optimize_itinerary_routes
-from services.gemini_service import gemini_agent
+from services.llm_jobs import llm_client
+from services.itinerary_store_service import (
+    sync_itinerary_structure,
+    ensure_itinerary_structure,
+    ensure_itinerary_structures,
+    validate_itinerary_document,
+    assemble_itinerary_days,
+    get_itinerary_object,
+    load_itinerary_document,
+    ItineraryFormatError,
+)
+from services.collaboration_service import (
+    collaboration_hub,
+    current_version,
+    check_base_version,
+    version_conflict,
+    save_itinerary_version,
+    broadcast_itinerary_change,
+    link_message_to_itinerary,
+    get_changes_since,
+)
+from services.notification_hub import STREAM_HEARTBEAT_SECONDS
+from services.review_ingestion import request_destination, get_review_snippets
+from services.itinerary_fallback import generate_with_fallback
+from services.cost_analytics import load_cost_frame, budget_report, summarize
+from services.destination_knowledge import (
+    get_destination_knowledge,
+    fill_coordinates,
+    learn_from_itinerary,
+)
+from services.partial_update_service import (
+    detect_target_days,
+    merge_regenerated_days,
+)
 
 router = APIRouter()
 
 
-def clean_json_string(json_str):
-    """Clean and fix common JSON formatting issues from LLM responses"""
-    import re
-
-    # Remove any markdown code block markers
-    json_str = re.sub(r"^```json\s*", "", json_str)
-    json_str = re.sub(r"\s*```$", "", json_str)
-
-    # Fix malformed coordinates patterns like: {"lat": X, " "lng": Y}
-    # Match patterns where there's a space and extra quote before "lng" or other keys
-    json_str = re.sub(r',\s*"\s+"([a-zA-Z_]+)":', r', "\1":', json_str)
-
-    # Fix patterns like: {"lat": X," "lng": Y} (no space after comma)
-    json_str = re.sub(r'," "([a-zA-Z_]+)":', r', "\1":', json_str)
-
-    # Fix trailing commas before closing braces/brackets
-    json_str = re.sub(r",(\s*[}\]])", r"\1", json_str)
-
-    # Remove any BOM or invisible characters
-    json_str = json_str.strip("\ufeff\x00")
-
-    return json_str
-
-
-def safe_json_dumps(data):
-    """Safely convert data to JSON string with proper error handling"""
-    try:
-        if isinstance(data, str):
-            # Clean the string first
-            cleaned = clean_json_string(data)
-            # Validate it's valid JSON
-            json.loads(cleaned)
-            return cleaned
-        else:
-            return json.dumps(data, ensure_ascii=False, indent=None)
-    except json.JSONDecodeError as e:
-        print(f"Invalid JSON string provided: {e}")
-        raise ValueError(f"Invalid JSON data: {e}")
-    except Exception as e:
-        print(f"Error serializing to JSON: {e}")
-        raise ValueError(f"Failed to serialize data: {e}")
-
-
 def safe_json_loads(data):
-    """Safely parse JSON string with proper error handling"""
+    """Parse a stored or generated itinerary, repairing common LLM JSON damage"""
     if isinstance(data, dict):
         return data
     try:
-        # Clean the JSON string before parsing
-        cleaned_data = clean_json_string(data)
-        return json.loads(cleaned_data)
-    except json.JSONDecodeError as e:
+        return parse_llm_json(data)[0]
+    except JsonRepairError as e:
         print(f"Failed to parse JSON: {e}")
         print(f"Problematic data snippet: ...{data[max(0, e.pos-50):e.pos+50]}...")
         raise ValueError(f"Corrupted JSON data at position {e.pos}: {e.msg}")
@@ -91,7 +93,9 @@ async def create_itinerary(
         if trip_request.preferences:
             validation_query += f" with preferences: {trip_request.preferences}"
 
-        validation_result = await gemini_agent.validate_query(validation_query)
+        validation_result = await llm_client.validate_query(
+            validation_query, user_id=current_user.id
+        )
 
         if not validation_result["is_valid"]:
             raise HTTPException(
@@ -105,14 +109,33 @@ async def create_itinerary(
         )
         print(f"User preferences: {user_preferences}")
 
-        print("Fetching reviews from multiple sources...")
-        time.sleep(7)
-        print("Performing similarity search on reviews...")
-        time.sleep(7)
+        # Reviews are crawled ahead of time by the ingestion job; here we
+        # only queue the destination and look up what's already stored
+        request_destination(db, trip_request.destination)
+        review_snippets = await get_review_snippets(
+            trip_request.destination, trip_request.preferences, user_preferences
+        )
+        if not review_snippets:
+            print("No stored reviews for this destination yet")
+
+        # Known places ground the prompt; the model skips their coordinates
+        knowledge = get_destination_knowledge(db, trip_request.destination)
+
         # Generate itinerary using Gemini
         print("Calling Gemini API...")
-        itinerary_text = await gemini_agent.generate_itinerary(
-            trip_request, user_preferences
+        # While Gemini is unavailable a similar stored trip stands in
+        itinerary_text, degraded = await generate_with_fallback(
+            db,
+            llm_client.generate_itinerary(
+                trip_request,
+                user_preferences,
+                review_snippets,
+                knowledge.prompt(),
+                user_id=current_user.id,
+            ),
+            trip_request,
+            knowledge,
+            current_user.id,
         )
 
         # Create a safe filename from destination and timestamp
@@ -130,42 +153,25 @@ async def create_itinerary(
 
         print(f"Itinerary generated, length: {len(itinerary_text)}")
 
-        # Clean and validate JSON first
+        # Repair and parse in one pass; store the canonical serialization
         try:
-            print("Cleaning and validating JSON response...")
-            itinerary_text = clean_json_string(itinerary_text)
-            test_parse = json.loads(itinerary_text)
-            print("✓ Initial JSON validation passed")
-        except json.JSONDecodeError as e:
-            print(f"✗ Initial JSON validation failed: {e}")
-            print(f"Error at position {e.pos}: {e.msg}")
+            test_parse, itinerary_text = parse_llm_json(itinerary_text)
+            print("✓ JSON validation passed")
+        except JsonRepairError as e:
+            print(f"✗ JSON validation failed: {e}")
             print(f"Context: ...{itinerary_text[max(0, e.pos-100):e.pos+100]}...")
             raise HTTPException(
                 status_code=500,
                 detail=f"Generated itinerary has invalid JSON format at position {e.pos}: {e.msg}",
             )
 
-        # Route optimization disabled - Gemini generates optimal routes directly
-        # Ensure we have valid JSON
-        try:
-            itinerary_text = safe_json_dumps(itinerary_text)
-            print("✓ Route optimization successful")
-        except Exception as fallback_error:
-            print(f"✗ Failed to process itinerary: {fallback_error}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to process itinerary data: {str(fallback_error)}",
-            )
-
-        # Final validation before saving
         try:
-            test_parse = json.loads(itinerary_text)
-            print("✓ Final JSON validation passed")
-        except json.JSONDecodeError as e:
-            print(f"✗ Final JSON validation failed: {e}")
-            raise HTTPException(
-                status_code=500, detail="Generated itinerary has invalid JSON format"
-            )
+            test_parse, itinerary_text = validate_itinerary_document(test_parse)
+        except ItineraryFormatError as e:
+            print(f"✗ Itinerary schema validation failed: {e}")
+            raise HTTPException(status_code=502, detail=str(e))
+        if fill_coordinates(test_parse, knowledge):
+            itinerary_text = dumps_compact(test_parse)
 
         # Create conversation
         conversation = Conversation(
@@ -200,17 +206,23 @@ async def create_itinerary(
             end_date=trip_request.end_date,
             budget=trip_request.budget,
             itinerary_data=itinerary_text,
+            degraded=int(degraded),
         )
         db.add(itinerary)
+        sync_itinerary_structure(db, itinerary, test_parse)
+        link_message_to_itinerary(assistant_message, itinerary)
 
         db.commit()
         db.refresh(itinerary)
         print(f"Itinerary saved: {itinerary.id}")
+        if not degraded:
+            learn_from_itinerary(trip_request.destination, test_parse)
 
         return {
             "itinerary_id": itinerary.id,
             "conversation_id": conversation.id,
             "itinerary": itinerary_text,
+            "degraded": degraded,
         }
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -227,7 +239,9 @@ async def create_itinerary(
 
 @router.get("/itineraries")
 async def get_user_itineraries(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
     itineraries = (
         db.query(Itinerary)
@@ -236,7 +250,54 @@ async def get_user_itineraries(
         .all()
     )
 
-    return [
+    return cached_json_response(
+        request,
+        [
+            {
+                "id": itinerary.id,
+                "title": itinerary.title,
+                "destination": itinerary.destination,
+                "start_date": itinerary.start_date,
+                "end_date": itinerary.end_date,
+                "budget": itinerary.budget,
+                "day_count": itinerary.day_count,
+                "total_activities": itinerary.total_activities,
+                "total_cost": itinerary.total_cost,
+                "created_at": itinerary.created_at,
+            }
+            for itinerary in itineraries
+        ],
+    )
+
+
+def itinerary_etag(itinerary: Itinerary, *extra) -> str:
+    """ETag from the version and metadata - computed without loading the blob"""
+    return make_etag(
+        itinerary.id,
+        current_version(itinerary),
+        itinerary.updated_at,
+        itinerary.title,
+        itinerary.destination,
+        itinerary.start_date,
+        itinerary.end_date,
+        itinerary.budget,
+        itinerary.is_group,
+        itinerary.group_id,
+        *extra,
+    )
+
+
+@router.get("/itinerary/{itinerary_id}")
+async def get_itinerary(
+    request: Request,
+    itinerary: Itinerary = Depends(get_visible_itinerary),
+):
+    etag = itinerary_etag(itinerary)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return cached_json_response(
+        request,
         {
             "id": itinerary.id,
             "title": itinerary.title,
@@ -244,94 +305,123 @@ async def get_user_itineraries(
             "start_date": itinerary.start_date,
             "end_date": itinerary.end_date,
             "budget": itinerary.budget,
+            "itinerary_data": itinerary.itinerary_data,
             "created_at": itinerary.created_at,
-        }
-        for itinerary in itineraries
-    ]
+            "is_group": itinerary.is_group,
+            "group_id": itinerary.group_id,
+            "version": current_version(itinerary),
+        },
+        etag,
+    )
 
 
-@router.get("/itinerary/{itinerary_id}")
-async def get_itinerary(
-    itinerary_id: int,
-    current_user: User = Depends(get_current_user),
+@router.get("/itinerary/{itinerary_id}/days")
+async def get_itinerary_days(
+    request: Request,
+    day: Optional[int] = None,
+    itinerary: Itinerary = Depends(get_visible_itinerary),
     db: Session = Depends(get_db),
 ):
-    itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
+    """Get itinerary days rebuilt from structured rows, optionally a single day"""
+    etag = itinerary_etag(itinerary, "days", day)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
+    try:
+        ensure_itinerary_structure(db, itinerary)
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Itinerary data is corrupted and cannot be parsed. Please regenerate this itinerary. Error: {e.msg} at position {e.pos}",
+        )
 
-    # Check access: either owner or group member
-    has_access = itinerary.user_id == current_user.id
+    return cached_json_response(
+        request,
+        {
+            "itinerary_id": itinerary.id,
+            "day_count": itinerary.day_count,
+            "total_activities": itinerary.total_activities,
+            "total_cost": itinerary.total_cost,
+            "days": assemble_itinerary_days(db, itinerary.id, day),
+        },
+        etag,
+    )
 
-    if not has_access and itinerary.is_group and itinerary.group_id:
-        # Check if user is a member of the group
-        membership = (
-            db.query(GroupMember)
-            .filter(
-                GroupMember.group_id == itinerary.group_id,
-                GroupMember.user_id == current_user.id,
-            )
-            .first()
-        )
-        has_access = membership is not None
 
-    if not has_access:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
+@router.get("/itineraries/costs")
+async def get_itineraries_cost_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Budget analytics over all of the user's itineraries in one pass.
+    Itineraries stored before structured storage get their rows first; any
+    whose data can't be parsed are left out and listed in not_analyzed.
+    """
+    owned = db.query(Itinerary).filter(Itinerary.user_id == current_user.id)
+    not_analyzed = ensure_itinerary_structures(db, owned)
+    # Only the unreadable ones are still without counters
+    analyzed = owned.filter(Itinerary.total_activities.isnot(None))
+    return {**summarize(load_cost_frame(db, analyzed)), "not_analyzed": not_analyzed}
+
+
+@router.get("/itinerary/{itinerary_id}/costs")
+async def get_itinerary_costs(
+    travellers: Optional[int] = None,
+    itinerary: Itinerary = Depends(get_visible_itinerary),
+    db: Session = Depends(get_db),
+):
+    """
+    Per-day, per-category and per-person costs computed from the activities,
+    checked against the trip budget, with suggestions when it is exceeded.
+    travellers defaults to the group's size for group itineraries, else 1.
+    """
+    try:
+        ensure_itinerary_structure(db, itinerary)
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Itinerary data is corrupted and cannot be parsed. Please regenerate this itinerary. Error: {e.msg} at position {e.pos}",
+        )
 
+    frame = load_cost_frame(
+        db, db.query(Itinerary).filter(Itinerary.id == itinerary.id), with_text=True
+    )
+    if travellers is not None:
+        if travellers < 1:
+            raise HTTPException(status_code=400, detail="travellers must be at least 1")
+        frame.travellers[0] = travellers
+    stated_total = to_number(
+        get_itinerary_object(itinerary.itinerary_data).get("total_estimated_cost")
+    )
     return {
-        "id": itinerary.id,
-        "title": itinerary.title,
-        "destination": itinerary.destination,
-        "start_date": itinerary.start_date,
-        "end_date": itinerary.end_date,
-        "budget": itinerary.budget,
-        "itinerary_data": itinerary.itinerary_data,
-        "created_at": itinerary.created_at,
-        "is_group": itinerary.is_group,
-        "group_id": itinerary.group_id,
+        "itinerary_id": itinerary.id,
+        **budget_report(frame, 0, stated_total),
     }
 
 
 @router.put("/itinerary/{itinerary_id}")
 async def update_itinerary(
-    itinerary_id: int,
     update_request: ItineraryUpdate,
+    itinerary: Itinerary = Depends(get_accessible_itinerary),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
-
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-
-    # Check access: either owner or group member
-    has_access = itinerary.user_id == current_user.id
-
-    if not has_access and itinerary.is_group and itinerary.group_id:
-        # Check if user is a member of the group
-        membership = (
-            db.query(GroupMember)
-            .filter(
-                GroupMember.group_id == itinerary.group_id,
-                GroupMember.user_id == current_user.id,
-            )
-            .first()
-        )
-        has_access = membership is not None
-
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Access denied")
+    check_base_version(itinerary, update_request.base_version)
 
     # Get user preferences
     user_preferences = (
         json.loads(current_user.preferences) if current_user.preferences else {}
     )
 
+    started_at = time.time()
+    updated_itinerary = None
+    target_days = []
+
     # Parse current itinerary to get summary info only (to reduce tokens)
     try:
-        current_itinerary = safe_json_loads(itinerary.itinerary_data)
-        itinerary_obj = current_itinerary.get("itinerary", current_itinerary)
+        current_itinerary = load_itinerary_document(itinerary.itinerary_data)
+        itinerary_obj = get_itinerary_object(current_itinerary)
 
         # Create a condensed summary instead of sending full itinerary
         summary = {
@@ -355,6 +445,7 @@ User's update request: {update_request.update_request}
 
 Please generate a COMPLETE updated itinerary based on this request. Include ALL days and activities in the proper JSON format as specified in the system prompt. All costs must be in Indian Rupees (₹).
 """
+        target_days = detect_target_days(update_request.update_request, itinerary_obj)
     except Exception as e:
         print(f"Failed to parse existing itinerary: {e}")
         update_prompt = f"""
@@ -363,33 +454,196 @@ User update request: {update_request.update_request}
 Please provide an updated itinerary for {itinerary.destination} from {itinerary.start_date} to {itinerary.end_date}, incorporating the requested changes. All costs must be in Indian Rupees (₹).
 """
 
-    # Generate updated itinerary with condensed context
-    updated_itinerary = await gemini_agent.chat_response(
-        update_prompt, [], user_preferences
-    )
+    # Targeted update: only regenerate the days the request is about
+    if target_days:
+        try:
+            days_to_update = [
+                day
+                for day in itinerary_obj.get("days", [])
+                if isinstance(day, dict) and day.get("day") in target_days
+            ]
+            partial_text, usage = await llm_client.regenerate_days(
+                itinerary_obj,
+                days_to_update,
+                update_request.update_request,
+                user_preferences,
+                user_id=current_user.id,
+            )
+            regenerated = safe_json_loads(partial_text)
+            test_parse = merge_regenerated_days(
+                current_itinerary, regenerated, target_days
+            )
+            updated_itinerary = dumps_compact(test_parse)
+            print(
+                f"✓ Partial update of day(s) {target_days}: {len(partial_text)} chars generated "
+                f"in {time.time() - started_at:.1f}s (full itinerary is {len(updated_itinerary)} chars), usage: {usage}"
+            )
+        except Exception as e:
+            print(f"Partial update failed, regenerating full itinerary: {str(e)}")
+            updated_itinerary = None
+            target_days = []
+
+    if updated_itinerary is None:
+        # Generate updated itinerary with condensed context
+        updated_itinerary = await llm_client.chat_response(
+            update_prompt, [], user_preferences, user_id=current_user.id
+        )
+
+        try:
+            test_parse, updated_itinerary = parse_llm_json(updated_itinerary)
+            print("✓ Updated JSON validation passed")
+        except JsonRepairError as e:
+            print(f"✗ Updated JSON validation failed: {e}")
+            raise HTTPException(
+                status_code=500, detail="Updated itinerary has invalid JSON format"
+            )
+        print(
+            f"✓ Full update: {len(updated_itinerary)} chars generated in {time.time() - started_at:.1f}s"
+        )
 
-    # Route optimization disabled - Gemini generates optimal routes directly
-    # Ensure we still have valid JSON
+    # Someone may have saved while Gemini was generating
+    loaded_version = current_version(itinerary)
+    db.refresh(itinerary)
+    check_base_version(itinerary, update_request.base_version)
+    if target_days and current_version(itinerary) != loaded_version:
+        # Put the regenerated days into the newer document instead, so the
+        # other days' edits aren't lost and their rows still match
+        try:
+            current_itinerary = load_itinerary_document(itinerary.itinerary_data)
+            test_parse = merge_regenerated_days(
+                current_itinerary, regenerated, target_days
+            )
+        except (KeyError, ValueError):
+            # The days it regenerated are gone from the newer version
+            raise version_conflict(current_version(itinerary))
+
+    # Update itinerary
     try:
-        updated_itinerary = safe_json_dumps(updated_itinerary)
-        print("✓ Route optimization successful")
-    except Exception as e:
-        print(f"Failed to process updated itinerary: {str(e)}")
-        pass
+        # A partial update leaves the other days as they were stored, so only
+        # the regenerated ones are validated and have their rows rewritten
+        change = save_itinerary_version(
+            db,
+            itinerary,
+            test_parse,
+            current_user.id,
+            old_document=current_itinerary if target_days else None,
+            changed_days=target_days or None,
+        )
+    except ItineraryFormatError as e:
+        print(f"✗ Updated itinerary schema validation failed: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    db.commit()
+    broadcast_itinerary_change(change)
+
+    return {
+        "message": "Itinerary updated successfully",
+        "itinerary": itinerary.itinerary_data,
+        "version": change["version"],
+        "update_mode": "partial" if target_days else "full",
+        "updated_days": target_days,
+    }
+
+
+@router.patch("/itinerary/{itinerary_id}")
+async def patch_itinerary(
+    patch_request: ItineraryPatch,
+    itinerary: Itinerary = Depends(get_accessible_itinerary),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Apply a JSON Patch (add/remove/replace) made against base_version.
+    Fails with 409 if the itinerary has moved on, so edits are never lost.
+    """
+    check_base_version(itinerary, patch_request.base_version)
 
-    # Validate final JSON before saving
     try:
-        test_parse = json.loads(updated_itinerary)
-        print("✓ Updated JSON validation passed")
-    except json.JSONDecodeError as e:
-        print(f"✗ Updated JSON validation failed: {e}")
+        current_document = load_itinerary_document(itinerary.itinerary_data)
+        new_document = apply_patch(current_document, patch_request.patch)
+    except JsonPatchError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid patch: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not isinstance(new_document, dict):
         raise HTTPException(
-            status_code=500, detail="Updated itinerary has invalid JSON format"
+            status_code=400, detail="Patched itinerary must be an object"
         )
 
-    # Update itinerary
-    itinerary.itinerary_data = updated_itinerary
-    itinerary.updated_at = datetime.utcnow()
+    try:
+        change = save_itinerary_version(
+            db, itinerary, new_document, current_user.id, old_document=current_document
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Patched itinerary is not valid: {str(e)}"
+        )
     db.commit()
+    broadcast_itinerary_change(change)
 
-    return {"message": "Itinerary updated successfully", "itinerary": updated_itinerary}
+    return {"message": "Itinerary updated successfully", "version": change["version"]}
+
+
+@router.get("/itinerary/{itinerary_id}/changes")
+async def get_itinerary_changes(
+    since_version: int,
+    itinerary: Itinerary = Depends(get_visible_itinerary),
+    db: Session = Depends(get_db),
+):
+    """Patches since a client's version, or the full document if history is gone"""
+    return get_changes_since(db, itinerary, since_version)
+
+
+@router.post("/itinerary/{itinerary_id}/live/ticket")
+async def itinerary_live_ticket(
+    itinerary: Itinerary = Depends(get_visible_itinerary),
+    current_user: User = Depends(get_current_user),
+):
+    """Short-lived ticket for opening the live stream of this itinerary"""
+    return create_stream_ticket(current_user.id, f"itinerary:{itinerary.id}")
+
+
+@router.get("/itinerary/{itinerary_id}/live")
+async def itinerary_live_stream(itinerary_id: int, request: Request, ticket: str):
+    """
+    Server-Sent Events stream of patches for people editing this itinerary.
+    EventSource can't send headers, so it authenticates with a ticket from
+    POST /itinerary/{id}/live/ticket rather than the access token.
+    """
+    user_id = decode_stream_ticket(ticket, f"itinerary:{itinerary_id}")
+
+    # Short-lived session: the stream must not hold a pooled connection open
+    db = SessionLocal()
+    try:
+        itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
+        if not itinerary or not can_access_itinerary(db, itinerary, user_id):
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        version = current_version(itinerary)
+    finally:
+        db.close()
+
+    async def event_stream():
+        # Subscribed only once the response starts streaming, so a client that
+        # disconnects before then leaves no queue behind
+        queue = None
+        try:
+            queue = collaboration_hub.subscribe(itinerary_id)
+            yield f"event: version\ndata: {json.dumps({'version': version})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            if queue is not None:
+                collaboration_hub.unsubscribe(itinerary_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
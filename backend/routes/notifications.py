@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
+import json
 
-from models.database import get_db
+from models.database import get_db, SessionLocal
 from models.user import User
 from models.notification import Notification
 from models.group import TravelGroup, GroupMember
-from utils.auth import get_current_user
+from utils.auth import get_current_user, create_stream_ticket, decode_stream_ticket
+from utils.permissions import invalidate_user_groups
+from services.notification_hub import notification_hub, STREAM_HEARTBEAT_SECONDS
 
 router = APIRouter()
 
@@ -76,6 +81,59 @@ async def get_unread_count(
     return {"count": count}
 
 
+@router.post("/stream/ticket")
+async def notification_stream_ticket(current_user: User = Depends(get_current_user)):
+    """Short-lived ticket for opening the notification stream"""
+    return create_stream_ticket(current_user.id, "notifications")
+
+
+@router.get("/stream")
+async def notification_stream(request: Request, ticket: str):
+    """
+    Server-Sent Events stream of notification events for the current user.
+    EventSource can't send headers, so it authenticates with a ticket from
+    POST /notifications/stream/ticket rather than the access token.
+    """
+    user_id = decode_stream_ticket(ticket, "notifications")
+
+    # Short-lived session: the stream must not hold a pooled connection open
+    db = SessionLocal()
+    try:
+        count = (
+            db.query(Notification)
+            .filter(Notification.user_id == user_id, Notification.read_at == None)
+            .count()
+        )
+    finally:
+        db.close()
+
+    async def event_stream():
+        # Subscribed only once the response starts streaming, so a client that
+        # disconnects before then leaves no queue behind
+        queue = None
+        try:
+            queue = notification_hub.subscribe(user_id)
+            yield f"event: unread_count\ndata: {json.dumps({'count': count})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            if queue is not None:
+                notification_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: int,
@@ -96,6 +154,10 @@ async def mark_notification_read(
 
     notification.read_at = datetime.utcnow()
     db.commit()
+    notification_hub.publish(
+        current_user.id,
+        {"type": "notification_updated", "id": notification.id, "read": True},
+    )
 
     return {"message": "Notification marked as read"}
 
@@ -150,6 +212,16 @@ async def accept_group_invite(
     notification.status = "accepted"
     notification.read_at = datetime.utcnow()
     db.commit()
+    invalidate_user_groups(current_user.id)
+    notification_hub.publish(
+        current_user.id,
+        {
+            "type": "notification_updated",
+            "id": notification.id,
+            "status": "accepted",
+            "read": True,
+        },
+    )
 
     return {"message": "Group invitation accepted", "group_id": notification.related_id}
 
@@ -181,5 +253,14 @@ async def reject_group_invite(
     notification.status = "rejected"
     notification.read_at = datetime.utcnow()
     db.commit()
+    notification_hub.publish(
+        current_user.id,
+        {
+            "type": "notification_updated",
+            "id": notification.id,
+            "status": "rejected",
+            "read": True,
+        },
+    )
 
     return {"message": "Group invitation rejected"}
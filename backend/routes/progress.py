@@ -5,14 +5,33 @@ import json
 
 from models.database import get_db
 from models.user import User
-from models.itinerary import Itinerary
+from models.itinerary import Itinerary, ItineraryDay
 from models.progress import ActivityProgress
-from models.group import GroupMember
-from models.schemas import ActivityProgressUpdate
+from models.schemas import (
+    ActivityProgressUpdate,
+    DayProgressUpdate,
+    ProgressSyncRequest,
+)
 from utils.auth import get_current_user
+from utils.permissions import require_itinerary_access, get_accessible_itinerary
+from services.itinerary_store_service import ensure_itinerary_structure
+from services.progress_service import (
+    get_progress_summaries,
+    adjust_progress_summary,
+    set_activity_progress,
+    set_day_progress,
+    refresh_progress_summary,
+    upsert_progress_changes,
+    get_progress_changes_since,
+    current_progress_revision,
+    next_progress_revision,
+)
 
 router = APIRouter()
 
+# Upper bound on changes accepted in one offline sync request
+MAX_SYNC_CHANGES = 1000
+
 
 @router.post("/activity/progress")
 async def update_activity_progress(
@@ -21,136 +40,224 @@ async def update_activity_progress(
     db: Session = Depends(get_db),
 ):
     """Mark an activity as completed or update its progress"""
-    # Check if itinerary exists and user has access
-    itinerary = (
-        db.query(Itinerary).filter(Itinerary.id == progress_data.itinerary_id).first()
+    itinerary = require_itinerary_access(db, progress_data.itinerary_id, current_user)
+
+    # Lock the itinerary's progress first, so the summary backfill and the
+    # read-modify-write below don't interleave with another writer
+    revision = next_progress_revision(db, progress_data.itinerary_id)
+    # Make sure summaries exist before applying an incremental change
+    get_progress_summaries(db, progress_data.itinerary_id)
+
+    delta = set_activity_progress(
+        db,
+        progress_data.itinerary_id,
+        current_user.id,
+        progress_data.day,
+        progress_data.activity_index,
+        progress_data.completed,
+        progress_data.notes,
+        revision=revision,
     )
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-
-    # Check access (owner or group member)
-    has_access = itinerary.user_id == current_user.id
-    if itinerary.is_group and itinerary.group_id:
-        membership = (
-            db.query(GroupMember)
-            .filter(
-                GroupMember.group_id == itinerary.group_id,
-                GroupMember.user_id == current_user.id,
-            )
-            .first()
-        )
-        has_access = has_access or membership is not None
+    adjust_progress_summary(db, progress_data.itinerary_id, current_user.id, delta)
+
+    db.commit()
+
+    return {"message": "Progress updated successfully"}
+
 
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Access denied")
+@router.post("/activity/progress/day")
+async def update_day_progress(
+    progress_data: DayProgressUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Mark every activity of a day as completed or not completed"""
+    itinerary = require_itinerary_access(db, progress_data.itinerary_id, current_user)
+
+    try:
+        ensure_itinerary_structure(db, itinerary)
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Itinerary data is corrupted and cannot be parsed. Please regenerate this itinerary. Error: {e.msg} at position {e.pos}",
+        )
 
-    # Find or create progress record
-    progress = (
-        db.query(ActivityProgress)
+    itinerary_day = (
+        db.query(ItineraryDay)
         .filter(
-            ActivityProgress.itinerary_id == progress_data.itinerary_id,
-            ActivityProgress.user_id == current_user.id,
-            ActivityProgress.day == progress_data.day,
-            ActivityProgress.activity_index == progress_data.activity_index,
+            ItineraryDay.itinerary_id == itinerary.id,
+            ItineraryDay.day == progress_data.day,
         )
         .first()
     )
+    if not itinerary_day:
+        raise HTTPException(status_code=404, detail="Day not found in itinerary")
 
-    if progress:
-        progress.completed = 1 if progress_data.completed else 0
-        progress.notes = progress_data.notes
-        progress.completed_at = datetime.utcnow() if progress_data.completed else None
-    else:
-        progress = ActivityProgress(
-            itinerary_id=progress_data.itinerary_id,
-            user_id=current_user.id,
-            day=progress_data.day,
-            activity_index=progress_data.activity_index,
-            completed=1 if progress_data.completed else 0,
-            notes=progress_data.notes,
-            completed_at=datetime.utcnow() if progress_data.completed else None,
-        )
-        db.add(progress)
+    revision = next_progress_revision(db, itinerary.id)
+    get_progress_summaries(db, itinerary.id)
+
+    delta = set_day_progress(
+        db,
+        itinerary.id,
+        current_user.id,
+        progress_data.day,
+        itinerary_day.activity_count,
+        progress_data.completed,
+        revision=revision,
+    )
+    adjust_progress_summary(db, itinerary.id, current_user.id, delta)
 
     db.commit()
 
-    return {"message": "Progress updated successfully"}
+    return {
+        "message": "Day progress updated successfully",
+        "day": progress_data.day,
+        "activities_updated": itinerary_day.activity_count,
+    }
+
+
+@router.post("/activity/progress/sync")
+async def sync_activity_progress(
+    sync_data: ProgressSyncRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Batched progress sync for offline clients: applies all queued changes in one
+    transaction and returns everything changed on the server since since_token
+    """
+    if len(sync_data.changes) > MAX_SYNC_CHANGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many changes in one sync (max {MAX_SYNC_CHANGES})",
+        )
+
+    since = None
+    if sync_data.since_token:
+        try:
+            since = int(sync_data.since_token)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid sync token")
+
+    itinerary = require_itinerary_access(db, sync_data.itinerary_id, current_user)
+
+    applied, rejected = 0, []
+    if sync_data.changes:
+        revision = next_progress_revision(db, itinerary.id)
+        get_progress_summaries(db, itinerary.id)
+        applied, rejected = upsert_progress_changes(
+            db, itinerary.id, current_user.id, sync_data.changes, revision
+        )
+        refresh_progress_summary(db, itinerary.id, current_user.id)
+        db.commit()
+
+    # Token first: a write committing between the two reads is sent now and
+    # again next time, rather than never
+    sync_token = current_progress_revision(db, itinerary.id)
+    changed = get_progress_changes_since(db, itinerary.id, since)
+
+    return {
+        "itinerary_id": itinerary.id,
+        "applied": applied,
+        # Older than what the server already has (last write wins)
+        "rejected": [
+            {
+                "day": c.day,
+                "activity_index": c.activity_index,
+                "client_timestamp": c.client_timestamp,
+            }
+            for c in rejected
+        ],
+        "sync_token": str(sync_token),
+        "changes": [
+            {
+                "day": p.day,
+                "activity_index": p.activity_index,
+                "completed": p.completed == 1,
+                "notes": p.notes,
+                "completed_at": p.completed_at,
+                "user_id": p.user_id,
+                "client_updated_at": p.client_updated_at,
+            }
+            for p in changed
+        ],
+    }
 
 
 @router.get("/activity/progress/{itinerary_id}")
 async def get_activity_progress(
     itinerary_id: int,
+    include_details: bool = False,
+    itinerary: Itinerary = Depends(get_accessible_itinerary),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get progress for an itinerary"""
-    # Check if itinerary exists and user has access
-    itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-
-    # Check access
-    has_access = itinerary.user_id == current_user.id
-    if itinerary.is_group and itinerary.group_id:
-        membership = (
-            db.query(GroupMember)
-            .filter(
-                GroupMember.group_id == itinerary.group_id,
-                GroupMember.user_id == current_user.id,
-            )
-            .first()
-        )
-        has_access = has_access or membership is not None
-
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Access denied")
 
-    # Get all progress records for this itinerary
-    progress_records = (
-        db.query(ActivityProgress)
-        .filter(ActivityProgress.itinerary_id == itinerary_id)
-        .all()
-    )
-
-    # Calculate statistics with better error handling
+    # Activity count comes from the denormalized counter; older itineraries
+    # are parsed once here to backfill it
     try:
-        itinerary_data = json.loads(itinerary.itinerary_data)
-        itinerary_obj = itinerary_data.get("itinerary", itinerary_data)
-
-        total_activities = sum(
-            len(day.get("activities", [])) for day in itinerary_obj.get("days", [])
-        )
+        ensure_itinerary_structure(db, itinerary)
+        total_activities = itinerary.total_activities
     except json.JSONDecodeError as e:
         print(f"Corrupted itinerary data for ID {itinerary_id}: {e}")
         print(f"Error at position {e.pos}: {e.msg}")
-        
+
         # Try to show a snippet of the problematic area
         data = itinerary.itinerary_data
-        error_snippet = data[max(0, e.pos-100):min(len(data), e.pos+100)]
+        error_snippet = data[max(0, e.pos - 100) : min(len(data), e.pos + 100)]
         print(f"Data around error: ...{error_snippet}...")
-        
+
         raise HTTPException(
             status_code=500,
-            detail=f"Itinerary data is corrupted and cannot be parsed. Please regenerate this itinerary. Error: {e.msg} at position {e.pos}"
+            detail=f"Itinerary data is corrupted and cannot be parsed. Please regenerate this itinerary. Error: {e.msg} at position {e.pos}",
         )
     except Exception as e:
         print(f"Unexpected error parsing itinerary {itinerary_id}: {e}")
         raise HTTPException(
-            status_code=500,
-            detail=f"Failed to parse itinerary data: {str(e)}"
+            status_code=500, detail=f"Failed to parse itinerary data: {str(e)}"
         )
 
-    completed_activities = sum(1 for p in progress_records if p.completed == 1)
+    # Completed counts come from the per-user summaries (one row per member)
+    summaries = get_progress_summaries(db, itinerary_id)
+
+    completed_activities = sum(summary.completed_activities for summary in summaries)
+    user_completed_activities = next(
+        (
+            summary.completed_activities
+            for summary in summaries
+            if summary.user_id == current_user.id
+        ),
+        0,
+    )
+    db.commit()  # persist summaries backfilled for older itineraries
+
     progress_percentage = (
         (completed_activities / total_activities * 100) if total_activities > 0 else 0
     )
+    user_progress_percentage = (
+        (user_completed_activities / total_activities * 100)
+        if total_activities > 0
+        else 0
+    )
 
-    return {
+    result = {
         "itinerary_id": itinerary_id,
         "total_activities": total_activities,
         "completed_activities": completed_activities,
         "progress_percentage": round(progress_percentage, 2),
-        "progress_details": [
+        "user_completed_activities": user_completed_activities,
+        "user_progress_percentage": round(user_progress_percentage, 2),
+    }
+
+    # Per-activity rows are only loaded when the client needs them
+    if include_details:
+        progress_records = (
+            db.query(ActivityProgress)
+            .filter(ActivityProgress.itinerary_id == itinerary_id)
+            .all()
+        )
+        result["progress_details"] = [
             {
                 "day": p.day,
                 "activity_index": p.activity_index,
@@ -160,5 +267,6 @@ async def get_activity_progress(
                 "user_id": p.user_id,
             }
             for p in progress_records
-        ],
-    }
\ No newline at end of file
+        ]
+
+    return result
@@ -0,0 +1,198 @@
+"""
+Browser Pool
+Keeps a few headless Chrome instances warm for the review crawler instead of
+launching and killing a browser per place. Drivers are checked out with
+pool.driver(); a driver that raised is replaced, and every driver is
+recycled after BROWSER_MAX_PAGES pages so Chrome's memory growth stays
+bounded.
+
+Also holds the condition-based waits the crawler uses instead of fixed
+sleeps: wait for an element, and scroll until more items stop appearing.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils.config import BROWSER_POOL_SIZE, BROWSER_MAX_PAGES, SCRAPE_WAIT_SECONDS
+
+# How long a scroll may take to load more items before the list counts as done
+SCROLL_SETTLE_SECONDS = 2
+
+
+def chrome_options(headless: bool = True) -> Options:
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    return options
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        options: Optional[Options] = None,
+        max_pages: int = BROWSER_MAX_PAGES,
+        driver_factory: Optional[Callable] = None,
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self._options = options or chrome_options()
+        self._factory = driver_factory or (
+            lambda: webdriver.Chrome(options=self._options)
+        )
+        self._idle = queue.LifoQueue()  # most recently used first - warmest
+        self._pages = {}  # id(driver) -> pages loaded
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_driver(self):
+        driver = self._factory()
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def warm(self, count: Optional[int] = None):
+        """Start drivers ahead of the first scrape"""
+        for _ in range(min(count or self.size, self.size)):
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._new_driver())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def acquire(self, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._new_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            # Poll, so a slot freed by a discarded driver is noticed too
+            wait = 0.5
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError("No browser became available")
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def release(self, driver, broken: bool = False):
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        if broken or self._closed or self._pages[id(driver)] >= self.max_pages:
+            self._discard(driver)
+            return
+        try:
+            # Next user starts from a clean slate
+            driver.delete_all_cookies()
+            driver.get("about:blank")
+        except WebDriverException:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def wait_for(driver, condition, timeout: float = SCRAPE_WAIT_SECONDS):
+    return WebDriverWait(driver, timeout).until(condition)
+
+
+def wait_for_element(driver, by, selector, timeout: float = SCRAPE_WAIT_SECONDS):
+    return wait_for(driver, EC.presence_of_element_located((by, selector)), timeout)
+
+
+def scroll_until_loaded(
+    driver,
+    item_selector: str,
+    target: int,
+    container=None,
+    max_scrolls: int = 20,
+    settle: float = SCROLL_SETTLE_SECONDS,
+) -> int:
+    """
+    Scroll (the container, or the window) until target items matching
+    item_selector are present or a scroll stops loading new ones.
+    Returns the item count.
+    """
+    count = len(driver.find_elements(By.CSS_SELECTOR, item_selector))
+    for _ in range(max_scrolls):
+        if count >= target:
+            break
+        if container is not None:
+            driver.execute_script(
+                "arguments[0].scrollTop = arguments[0].scrollHeight", container
+            )
+        else:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        previous = count
+        try:
+            wait_for(
+                driver,
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, item_selector))
+                > previous,
+                settle,
+            )
+        except TimeoutException:
+            break
+        count = len(driver.find_elements(By.CSS_SELECTOR, item_selector))
+    return count
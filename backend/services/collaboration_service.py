@@ -0,0 +1,226 @@
+"""
+Collaborative itinerary editing
+Every write to an itinerary bumps its version and records a JSON Patch from the
+previous version. Connected group members receive the patch instead of
+refetching the whole document, and clients that fell behind resync from the
+version they have.
+"""
+
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.itinerary import Itinerary, ItineraryRevision
+from models.conversation import Message
+from services.itinerary_store_service import (
+    sync_itinerary_structure,
+    sync_itinerary_days,
+    validate_itinerary_document,
+    validate_itinerary_days,
+)
+from services.notification_hub import NotificationHub
+from utils.json_patch import make_patch
+from utils.json_repair import dumps_compact
+
+# Revisions kept per itinerary; older clients get the full document instead
+MAX_REVISIONS_PER_ITINERARY = 200
+# Postgres NOTIFY payloads are capped at 8000 bytes; bigger patches are sent
+# as a "resync" hint and clients pull them through /changes
+MAX_BROADCAST_PATCH_BYTES = 7000
+
+collaboration_hub = NotificationHub(channel="vandreren_itinerary_changes")
+
+
+def current_version(itinerary: Itinerary) -> int:
+    # Itineraries created before versioning have no version yet
+    return itinerary.version or 1
+
+
+def version_conflict(version: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=f"Itinerary was changed by someone else (current version {version}). Resync and try again.",
+    )
+
+
+def check_base_version(itinerary: Itinerary, base_version: Optional[int]):
+    """Reject a write made against an outdated copy of the itinerary"""
+    if base_version is not None and base_version != current_version(itinerary):
+        raise version_conflict(current_version(itinerary))
+
+
+def save_itinerary_version(
+    db: Session,
+    itinerary: Itinerary,
+    new_document: dict,
+    user_id: Optional[int],
+    old_document: Optional[dict] = None,
+    changed_days: Optional[List[int]] = None,
+) -> dict:
+    """
+    Store new_document as the next version of the itinerary, in the caller's
+    transaction. Returns the patch event to broadcast once the caller commits.
+    With changed_days (a partial update of a stored document), only those days
+    are validated and only their rows rewritten.
+    Raises ValueError if new_document doesn't fit the itinerary schema, and a
+    409 HTTPException if another write took the version since itinerary was
+    loaded (roll back then).
+    """
+    if changed_days is None:
+        new_document, document_text = validate_itinerary_document(new_document)
+    else:
+        new_document = validate_itinerary_days(new_document, changed_days)
+        document_text = dumps_compact(new_document)
+
+    old_text = itinerary.itinerary_data
+    if old_document is None and old_text:
+        try:
+            old_document = json.loads(old_text)
+        except ValueError:
+            old_document = None
+
+    if old_document is None:
+        patch = [{"op": "replace", "path": "", "value": new_document}]
+    else:
+        patch = make_patch(old_document, new_document)
+
+    base_version = current_version(itinerary)
+    new_version = base_version + 1
+
+    # Take the next version only if nobody else has: a single conditional
+    # UPDATE, so two writers that both loaded base_version can't both succeed
+    claimed = (
+        db.query(Itinerary)
+        .filter(
+            Itinerary.id == itinerary.id,
+            func.coalesce(Itinerary.version, 1) == base_version,
+        )
+        .update(
+            {Itinerary.version: new_version, Itinerary.updated_at: datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    if not claimed:
+        latest = (
+            db.query(func.coalesce(Itinerary.version, 1))
+            .filter(Itinerary.id == itinerary.id)
+            .scalar()
+        )
+        raise version_conflict(latest or base_version)
+    set_committed_value(itinerary, "version", new_version)
+
+    # Messages that pointed at the version being replaced get their copy back
+    db.query(Message).filter(
+        Message.itinerary_id == itinerary.id,
+        Message.itinerary_version == base_version,
+    ).update(
+        {
+            Message.content: old_text,
+            Message.itinerary_id: None,
+            Message.itinerary_version: None,
+        },
+        synchronize_session=False,
+    )
+
+    itinerary.itinerary_data = document_text
+    itinerary.updated_at = datetime.utcnow()
+    if changed_days is None:
+        sync_itinerary_structure(db, itinerary, new_document)
+    else:
+        sync_itinerary_days(db, itinerary, new_document, changed_days)
+
+    db.add(
+        ItineraryRevision(
+            itinerary_id=itinerary.id,
+            version=new_version,
+            user_id=user_id,
+            patch=json.dumps(patch, ensure_ascii=False),
+        )
+    )
+    db.query(ItineraryRevision).filter(
+        ItineraryRevision.itinerary_id == itinerary.id,
+        ItineraryRevision.version <= new_version - MAX_REVISIONS_PER_ITINERARY,
+    ).delete(synchronize_session=False)
+
+    return {
+        "type": "itinerary_patch",
+        "itinerary_id": itinerary.id,
+        "base_version": base_version,
+        "version": new_version,
+        "user_id": user_id,
+        "patch": patch,
+    }
+
+
+def link_message_to_itinerary(message: Message, itinerary: Itinerary):
+    """Make an assistant message reference the itinerary's current version"""
+    message.content = None
+    message.itinerary_id = itinerary.id
+    message.itinerary_version = current_version(itinerary)
+
+
+def resolve_message_contents(db: Session, messages: List[Message]) -> List[str]:
+    """Message contents, loading referenced itinerary documents in one query"""
+    itinerary_ids = {
+        m.itinerary_id for m in messages if m.content is None and m.itinerary_id
+    }
+    documents = {}
+    if itinerary_ids:
+        documents = dict(
+            db.query(Itinerary.id, Itinerary.itinerary_data)
+            .filter(Itinerary.id.in_(itinerary_ids))
+            .all()
+        )
+    return [
+        documents.get(m.itinerary_id) if m.content is None else m.content
+        for m in messages
+    ]
+
+
+def broadcast_itinerary_change(event: dict):
+    """Push a committed change to everyone editing the itinerary"""
+    if len(json.dumps(event, default=str)) > MAX_BROADCAST_PATCH_BYTES:
+        event = {
+            "type": "resync",
+            "itinerary_id": event["itinerary_id"],
+            "version": event["version"],
+            "user_id": event["user_id"],
+        }
+    collaboration_hub.publish(event["itinerary_id"], event)
+
+
+def get_changes_since(db: Session, itinerary: Itinerary, since_version: int) -> dict:
+    """Patches needed to bring a client from since_version to the current version"""
+    version = current_version(itinerary)
+    if since_version >= version:
+        return {"version": version, "patches": []}
+
+    revisions = (
+        db.query(ItineraryRevision)
+        .filter(
+            ItineraryRevision.itinerary_id == itinerary.id,
+            ItineraryRevision.version > since_version,
+        )
+        .order_by(ItineraryRevision.version)
+        .all()
+    )
+
+    # History pruned or predates versioning - send the whole document
+    if len(revisions) != version - since_version:
+        return {
+            "version": version,
+            "resync": True,
+            "itinerary_data": itinerary.itinerary_data,
+        }
+
+    return {
+        "version": version,
+        "patches": [
+            {"version": r.version, "user_id": r.user_id, "patch": json.loads(r.patch)}
+            for r in revisions
+        ],
+    }
@@ -0,0 +1,453 @@
+"""
+Cost Analytics
+Budget checks computed from the activity costs themselves instead of trusting
+the total_estimated_cost the model writes. Activities of any number of
+itineraries are held as parallel NumPy arrays (CostFrame) and every total -
+per itinerary, per day, per category, per person - is one bincount over them,
+so the same code serves a single itinerary's budget report and analytics over
+every stored itinerary. Run from the backend directory for a summary of all
+itineraries:
+    python -m services.cost_analytics
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.group import GroupMember
+from models.itinerary import Itinerary, ItineraryActivity
+from utils.config import DAY_OVERRUN_FACTOR, COST_MISMATCH_RATIO
+
+CATEGORIES = (
+    "accommodation",
+    "food",
+    "transport",
+    "sightseeing",
+    "experiences",
+    "shopping",
+    "other",
+)
+# First match wins, so "hotel restaurant" is food and "boat ride" transport
+CATEGORY_PATTERNS = [
+    (
+        "food",
+        r"breakfast|lunch|dinner|brunch|restaurant|cafe|café|dhaba|food|snack"
+        r"|tea|coffee|bar|pub|bakery|bakeries|eatery|eat|eating|dine|dining|cuisine",
+    ),
+    (
+        "accommodation",
+        r"hotel|check[- ]?in|check[- ]?out|resort|hostel|homestay|guest ?house"
+        r"|stay|lodge|villa|camp|camping|campsite",
+    ),
+    (
+        "transport",
+        r"transfer|airport|flight|train|station|bus|taxi|cab|drive|driving|ride"
+        r"|ferry|ferries|boat|boating|jetty|pier|auto|metro|depart|departure|arrive"
+        r"|arrival|travel to|journey",
+    ),
+    ("shopping", r"shop|shopping|market|bazaar|mall|souvenir|boutique"),
+    (
+        "experiences",
+        r"tour|trek|trekking|hike|hiking|safari|rafting|diving|snorkel|snorkell?ing"
+        r"|paraglide|paragliding|cruise|show|theatre|theater|performance|concert"
+        r"|spa|massage|class|workshop|adventure|kayak|kayaking|zipline|cooking",
+    ),
+    (
+        "sightseeing",
+        r"temple|fort|palace|museum|beach|lake|park|garden|church|cathedral"
+        r"|mosque|monastery|falls|waterfall|view ?point|peak|monument|heritage"
+        r"|gallery|galleries|cave|visit|visiting|explore|exploring",
+    ),
+]
+# Whole words (and their plurals) only: "tea" must not match "steamboat",
+# "theatre" or "plateau"
+_PATTERNS = [
+    (CATEGORIES.index(name), re.compile(rf"\b(?:{p})(?:s|es)?\b"))
+    for name, p in CATEGORY_PATTERNS
+]
+# Activities offered for cutting when a trip is over budget, most optional
+# category first; stays and transport get a suggestion of their own when they
+# take more than FIXED_COST_SHARE of the total
+CUT_PRIORITY = np.full(len(CATEGORIES), -1)
+for _rank, _name in enumerate(("experiences", "shopping", "sightseeing", "food")):
+    CUT_PRIORITY[CATEGORIES.index(_name)] = _rank
+FIXED_COST_SHARE = {"accommodation": 0.5, "transport": 0.4}
+# Suggestions returned per itinerary
+MAX_SUGGESTIONS = 5
+# One entry per activity, as CostFrame.from_columns takes them
+ACTIVITY_COLUMNS = np.dtype(
+    [
+        ("itinerary", np.int64),
+        ("day", np.int64),
+        ("cost", np.float64),
+        ("category", np.int64),  # -1 = not stored yet
+    ]
+)
+
+
+def category_of(text: str) -> int:
+    text = text.lower()
+    for code, pattern in _PATTERNS:
+        if pattern.search(text):
+            return code
+    return CATEGORIES.index("other")
+
+
+def categorize(names: Sequence[str], locations: Sequence[str]) -> np.ndarray:
+    """
+    Category codes for (activity, location) pairs. Itineraries repeat the
+    same few activities, so each distinct pair is matched only once.
+    """
+    pairs = list(zip(names, locations))
+    codes = {
+        pair: category_of(f"{pair[0] or ''} {pair[1] or ''}") for pair in set(pairs)
+    }
+    return np.fromiter(map(codes.__getitem__, pairs), np.int8, len(pairs))
+
+
+class CostFrame:
+    """
+    Activities of n itineraries as parallel arrays. itinerary holds each
+    activity's index into ids/budgets/travellers (0..n-1), not the database id.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        budgets: np.ndarray,
+        travellers: np.ndarray,
+        itinerary: np.ndarray,
+        day: np.ndarray,
+        cost: np.ndarray,
+        category: np.ndarray,
+        names: Sequence[str] = (),
+        locations: Sequence[str] = (),
+    ):
+        self.ids = np.asarray(ids)
+        self.budgets = np.asarray(budgets, dtype=np.float64)  # NaN = no budget
+        self.travellers = np.maximum(np.asarray(travellers, dtype=np.float64), 1)
+        self.itinerary = np.asarray(itinerary, dtype=np.int64)
+        self.day = np.asarray(day, dtype=np.int64)
+        self.cost = np.nan_to_num(np.asarray(cost, dtype=np.float64))
+        self.category = np.asarray(category, dtype=np.int64)
+        # Activity text, only used to word suggestions
+        self.names = names
+        self.locations = locations
+
+    def __len__(self):
+        return len(self.ids)
+
+    def label(self, row: int) -> str:
+        if row < len(self.names) and self.names[row]:
+            return self.names[row]
+        if row < len(self.locations) and self.locations[row]:
+            return self.locations[row]
+        return f"activity {row + 1}"
+
+    @classmethod
+    def from_columns(
+        cls, itineraries, columns: np.ndarray, travellers=None, names=(), locations=()
+    ):
+        """
+        itineraries: (id, budget) pairs; columns: ACTIVITY_COLUMNS array, one
+        entry per activity; travellers: {itinerary_id: people}, default 1
+        """
+        ids = np.array([i for i, _ in itineraries], dtype=np.int64)
+        budgets = np.array(
+            [np.nan if b is None or b <= 0 else b for _, b in itineraries],
+            dtype=np.float64,
+        )
+        people = np.array([(travellers or {}).get(int(i), 1) for i in ids])
+
+        # Map database ids to positions without a dict lookup per activity
+        order = np.argsort(ids)
+        position = order[np.searchsorted(ids[order], columns["itinerary"])]
+        return cls(
+            ids,
+            budgets,
+            people,
+            position,
+            columns["day"],
+            columns["cost"],
+            columns["category"],
+            names,
+            locations,
+        )
+
+    @classmethod
+    def from_rows(cls, itineraries, activities, travellers=None):
+        """
+        Frame for activities not stored yet. itineraries: (id, budget) pairs;
+        activities: (itinerary_id, day, cost, activity, location) tuples;
+        travellers: {itinerary_id: people}, default 1
+        """
+        itinerary_ids, days, costs, names, locations = (
+            list(zip(*activities)) or [()] * 5
+        )
+        columns = np.empty(len(itinerary_ids), ACTIVITY_COLUMNS)
+        columns["itinerary"] = itinerary_ids
+        # None -> NaN -> 0
+        columns["day"] = np.nan_to_num(np.array(days, dtype=np.float64))
+        columns["cost"] = np.array(costs, dtype=np.float64)
+        columns["category"] = categorize(names, locations)
+        return cls.from_columns(itineraries, columns, travellers, names, locations)
+
+
+def analyze(frame: CostFrame) -> Dict[str, np.ndarray]:
+    """
+    Totals for every itinerary in the frame:
+        total, per_person, overrun (total - budget, NaN without a budget),
+        by_category (n x categories), days, and for every (itinerary, day)
+        pair day_itinerary, day_number, day_total and day_over (the day costs
+        more than DAY_OVERRUN_FACTOR x its share of the budget)
+    """
+    n = len(frame)
+    n_categories = len(CATEGORIES)
+    total = np.bincount(frame.itinerary, frame.cost, minlength=n)
+    by_category = np.bincount(
+        frame.itinerary * n_categories + frame.category,
+        frame.cost,
+        minlength=n * n_categories,
+    ).reshape(n, n_categories)
+
+    # One group per (itinerary, day) pair
+    day_key = frame.itinerary * (int(frame.day.max(initial=0)) + 1) + frame.day
+    pairs, first, pair_of = np.unique(day_key, return_index=True, return_inverse=True)
+    day_itinerary = frame.itinerary[first]
+    day_total = np.bincount(pair_of, frame.cost, minlength=len(pairs))
+    days = np.bincount(day_itinerary, minlength=n)
+
+    overrun = total - frame.budgets
+    daily_budget = frame.budgets / np.maximum(days, 1)
+    day_over = day_total > daily_budget[day_itinerary] * DAY_OVERRUN_FACTOR
+
+    return {
+        "total": total,
+        "per_person": total / frame.travellers,
+        "overrun": overrun,
+        "by_category": by_category,
+        "days": days,
+        "day_itinerary": day_itinerary,
+        "day_number": frame.day[first],
+        "day_total": day_total,
+        "day_over": day_over,
+    }
+
+
+def rebalance(frame: CostFrame, result: Dict, index: int) -> List[str]:
+    """Suggestions for bringing itinerary index of the frame back under budget"""
+    overrun = result["overrun"][index]
+    if not overrun > 0:
+        return []
+    budget = frame.budgets[index]
+    suggestions = []
+
+    mine = frame.itinerary == index
+    # Most optional, then priciest activities first, until the overrun is covered
+    priority = CUT_PRIORITY[frame.category]
+    candidates = np.flatnonzero(mine & (priority >= 0) & (frame.cost > 0))
+    candidates = candidates[np.lexsort((-frame.cost[candidates], priority[candidates]))]
+    covered = np.cumsum(frame.cost[candidates])
+    needed = candidates[: int(np.searchsorted(covered, overrun)) + 1]
+    for row in needed:
+        suggestions.append(
+            f"Swap or drop '{frame.label(row)}' (day {frame.day[row]}, ₹{frame.cost[row]:,.0f}, "
+            f"{CATEGORIES[frame.category[row]]})"
+        )
+
+    days = result["day_itinerary"] == index
+    daily_budget = budget / max(result["days"][index], 1)
+    for number, cost in zip(
+        result["day_number"][days & result["day_over"]],
+        result["day_total"][days & result["day_over"]],
+    ):
+        suggestions.append(
+            f"Day {number} costs ₹{cost:,.0f} against a daily budget of "
+            f"₹{daily_budget:,.0f} - move something to a lighter day"
+        )
+
+    total = result["total"][index]
+    for name, share in FIXED_COST_SHARE.items():
+        cost = result["by_category"][index, CATEGORIES.index(name)]
+        if cost > total * share:
+            suggestions.insert(
+                0,
+                f"{name.capitalize()} is ₹{cost:,.0f} of ₹{total:,.0f} - "
+                f"a cheaper {'stay' if name == 'accommodation' else 'way to get around'} "
+                "saves the most",
+            )
+    return suggestions[:MAX_SUGGESTIONS]
+
+
+def budget_report(
+    frame: CostFrame, index: int = 0, stated_total: Optional[float] = None
+) -> Dict:
+    """JSON-ready cost breakdown and budget check for one itinerary of the frame"""
+    result = analyze(frame)
+    total = float(result["total"][index])
+    budget = frame.budgets[index]
+    days = result["day_itinerary"] == index
+    report = {
+        "total_cost": round(total, 2),
+        "per_person": round(float(result["per_person"][index]), 2),
+        "travellers": int(frame.travellers[index]),
+        "currency": "INR",
+        "per_day": [
+            {"day": int(number), "cost": round(float(cost), 2), "over_budget": bool(o)}
+            for number, cost, o in zip(
+                result["day_number"][days],
+                result["day_total"][days],
+                result["day_over"][days],
+            )
+        ],
+        "per_category": {
+            name: round(float(cost), 2)
+            for name, cost in zip(CATEGORIES, result["by_category"][index])
+            if cost
+        },
+        "budget": None if np.isnan(budget) else float(budget),
+        "over_budget": bool(result["overrun"][index] > 0),
+        "overrun": (
+            None
+            if np.isnan(budget)
+            else round(max(float(result["overrun"][index]), 0.0), 2)
+        ),
+        "suggestions": rebalance(frame, result, index),
+    }
+    if stated_total is not None:
+        report["stated_total"] = stated_total
+        report["stated_total_mismatch"] = bool(
+            abs(stated_total - total) > COST_MISMATCH_RATIO * max(total, 1)
+        )
+    return report
+
+
+def summarize(frame: CostFrame) -> Dict:
+    """Aggregate analytics over every itinerary in the frame"""
+    result = analyze(frame)
+    with_budget = ~np.isnan(frame.budgets)
+    over = result["overrun"] > 0
+    grand_total = result["by_category"].sum()
+    per_day_person = result["per_person"] / np.maximum(result["days"], 1)
+    overrun_pct = result["overrun"][over] / frame.budgets[over] * 100
+    return {
+        "itineraries": len(frame),
+        "activities": int(len(frame.cost)),
+        "with_budget": int(with_budget.sum()),
+        "over_budget": int(over.sum()),
+        "median_overrun_pct": (
+            round(float(np.median(overrun_pct)), 1) if len(overrun_pct) else None
+        ),
+        "days_over_budget": int(result["day_over"].sum()),
+        "mean_cost_per_person_per_day": (
+            round(float(per_day_person[result["days"] > 0].mean()), 2)
+            if (result["days"] > 0).any()
+            else None
+        ),
+        "category_share": {
+            name: round(float(cost / grand_total), 4) if grand_total else 0.0
+            for name, cost in zip(CATEGORIES, result["by_category"].sum(axis=0))
+        },
+    }
+
+
+def _fetch_tuples(db: Session, statement) -> list:
+    """
+    Rows of a Core select as the driver's plain tuples. Skipping SQLAlchemy's
+    Row objects lets NumPy read millions of them in one call.
+    """
+    connection = db.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(str(compiled), params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def load_cost_frame(db: Session, itinerary_query, with_text: bool = False) -> CostFrame:
+    """
+    CostFrame for the itineraries a query selects, from the structured rows.
+    Costs and categories were worked out when the rows were written, so only
+    numeric columns are read; with_text also loads the activity names that
+    suggestions quote.
+    """
+    itineraries = itinerary_query.with_entities(
+        Itinerary.id, Itinerary.budget, Itinerary.group_id
+    ).all()
+    # Subquery, not a huge IN list
+    selected = ItineraryActivity.itinerary_id.in_(
+        itinerary_query.with_entities(Itinerary.id)
+    )
+    rows = _fetch_tuples(
+        db,
+        select(
+            ItineraryActivity.itinerary_id,
+            func.coalesce(ItineraryActivity.day, 0),
+            func.coalesce(ItineraryActivity.cost, 0.0),
+            func.coalesce(ItineraryActivity.category, -1),
+        )
+        .where(selected)
+        .order_by(ItineraryActivity.id),
+    )
+    columns = np.fromiter(rows, ACTIVITY_COLUMNS, len(rows))
+
+    names = locations = ()
+    text = select(ItineraryActivity.activity, ItineraryActivity.location).order_by(
+        ItineraryActivity.id
+    )
+    if with_text:
+        names, locations = (
+            list(zip(*db.execute(text.where(selected)).all())) or [()] * 2
+        )
+    missing = columns["category"] < 0
+    if missing.any():
+        # Rows written before categories were stored
+        if with_text:
+            pending = [(n, l) for n, l, m in zip(names, locations, missing) if m]
+        else:
+            pending = db.execute(
+                text.where(selected, ItineraryActivity.category.is_(None))
+            ).all()
+        columns["category"][missing] = categorize(*zip(*pending))
+
+    # Group itineraries are split between the group's members
+    group_ids = {row.group_id for row in itineraries if row.group_id}
+    sizes = {}
+    for member in (
+        db.query(GroupMember.group_id).filter(GroupMember.group_id.in_(group_ids))
+        if group_ids
+        else []
+    ):
+        sizes[member.group_id] = sizes.get(member.group_id, 0) + 1
+    travellers = {
+        row.id: sizes.get(row.group_id, 1) for row in itineraries if row.group_id
+    }
+
+    return CostFrame.from_columns(
+        [(row.id, row.budget) for row in itineraries],
+        columns,
+        travellers,
+        names,
+        locations,
+    )
+
+
+if __name__ == "__main__":
+    import json
+
+    from models.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        frame = load_cost_frame(db, db.query(Itinerary))
+        print(json.dumps(summarize(frame), indent=2))
+    finally:
+        db.close()
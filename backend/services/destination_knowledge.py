@@ -0,0 +1,317 @@
+"""
+Destination Knowledge
+Per-destination table of the places generated itineraries keep visiting
+(destination_pois), with aggregated coordinates, typical durations and INR
+cost ranges. It is updated from every newly created itinerary and can be
+rebuilt from the stored itinerary_activities rows:
+    python -m services.destination_knowledge
+
+Generation uses it twice: the best known places are listed in the prompt
+(and the model may leave out their coordinates, which saves output tokens),
+and fill_coordinates() puts coordinates back before the route optimizer
+runs. Lookups are one dict access in an in-process cache, refreshed from the
+database after DESTINATION_KNOWLEDGE_TTL seconds.
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.destination import DestinationPOI
+from models.itinerary import Itinerary, ItineraryActivity
+from models.schemas import to_number
+from services.itinerary_store_service import get_itinerary_object
+from services.review_ingestion import normalize_label
+from utils.config import (
+    DESTINATION_POI_MIN_MENTIONS,
+    DESTINATION_PROMPT_POIS,
+    DESTINATION_KNOWLEDGE_TTL,
+    DESTINATION_POI_CONFLICT_KM,
+)
+from utils.route_optimizer import calculate_distance, parse_duration
+
+# "(or similar)", "(optional)" and the like
+PARENTHETICAL = re.compile(r"\([^)]*\)")
+NON_WORD = re.compile(r"[^\w\s]")
+# coordinates["source"] of activities fill_coordinates() completed
+FILLED_SOURCE = "destination_knowledge"
+
+_cache: Dict[str, Tuple[float, "DestinationKnowledge"]] = {}
+_cache_lock = threading.Lock()
+
+
+def poi_key(name) -> str:
+    """Normalized place name - "Ward's Lake" and "wards lake" are one place"""
+    name = PARENTHETICAL.sub(" ", str(name or ""))
+    return normalize_label(NON_WORD.sub("", name))
+
+
+class DestinationKnowledge:
+    def __init__(self, destination: str, pois: Iterable[Dict]):
+        self.destination = destination
+        self.pois = {poi["poi_key"]: poi for poi in pois}
+
+    def __len__(self):
+        return len(self.pois)
+
+    def get(self, name) -> Optional[Dict]:
+        return self.pois.get(poi_key(name))
+
+    @staticmethod
+    def trusted(poi: Dict) -> bool:
+        """Known coordinates that mostly agree with each other"""
+        return bool(poi["coord_count"]) and (
+            poi["coord_conflicts"] * 2 < poi["coord_count"]
+        )
+
+    def coordinates(self, name) -> Optional[Dict]:
+        poi = self.get(name)
+        if poi is None or not self.trusted(poi):
+            return None
+        return {"lat": round(poi["lat"], 4), "lng": round(poi["lng"], 4)}
+
+    def prompt_pois(self, limit: int = DESTINATION_PROMPT_POIS) -> List[Dict]:
+        pois = [
+            poi
+            for poi in self.pois.values()
+            if poi["mentions"] >= DESTINATION_POI_MIN_MENTIONS and self.trusted(poi)
+        ]
+        pois.sort(key=lambda poi: -poi["mentions"])
+        return pois[:limit]
+
+    def prompt(self, limit: int = DESTINATION_PROMPT_POIS) -> str:
+        """Compact place list for the generation prompt, empty if none qualify"""
+        lines = []
+        for poi in self.prompt_pois(limit):
+            line = f"- {poi['name']} | {poi['lat']:.4f},{poi['lng']:.4f}"
+            if poi["duration_minutes"]:
+                line += f" | ~{int(round(poi['duration_minutes']))} min"
+            if poi["cost_count"]:
+                line += f" | ₹{int(poi['cost_min'])}-{int(poi['cost_max'])}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _poi_dict(poi: DestinationPOI) -> Dict:
+    return {
+        column.name: getattr(poi, column.name)
+        for column in DestinationPOI.__table__.columns
+    }
+
+
+def get_destination_knowledge(db: Session, destination: str) -> DestinationKnowledge:
+    """Known places for a destination, from the in-process cache when fresh"""
+    key = normalize_label(destination)
+    cached = _cache.get(key)
+    if cached and time.monotonic() - cached[0] < DESTINATION_KNOWLEDGE_TTL:
+        return cached[1]
+
+    pois = db.query(DestinationPOI).filter(DestinationPOI.destination == key).all()
+    knowledge = DestinationKnowledge(key, [_poi_dict(poi) for poi in pois])
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), knowledge)
+    return knowledge
+
+
+def invalidate_destination_knowledge(destination: Optional[str] = None):
+    with _cache_lock:
+        if destination is None:
+            _cache.clear()
+        else:
+            _cache.pop(normalize_label(destination), None)
+
+
+def _observe(poi: DestinationPOI, activity: Dict):
+    coordinates = activity.get("coordinates")
+    if not isinstance(coordinates, dict):
+        coordinates = {}
+    lat = to_number(coordinates.get("lat"))
+    lng = to_number(coordinates.get("lng"))
+    # Coordinates fill_coordinates() copied from this table are not a new
+    # reading - counting them would let a place outvote every real conflict
+    if coordinates.get("source") == FILLED_SOURCE:
+        lat = lng = None
+    if lat is not None and lng is not None and (lat, lng) != (0, 0):
+        if not poi.coord_count:
+            poi.lat, poi.lng = lat, lng
+        elif (
+            calculate_distance((poi.lat, poi.lng), (lat, lng))
+            > DESTINATION_POI_CONFLICT_KM
+        ):
+            poi.coord_conflicts += 1
+        else:
+            # Running mean of the readings that agree
+            agreeing = poi.coord_count - poi.coord_conflicts
+            poi.lat += (lat - poi.lat) / (agreeing + 1)
+            poi.lng += (lng - poi.lng) / (agreeing + 1)
+        poi.coord_count += 1
+
+    if activity.get("duration"):
+        minutes = parse_duration(str(activity["duration"]))
+        poi.duration_minutes = (
+            (poi.duration_minutes or 0) * poi.duration_count + minutes
+        ) / (poi.duration_count + 1)
+        poi.duration_count += 1
+
+    cost = to_number(activity.get("cost"))
+    if cost is not None:
+        poi.cost_min = cost if poi.cost_min is None else min(poi.cost_min, cost)
+        poi.cost_max = cost if poi.cost_max is None else max(poi.cost_max, cost)
+        poi.cost_avg = ((poi.cost_avg or 0) * poi.cost_count + cost) / (
+            poi.cost_count + 1
+        )
+        poi.cost_count += 1
+
+
+def record_itinerary(db: Session, destination: str, document) -> int:
+    """
+    Fold a newly created itinerary's activities into the destination's places.
+    Does not commit - runs in the caller's transaction. Returns the number of
+    distinct places seen.
+    """
+    key = normalize_label(destination)
+    itinerary_obj = get_itinerary_object(document)
+
+    by_place: Dict[str, Tuple[str, List[Dict]]] = {}
+    for day in itinerary_obj.get("days") or []:
+        if not isinstance(day, dict):
+            continue
+        for activity in day.get("activities") or []:
+            if not isinstance(activity, dict):
+                continue
+            name = activity.get("location") or activity.get("activity")
+            place = poi_key(name)
+            # The destination itself ("Shillong") isn't a place to visit
+            if not place or place == key:
+                continue
+            by_place.setdefault(place, (str(name).strip(), []))[1].append(activity)
+    if not by_place:
+        return 0
+
+    existing = {
+        poi.poi_key: poi
+        for poi in db.query(DestinationPOI).filter(
+            DestinationPOI.destination == key,
+            DestinationPOI.poi_key.in_(list(by_place)),
+        )
+    }
+    for place, (name, activities) in by_place.items():
+        poi = existing.get(place)
+        if poi is None:
+            poi = DestinationPOI(
+                destination=key,
+                poi_key=place,
+                name=PARENTHETICAL.sub("", name).strip() or name,
+                mentions=0,
+                coord_count=0,
+                coord_conflicts=0,
+                duration_count=0,
+                cost_count=0,
+            )
+            db.add(poi)
+        poi.mentions += 1
+        for activity in activities:
+            _observe(poi, activity)
+    return len(by_place)
+
+
+def learn_from_itinerary(destination: str, document):
+    """
+    record_itinerary() in its own transaction, after the itinerary is saved:
+    a clash with a concurrent writer must not cost the user their itinerary
+    """
+    db = SessionLocal()
+    try:
+        record_itinerary(db, destination, document)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Could not update destination knowledge for {destination}: {e}")
+    finally:
+        db.close()
+    invalidate_destination_knowledge(destination)
+
+
+def fill_coordinates(document, knowledge: DestinationKnowledge) -> int:
+    """
+    Give activities without coordinates those of the known place they are at,
+    in place, marked with source FILLED_SOURCE so they are never learned back.
+    Returns how many were filled.
+    """
+    filled = 0
+    if not len(knowledge):
+        return filled
+    for day in get_itinerary_object(document).get("days") or []:
+        if not isinstance(day, dict):
+            continue
+        for activity in day.get("activities") or []:
+            if not isinstance(activity, dict):
+                continue
+            coordinates = activity.get("coordinates")
+            if isinstance(coordinates, dict) and coordinates.get("lat"):
+                continue
+            known = knowledge.coordinates(
+                activity.get("location")
+            ) or knowledge.coordinates(activity.get("activity"))
+            if known:
+                activity["coordinates"] = dict(known, source=FILLED_SOURCE)
+                filled += 1
+    return filled
+
+
+def rebuild_destination_knowledge(db: Session) -> int:
+    """Recompute every destination's places from the stored activity rows"""
+    db.query(DestinationPOI).delete(synchronize_session=False)
+    db.flush()
+
+    itineraries = db.query(Itinerary.id, Itinerary.destination).order_by(Itinerary.id)
+    count = 0
+    for itinerary_id, destination in itineraries:
+        rows = (
+            db.query(ItineraryActivity)
+            .filter(ItineraryActivity.itinerary_id == itinerary_id)
+            .order_by(ItineraryActivity.day, ItineraryActivity.activity_index)
+            .all()
+        )
+        document = {
+            "days": [
+                {
+                    "activities": [
+                        {
+                            "activity": row.activity,
+                            "location": row.location,
+                            "duration": row.duration,
+                            "cost": row.cost,
+                            "coordinates": {"lat": row.lat, "lng": row.lng},
+                            # Keeps the source of filled coordinates
+                            **json.loads(row.extra or "{}"),
+                        }
+                        for row in rows
+                    ]
+                }
+            ]
+        }
+        record_itinerary(db, destination, document)
+        # Autoflush is off - make new places visible to the next itinerary
+        db.flush()
+        count += 1
+    invalidate_destination_knowledge()
+    return count
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        count = rebuild_destination_knowledge(db)
+        db.commit()
+        print(
+            f"Rebuilt destination knowledge from {count} itineraries: "
+            f"{db.query(DestinationPOI).count()} places"
+        )
+    finally:
+        db.close()
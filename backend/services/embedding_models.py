@@ -0,0 +1,62 @@
+"""
+Embedding Models
+Process-wide registry of sentence-transformer models. A model is loaded on
+first use and shared by every caller afterwards, so crawler instances don't
+each pay the load time and memory of their own copy.
+
+Backends (EMBEDDING_BACKEND):
+    torch   the model as published (float32)
+    int8    torch with dynamic int8 quantization of the Linear layers
+    onnx    ONNX Runtime (sentence-transformers >= 3.2, needs onnxruntime)
+All three produce embeddings in the same space, so a store built with one
+can be searched with another; changing EMBEDDING_MODEL needs a new store.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.config import EMBEDDING_MODEL, EMBEDDING_BACKEND
+
+BACKENDS = ("torch", "int8", "onnx")
+
+_models: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+def _load(name: str, backend: str):
+    # Imported on first load - torch alone takes seconds to import
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        return SentenceTransformer(name, device="cpu", backend="onnx")
+
+    model = SentenceTransformer(name, device="cpu")
+    if backend == "int8":
+        import torch
+
+        # In place: a quantized copy would keep the float32 weights around
+        torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    return model
+
+
+def get_embedding_model(name: Optional[str] = None, backend: Optional[str] = None):
+    """Shared model for (name, backend), loaded on the first call"""
+    name = name or EMBEDDING_MODEL
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    key = (name, backend)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        if key not in _models:
+            print(f"Loading embedding model {name} ({backend})...")
+            start = time.perf_counter()
+            _models[key] = _load(name, backend)
+            print(f"Loaded {name} in {time.perf_counter() - start:.1f}s")
+        return _models[key]
@@ -0,0 +1,261 @@
+"""
+Embedding Service
+Micro-batching front end for the embedding model. Callers on any thread (or
+coroutine, via encode_async) submit texts and wait; a dispatcher thread
+gathers everything submitted within EMBEDDING_MAX_WAIT_MS of the first
+request into one batch, so concurrent single-query searches share a forward
+pass instead of each running their own.
+
+Each batch is sorted by text length before it is cut into model batches of
+EMBEDDING_BATCH_SIZE, so short queries aren't padded to the length of a long
+review. With EMBEDDING_WORKERS > 0 the model batches are sharded across that
+many worker processes, each holding its own copy of the model.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from services.embedding_models import get_embedding_model
+from utils.config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_WAIT_MS,
+    EMBEDDING_WORKERS,
+)
+
+# Recent queue waits kept for the latency percentiles in metrics()
+LATENCY_WINDOW = 1000
+
+
+def encode_with_model(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE):
+    return get_embedding_model().encode(
+        texts, batch_size=batch_size, convert_to_numpy=True
+    )
+
+
+def _worker_init(name: str, backend: str):
+    # Load in the worker up front so the first batch doesn't pay for it
+    get_embedding_model(name, backend)
+
+
+def _worker_encode(texts: List[str], name: str, backend: str) -> np.ndarray:
+    return get_embedding_model(name, backend).encode(
+        texts, batch_size=len(texts), convert_to_numpy=True
+    )
+
+
+class _Request:
+    __slots__ = ("texts", "future", "submitted")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+        workers: int = EMBEDDING_WORKERS,
+    ):
+        self.encode_batch = encode or encode_with_model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self._pool = None
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        # Set once a batch has been encoded, i.e. the model is loaded
+        self.ready = threading.Event()
+        self._warm_up = None
+
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            if self.workers > 0:
+                self._pool = ProcessPoolExecutor(
+                    self.workers,
+                    initializer=_worker_init,
+                    initargs=(EMBEDDING_MODEL, EMBEDDING_BACKEND),
+                )
+            self._thread = threading.Thread(
+                target=self._run, name="embedding-dispatcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    # -- callers -----------------------------------------------------------
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for encoding; the future resolves to an (n, dim) array"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return request.future
+        if self._thread is None:
+            self.start()
+        with self._cond:
+            self._queue.append(request)
+            self._cond.notify()
+        return request.future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def warm_up(self) -> Future:
+        """
+        Load the model on the dispatcher thread without waiting for it; sets
+        ready when done. Repeated calls share one warm-up unless it failed.
+        """
+        # _cond's lock is reentrant, so submit() can take it again
+        with self._cond:
+            failed = self._warm_up is not None and (
+                self._warm_up.done() and self._warm_up.exception() is not None
+            )
+            if self._warm_up is None or failed:
+                self._warm_up = self.submit(["warm up"])
+            return self._warm_up
+
+    # -- dispatcher --------------------------------------------------------
+
+    def _collect(self) -> List[_Request]:
+        """Block for the first request, then gather more until the window ends"""
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+            deadline = self._queue[0].submitted + self.max_wait
+            pending = sum(len(r.texts) for r in self._queue)
+            while pending < self.batch_size and not self._stopped:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                pending = sum(len(r.texts) for r in self._queue)
+            requests = list(self._queue)
+            self._queue.clear()
+            return requests
+
+    def _run(self):
+        while not self._stopped:
+            requests = self._collect()
+            if requests:
+                self._process(requests)
+        # Anything still queued at shutdown fails instead of hanging its caller
+        with self._cond:
+            while self._queue:
+                self._queue.popleft().future.set_exception(
+                    RuntimeError("Embedding service stopped")
+                )
+
+    def _process(self, requests: List[_Request]):
+        started = time.perf_counter()
+        texts = [text for request in requests for text in request.texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        chunks = [
+            [texts[i] for i in order[start : start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        try:
+            if self._pool is not None:
+                parts = list(
+                    self._pool.map(
+                        _worker_encode,
+                        chunks,
+                        [EMBEDDING_MODEL] * len(chunks),
+                        [EMBEDDING_BACKEND] * len(chunks),
+                    )
+                )
+            else:
+                parts = [np.asarray(self.encode_batch(chunk)) for chunk in chunks]
+            encoded = np.concatenate(parts)
+        except Exception as e:
+            print(f"Embedding batch of {len(texts)} texts failed: {str(e)}")
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        vectors = np.empty_like(encoded)
+        vectors[order] = encoded
+        elapsed = time.perf_counter() - started
+        position = 0
+        for request in requests:
+            self._waits.append(started - request.submitted)
+            end = position + len(request.texts)
+            request.future.set_result(vectors[position:end])
+            position = end
+
+        self._requests += len(requests)
+        self._texts += len(texts)
+        self._batches += 1
+        self._encode_seconds += elapsed
+        self.ready.set()
+
+    def metrics(self) -> dict:
+        waits = np.asarray(self._waits) * 1000
+        batches = self._batches or 1
+        return {
+            "requests": self._requests,
+            "texts": self._texts,
+            "batches": self._batches,
+            "queued": len(self._queue),
+            "mean_batch_texts": round(self._texts / batches, 1),
+            "encode_texts_per_second": round(
+                self._texts / self._encode_seconds if self._encode_seconds else 0, 1
+            ),
+            "queue_wait_ms_p50": (
+                round(float(np.percentile(waits, 50)), 2) if len(waits) else 0.0
+            ),
+            "queue_wait_ms_p95": (
+                round(float(np.percentile(waits, 95)), 2) if len(waits) else 0.0
+            ),
+        }
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide service around the configured embedding model"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
@@ -1,12 +1,49 @@
 import google.generativeai as genai
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 from fastapi import HTTPException
-from utils.config import GEMINI_API_KEY
+from utils.config import (
+    GEMINI_API_KEY,
+    GEMINI_API_ENDPOINT,
+    GEMINI_TIMEOUT_SECONDS,
+    LONG_TRIP_DAYS,
+    ITINERARY_CHUNK_DAYS,
+    ITINERARY_CHUNK_CONCURRENCY,
+)
 from models.schemas import TripRequest
+from services.itinerary_planner import ChunkedItineraryPlanner
+from services.llm_scheduler import THROTTLE_STATUSES
+from utils.json_repair import parse_llm_json
 
 # Initialize Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+if GEMINI_API_ENDPOINT:
+    genai.configure(
+        api_key=GEMINI_API_KEY,
+        transport="rest",
+        client_options={"api_endpoint": GEMINI_API_ENDPOINT},
+    )
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
+
+# The client would otherwise retry 503s on its own for up to 10 minutes;
+# throttling is handled by the LLM scheduler, which backs off for everyone.
+# Without a timeout a hung call holds its worker slot until the job is
+# abandoned
+REQUEST_OPTIONS = {"retry": None, "timeout": GEMINI_TIMEOUT_SECONDS}
+
+
+def upstream_status(error: Exception) -> Optional[int]:
+    """HTTP status of a failed Gemini call (429 quota, 503 overloaded...)"""
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def throttled_error(error: Exception) -> Optional[HTTPException]:
+    """The HTTPException to hand a 429/503 to the scheduler with, else None"""
+    status = upstream_status(error)
+    if status not in THROTTLE_STATUSES:
+        return None
+    return HTTPException(status_code=status, detail=f"Gemini is throttling: {error}")
 
 
 class GeminiTravelAgent:
@@ -21,6 +58,11 @@ class GeminiTravelAgent:
                 # "max_output_tokens": 8192,
             },
         )
+        self.planner = ChunkedItineraryPlanner(
+            self,
+            chunk_size=ITINERARY_CHUNK_DAYS,
+            max_concurrency=ITINERARY_CHUNK_CONCURRENCY,
+        )
 
     def create_system_prompt(self, user_preferences: dict, trip_context: dict = None):
         base_prompt = """You are Vandreren, an AI travel planning assistant. You help users create personalized travel itineraries for Indian travelers.
@@ -82,6 +124,9 @@ The response should be in JSON format only, no additional text. in the message f
 
         return base_prompt
 
+    def generate_content(self, prompt: str):
+        return self.model.generate_content(prompt, request_options=REQUEST_OPTIONS)
+
     def extract_json(self, text):
         """Extract JSON from response text"""
         start = text.find("{")
@@ -125,18 +170,19 @@ If the query is valid (travel-related), set is_valid to true.
 If the query is invalid (not travel-related), set is_valid to false and explain briefly why."""
 
         try:
-            response = self.model.generate_content(validation_prompt)
+            response = self.generate_content(validation_prompt)
             result_text = response.text.strip()
 
-            # Extract JSON from response
-            json_str = self.extract_json(result_text)
-            result = json.loads(json_str)
+            result, _ = parse_llm_json(result_text)
 
             return {
                 "is_valid": result.get("is_valid", False),
                 "reason": result.get("reason", "Unknown reason"),
             }
         except Exception as e:
+            throttled = throttled_error(e)
+            if throttled:
+                raise throttled
             print(f"Query validation error: {str(e)}")
             # Default to allowing the query if validation fails
             return {
@@ -145,9 +191,45 @@ If the query is invalid (not travel-related), set is_valid to false and explain
             }
 
     async def generate_itinerary(
-        self, trip_request: TripRequest, user_preferences: dict
+        self,
+        trip_request: TripRequest,
+        user_preferences: dict,
+        review_snippets: str = "",
+        destination_knowledge: str = "",
     ):
         system_prompt = self.create_system_prompt(user_preferences)
+        if destination_knowledge:
+            system_prompt += (
+                "\n\nPlaces travellers here often visit (name | lat,lng | typical time "
+                "| typical cost in ₹). Use them where they fit the trip and write their "
+                'names exactly as listed in "location". Leave out "coordinates" for these '
+                "places - they are filled in from this list:\n" + destination_knowledge
+            )
+        if review_snippets:
+            # In the system prompt so every chunk of a long trip sees them too
+            system_prompt += (
+                "\n\nWhat recent visitors say about places at this destination "
+                "(prefer well-reviewed places, avoid ones with complaints):\n"
+                + review_snippets
+            )
+
+        # Long trips: skeleton + parallel day chunks instead of one huge response
+        dates = ChunkedItineraryPlanner.trip_dates(
+            trip_request.start_date, trip_request.end_date
+        )
+        if len(dates) >= LONG_TRIP_DAYS:
+            try:
+                print(
+                    f"Generating {len(dates)}-day itinerary for {trip_request.destination} in chunks..."
+                )
+                return await self.planner.generate(system_prompt, trip_request, dates)
+            except Exception as e:
+                throttled = throttled_error(e)
+                if throttled:
+                    raise throttled
+                print(
+                    f"Chunked generation failed, falling back to a single call: {type(e).__name__}: {str(e)}"
+                )
 
         user_prompt = f"""
 Create a detailed travel itinerary for:
@@ -176,9 +258,7 @@ Please provide a structured JSON itinerary following the format specified. Stric
                 )
 
                 # Generate content without custom timeout parameter
-                response = self.model.generate_content(
-                    system_prompt + "\n\n" + user_prompt
-                )
+                response = self.generate_content(system_prompt + "\n\n" + user_prompt)
 
                 print(f"Response received: {response.text[:200]}...")
                 return self.extract_json(response.text)
@@ -189,13 +269,16 @@ Please provide a structured JSON itinerary following the format specified. Stric
                 print(
                     f"Error in generate_itinerary (attempt {attempt + 1}): {error_type}: {error_msg}"
                 )
+                throttled = throttled_error(e)
+                if throttled:
+                    # The scheduler slows down and queues the job again
+                    raise throttled
 
                 if attempt < max_retries - 1:
                     # Check if it's a retryable error
                     if (
                         "timeout" in error_msg.lower()
                         or "deadline" in error_msg.lower()
-                        or "503" in error_msg
                         or "504" in error_msg
                     ):
                         print(f"Retrying in {retry_delay} seconds...")
@@ -231,7 +314,7 @@ Please provide a structured JSON itinerary following the format specified. Stric
 
         for attempt in range(max_retries):
             try:
-                response = self.model.generate_content(full_prompt)
+                response = self.generate_content(full_prompt)
                 return self.extract_json(response.text)
 
             except Exception as e:
@@ -240,6 +323,9 @@ Please provide a structured JSON itinerary following the format specified. Stric
                 print(
                     f"Error in chat_response (attempt {attempt + 1}): {error_type}: {error_msg}"
                 )
+                throttled = throttled_error(e)
+                if throttled:
+                    raise throttled
 
                 if attempt < max_retries - 1:
                     if (
@@ -257,6 +343,86 @@ Please provide a structured JSON itinerary following the format specified. Stric
                     status_code=500, detail=f"Error generating response: {error_msg}"
                 )
 
+    async def regenerate_days(
+        self,
+        itinerary_obj: dict,
+        days: List[dict],
+        update_request: str,
+        user_preferences: dict,
+    ):
+        """
+        Regenerate only the given days of an itinerary.
+        Returns (response_text, usage) where usage has prompt/output token counts
+        when the API reports them.
+        """
+        day_numbers = [day.get("day") for day in days]
+        prompt = f"""You are Vandreren, an AI travel planning assistant for Indian travelers.
+
+User Preferences:
+- Interests: {user_preferences.get("interests", [])}
+- Travel Style: {user_preferences.get("travel_style", "balanced")}
+- Dietary Restrictions: {user_preferences.get("dietary_restrictions", [])}
+- Budget Preference: {user_preferences.get("budget_preference", "mid-range")}
+
+Trip: {itinerary_obj.get("destination")} ({itinerary_obj.get("duration")}), {len(itinerary_obj.get("days", []))} days in total.
+
+The user wants to change ONLY day(s) {day_numbers} of their itinerary. Current version of those days:
+{json.dumps(days, ensure_ascii=False)}
+
+User's update request: {update_request}
+
+Return ONLY a JSON object, no other text, in this format:
+{{
+  "message": "short note on what changed",
+  "days": [ <the updated day objects, same structure as above, keeping their "day" numbers and dates> ]
+}}
+All costs must be numbers in Indian Rupees (₹). Keep activity times in chronological order and include coordinates for every activity."""
+
+        max_retries = 2
+        retry_delay = 2
+
+        for attempt in range(max_retries):
+            try:
+                response = self.generate_content(prompt)
+                usage = {}
+                usage_metadata = getattr(response, "usage_metadata", None)
+                if usage_metadata is not None:
+                    usage = {
+                        "prompt_tokens": getattr(
+                            usage_metadata, "prompt_token_count", None
+                        ),
+                        "output_tokens": getattr(
+                            usage_metadata, "candidates_token_count", None
+                        ),
+                    }
+                return self.extract_json(response.text), usage
+
+            except Exception as e:
+                error_type = type(e).__name__
+                error_msg = str(e)
+                print(
+                    f"Error in regenerate_days (attempt {attempt + 1}): {error_type}: {error_msg}"
+                )
+                throttled = throttled_error(e)
+                if throttled:
+                    raise throttled
+
+                if attempt < max_retries - 1:
+                    if (
+                        "timeout" in error_msg.lower()
+                        or "deadline" in error_msg.lower()
+                    ):
+                        print(f"Retrying in {retry_delay} seconds...")
+                        import asyncio
+
+                        await asyncio.sleep(retry_delay)
+                        retry_delay *= 2
+                        continue
+
+                raise HTTPException(
+                    status_code=500, detail=f"Error regenerating days: {error_msg}"
+                )
+
 
 # Initialize Gemini agent singleton
 gemini_agent = GeminiTravelAgent()
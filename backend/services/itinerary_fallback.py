@@ -0,0 +1,232 @@
+"""
+Itinerary Fallback
+What to give a user asking for an itinerary while Gemini can't be reached
+(the LLM circuit breaker is open, or the call failed): rather than an error,
+a stand-in built from what is already stored for the destination.
+
+- a similar stored itinerary the user can already see (their own, or one
+  shared with a group they are in) - same destination, long enough for the
+  trip if possible, closest in number of days, the user's own trips first,
+  then closest in cost, then the newest - with its days renumbered and
+  re-dated for the new trip, and topped up from the destination knowledge
+  when it is still shorter. Other users' itineraries are private and never
+  used, and neither are earlier stand-ins (Itinerary.degraded).
+- otherwise, one put together from the destination knowledge: the best known
+  places, three a day, with their usual durations and costs
+
+The document says in its message that it is a stand-in, and the user can ask
+for changes once the assistant is back.
+"""
+
+import json
+from typing import Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from models.itinerary import Itinerary
+from models.schemas import TripRequest, to_number
+from services.destination_knowledge import DestinationKnowledge, poi_key
+from services.itinerary_planner import ChunkedItineraryPlanner
+from services.itinerary_store_service import get_itinerary_object
+from services.review_ingestion import normalize_label
+from utils.permissions import get_user_group_ids
+
+# Stored itineraries looked at, newest first
+SIMILAR_CANDIDATES = 50
+PLACES_PER_DAY = 3
+DAY_START_MINUTES = 9 * 60
+# Added between places when laying out a knowledge-built day
+TRAVEL_MINUTES = 30
+
+FALLBACK_MESSAGE = (
+    "Our travel assistant is temporarily unavailable, so here is an itinerary "
+    "based on {source}. You can ask for changes once it is back."
+)
+
+
+async def generate_with_fallback(
+    db: Session,
+    generation: Awaitable[str],
+    trip_request: TripRequest,
+    knowledge: DestinationKnowledge,
+    user_id: Optional[int] = None,
+) -> Tuple[str, bool]:
+    """
+    Await the itinerary generation; if Gemini is unavailable, return a
+    stand-in instead. The flag says whether it is one.
+    """
+    try:
+        return await generation, False
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise
+        itinerary_text = fallback_itinerary(db, trip_request, knowledge, user_id)
+        if itinerary_text is None:
+            raise
+        print(
+            f"Itinerary generation failed ({e.status_code}: {e.detail}), "
+            f"serving a stand-in for {trip_request.destination}"
+        )
+        return itinerary_text, True
+
+
+def fallback_itinerary(
+    db: Session,
+    trip_request: TripRequest,
+    knowledge: DestinationKnowledge,
+    user_id: Optional[int] = None,
+) -> Optional[str]:
+    """JSON text of a stand-in itinerary, or None if nothing is stored to build one"""
+    dates = ChunkedItineraryPlanner.trip_dates(
+        trip_request.start_date, trip_request.end_date
+    )
+    source = "a similar trip"
+    itinerary_obj = similar_itinerary(
+        db, trip_request.destination, len(dates), trip_request.budget, user_id
+    )
+    if itinerary_obj is None:
+        source = "popular places in " + trip_request.destination
+        itinerary_obj = knowledge_itinerary(knowledge, len(dates) or 1)
+    if itinerary_obj is None:
+        return None
+
+    days = [day for day in itinerary_obj.get("days", []) if isinstance(day, dict)]
+    if dates:
+        days = days[: len(dates)]
+        if len(days) < len(dates) and source == "a similar trip":
+            # A shorter trip is topped up with known places it doesn't visit
+            visited = {
+                poi_key(activity.get("location") or activity.get("activity"))
+                for day in days
+                for activity in day.get("activities") or []
+                if isinstance(activity, dict)
+            }
+            extra = knowledge_itinerary(knowledge, len(dates) - len(days), visited)
+            days += extra["days"] if extra else []
+    for index, day in enumerate(days):
+        day["day"] = index + 1
+        if index < len(dates):
+            day["date"] = dates[index]
+    itinerary_obj["days"] = days
+    itinerary_obj["destination"] = trip_request.destination
+    itinerary_obj["duration"] = f"{len(days)} day{'s' if len(days) != 1 else ''}"
+    itinerary_obj["total_estimated_cost"] = sum(
+        to_number(activity.get("cost")) or 0
+        for day in days
+        for activity in day.get("activities", [])
+        if isinstance(activity, dict)
+    )
+    itinerary_obj["currency"] = "INR"
+    return json.dumps(
+        {
+            "message": FALLBACK_MESSAGE.format(source=source),
+            "itinerary": itinerary_obj,
+        },
+        ensure_ascii=False,
+    )
+
+
+def similar_itinerary(
+    db: Session,
+    destination: str,
+    days: int,
+    budget: Optional[float] = None,
+    user_id: Optional[int] = None,
+) -> Optional[Dict]:
+    """The closest stored itinerary object the user may see, or None"""
+    if user_id is None:
+        return None
+    # Same rule as can_access_itinerary: owner, or the group it's shared with
+    accessible = Itinerary.user_id == user_id
+    group_ids = get_user_group_ids(db, user_id)
+    if group_ids:
+        accessible = or_(
+            accessible,
+            and_(Itinerary.is_group == 1, Itinerary.group_id.in_(group_ids)),
+        )
+
+    candidates = (
+        db.query(
+            Itinerary.id,
+            Itinerary.user_id,
+            Itinerary.day_count,
+            Itinerary.total_cost,
+        )
+        .filter(
+            func.lower(func.trim(Itinerary.destination)) == normalize_label(destination)
+        )
+        .filter(Itinerary.day_count > 0)
+        .filter(accessible)
+        # Never a copy of a copy
+        .filter(func.coalesce(Itinerary.degraded, 0) == 0)
+        .order_by(Itinerary.created_at.desc())
+        .limit(SIMILAR_CANDIDATES)
+        .all()
+    )
+
+    def distance(item):
+        position, candidate = item
+        return (
+            # Trips long enough to cover every requested day first
+            candidate.day_count < days,
+            abs(candidate.day_count - days) if days else 0,
+            candidate.user_id != user_id,
+            (
+                abs((candidate.total_cost or 0) - budget) / budget
+                if budget and candidate.total_cost is not None
+                else 0
+            ),
+            position,
+        )
+
+    for _, candidate in sorted(enumerate(candidates), key=distance):
+        itinerary = db.get(Itinerary, candidate.id)
+        try:
+            itinerary_obj = get_itinerary_object(itinerary.itinerary_data)
+        except (TypeError, ValueError):
+            continue
+        if itinerary_obj.get("days"):
+            return itinerary_obj
+    return None
+
+
+def knowledge_itinerary(
+    knowledge: DestinationKnowledge, days: int, skip: Iterable[str] = ()
+) -> Optional[Dict]:
+    """
+    An itinerary of the destination's best known places, leaving out the
+    poi_keys in skip, or None if too few
+    """
+    skip = set(skip)
+    pois = [
+        poi
+        for poi in knowledge.prompt_pois(limit=len(knowledge))
+        if poi["poi_key"] not in skip
+    ][: days * PLACES_PER_DAY]
+    if not pois:
+        return None
+    plan: List[Dict] = []
+    for index in range(min(days, -(-len(pois) // PLACES_PER_DAY))):
+        minutes = DAY_START_MINUTES
+        activities = []
+        for poi in pois[index * PLACES_PER_DAY : (index + 1) * PLACES_PER_DAY]:
+            duration = int(round(poi["duration_minutes"] or 60))
+            activities.append(
+                {
+                    "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+                    "activity": f"Visit {poi['name']}",
+                    "location": poi["name"],
+                    "duration": f"{duration} minutes",
+                    "cost": int(round(poi["cost_avg"] or 0)),
+                    "description": "A favourite in other travellers' itineraries",
+                    "coordinates": {
+                        "lat": round(poi["lat"], 4),
+                        "lng": round(poi["lng"], 4),
+                    },
+                }
+            )
+            minutes += duration + TRAVEL_MINUTES
+        plan.append({"day": index + 1, "theme": "Highlights", "activities": activities})
+    return {"days": plan}
@@ -0,0 +1,166 @@
+"""
+Chunked Itinerary Planner
+Long trips are generated in three steps instead of one huge completion:
+1. a cheap skeleton call that fixes each day's date, theme and region
+2. the days themselves, generated in parallel chunks with bounded concurrency
+3. stitching and validating the chunks into one itinerary document
+Wall-clock time drops roughly with the number of chunks, and each response is
+small enough not to get truncated.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from services.partial_update_service import validate_day
+from services.itinerary_store_service import to_number
+from utils.json_repair import parse_llm_json, dumps_compact
+
+
+class ChunkedItineraryPlanner:
+    def __init__(self, model, chunk_size: int = 4, max_concurrency: int = 3):
+        """
+        model is anything with a blocking generate_content(prompt) returning an
+        object with .text - the Gemini model, or a local stub for testing.
+        """
+        self.model = model
+        self.chunk_size = chunk_size
+        # A thread semaphore: LLM worker threads each run their own event loop
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+
+    @staticmethod
+    def trip_dates(start_date: str, end_date: str) -> List[str]:
+        """Every date of the trip as YYYY-MM-DD, or [] if the dates can't be parsed"""
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d")
+            end = datetime.strptime(end_date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return []
+        if end < start:
+            return []
+        return [
+            (start + timedelta(days=i)).strftime("%Y-%m-%d")
+            for i in range((end - start).days + 1)
+        ]
+
+    def _call_model(self, prompt: str):
+        with self.slots:
+            return self.model.generate_content(prompt)
+
+    async def _generate_json(self, prompt: str):
+        """One model call on a worker thread, parsed as JSON"""
+        response = await asyncio.to_thread(self._call_model, prompt)
+        return parse_llm_json(response.text)[0]
+
+    async def generate_skeleton(
+        self, system_prompt: str, trip_request, dates: List[str]
+    ) -> List[dict]:
+        prompt = f"""{system_prompt}
+
+Plan ONLY the outline of a {len(dates)}-day trip to {trip_request.destination} ({dates[0]} to {dates[-1]}).
+Budget: ₹{trip_request.budget} (if provided). Special requests: {trip_request.preferences}
+
+Return ONLY a JSON object, no other text:
+{{"days": [{{"day": 1, "date": "YYYY-MM-DD", "theme": "string", "region": "area of the city/region to cover"}}]}}
+Give exactly {len(dates)} days. Group nearby areas on the same day and avoid repeating places."""
+
+        skeleton = await self._generate_json(prompt)
+        days = skeleton.get("days", []) if isinstance(skeleton, dict) else []
+
+        # Trust our own calendar over the model's, and pad/trim to the trip length
+        by_number = {d.get("day"): d for d in days if isinstance(d, dict)}
+        return [
+            {
+                "day": i + 1,
+                "date": date,
+                "theme": by_number.get(i + 1, {}).get("theme", ""),
+                "region": by_number.get(i + 1, {}).get("region", ""),
+            }
+            for i, date in enumerate(dates)
+        ]
+
+    async def generate_chunk(
+        self, system_prompt: str, trip_request, skeleton: List[dict], chunk: List[dict]
+    ) -> List[dict]:
+        outline = "\n".join(
+            f"- Day {d['day']} ({d['date']}): {d['theme']} - {d['region']}"
+            for d in skeleton
+        )
+        prompt = f"""{system_prompt}
+
+Full trip outline for {trip_request.destination} (already agreed, do not change it):
+{outline}
+
+Write the detailed plan for ONLY days {chunk[0]['day']} to {chunk[-1]['day']}, following their outline.
+Budget for the whole trip: ₹{trip_request.budget} (if provided). Special requests: {trip_request.preferences}
+Order activities to minimise travel, keep times chronological and include coordinates.
+
+Return ONLY a JSON object, no other text:
+{{"days": [ <day objects with "day", "date", "theme" and "activities" as in the format above> ]}}"""
+
+        for attempt in range(2):
+            try:
+                result = await self._generate_json(prompt)
+                days = result.get("days", []) if isinstance(result, dict) else result
+                by_number = {d.get("day"): d for d in days if isinstance(d, dict)}
+                chunk_days = []
+                for planned in chunk:
+                    day = by_number.get(planned["day"])
+                    problem = validate_day(day)
+                    if problem:
+                        raise ValueError(problem)
+                    day = dict(day, day=planned["day"], date=planned["date"])
+                    day.setdefault("theme", planned["theme"])
+                    chunk_days.append(day)
+                return chunk_days
+            except Exception as e:
+                print(
+                    f"Chunk days {chunk[0]['day']}-{chunk[-1]['day']} failed (attempt {attempt + 1}): {str(e)}"
+                )
+                if attempt == 1:
+                    raise
+
+    async def generate(self, system_prompt: str, trip_request, dates: List[str]) -> str:
+        """Generate a full itinerary document (same shape as a single-call response)"""
+        started_at = time.time()
+        skeleton = await self.generate_skeleton(system_prompt, trip_request, dates)
+        chunks = [
+            skeleton[i : i + self.chunk_size]
+            for i in range(0, len(skeleton), self.chunk_size)
+        ]
+        print(
+            f"Skeleton ready in {time.time() - started_at:.1f}s, generating {len(chunks)} chunks in parallel"
+        )
+
+        results = await asyncio.gather(
+            *(
+                self.generate_chunk(system_prompt, trip_request, skeleton, chunk)
+                for chunk in chunks
+            )
+        )
+        days = [day for chunk_days in results for day in chunk_days]
+
+        total_cost = sum(
+            to_number(activity.get("cost")) or 0
+            for day in days
+            for activity in day.get("activities", [])
+            if isinstance(activity, dict)
+        )
+        document = {
+            "message": f"Here is your {len(days)}-day itinerary for {trip_request.destination}",
+            "itinerary": {
+                "destination": trip_request.destination,
+                "duration": f"{len(days)} days",
+                "total_estimated_cost": (
+                    int(total_cost) if float(total_cost).is_integer() else total_cost
+                ),
+                "currency": "INR",
+                "days": days,
+            },
+        }
+        print(
+            f"Chunked itinerary for {len(days)} days generated in {time.time() - started_at:.1f}s"
+        )
+        return dumps_compact(document)
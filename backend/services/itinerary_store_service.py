@@ -0,0 +1,394 @@
+"""
+Structured itinerary storage
+Keeps the itinerary_days / itinerary_activities tables and the denormalized
+counters on Itinerary in sync with the itinerary JSON document, and rebuilds
+day/activity JSON from those rows for clients that only need part of it.
+"""
+
+import copy
+import json
+from pydantic import ValidationError
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.itinerary import Itinerary, ItineraryDay, ItineraryActivity
+from models.schemas import ItineraryDocument, to_number, wrap_bare_itinerary
+from services.cost_analytics import category_of
+
+DAY_KEYS = ("day", "date", "theme", "activities")
+ACTIVITY_KEYS = (
+    "time",
+    "activity",
+    "location",
+    "duration",
+    "cost",
+    "description",
+    "coordinates",
+)
+
+
+def _clean_number(value: Optional[float]):
+    """Give back ints for whole numbers so reassembled JSON matches the original"""
+    if value is not None and float(value).is_integer():
+        return int(value)
+    return value
+
+
+class ItineraryFormatError(ValueError):
+    """A generated itinerary that doesn't fit the schema, even after coercion"""
+
+
+def validate_itinerary_document(document) -> Tuple[dict, str]:
+    """
+    Validate an itinerary (JSON text or dict) against ItineraryDocument once, on
+    the way in. Returns the normalized document and its canonical compact JSON,
+    which is what gets stored. Fields the model got wrong are coerced (see
+    _coerce_invalid_fields); raises ItineraryFormatError if it still doesn't fit.
+    """
+    try:
+        if isinstance(document, (str, bytes)):
+            model = ItineraryDocument.model_validate_json(document)
+        else:
+            model = ItineraryDocument.model_validate(document)
+    except ValidationError as e:
+        model = _validate_coerced(document, e)
+    return (
+        model.model_dump(exclude_unset=True),
+        model.model_dump_json(exclude_unset=True),
+    )
+
+
+def validate_itinerary_days(document: dict, day_numbers: List[int]) -> dict:
+    """
+    Validate only the given days of an already stored document (as after a
+    partial update), coercing them as validate_itinerary_document does.
+    Returns a copy of document with those days normalized.
+    """
+    itinerary_obj = get_itinerary_object(document)
+    days = itinerary_obj.get("days") or []
+    positions = [
+        position
+        for position, day in enumerate(days)
+        if isinstance(day, dict) and _day_number(day, position) in day_numbers
+    ]
+    validated, _ = validate_itinerary_document(
+        {"itinerary": {"days": [days[position] for position in positions]}}
+    )
+    days = list(days)
+    for position, day in zip(positions, validated["itinerary"]["days"]):
+        days[position] = day
+    return dict(document, itinerary=dict(itinerary_obj, days=days))
+
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    where = ".".join(str(part) for part in first["loc"]) or "document"
+    return (
+        f"Generated itinerary does not match the itinerary format "
+        f"({error.error_count()} error(s), first at {where}: {first['msg']})"
+    )
+
+
+def _validate_coerced(document, error: ValidationError) -> ItineraryDocument:
+    if isinstance(document, (str, bytes)):
+        try:
+            document = json.loads(document)
+        except ValueError:
+            raise ItineraryFormatError(_describe(error)) from error
+    document = wrap_bare_itinerary(document)
+    if not isinstance(document, dict):
+        raise ItineraryFormatError(_describe(error)) from error
+    try:
+        return ItineraryDocument.model_validate(
+            _coerce_invalid_fields(document, error.errors())
+        )
+    except ValidationError as e:
+        raise ItineraryFormatError(_describe(e)) from e
+
+
+def _coerce_invalid_fields(document: dict, errors: list) -> dict:
+    """
+    Copy of document with each field a validation error points at replaced by
+    the nearest value that fits: an activity given as a bare string becomes
+    {"activity": ...}, a list of words in a text field is joined, a
+    "days"/"activities" that isn't a list is emptied, any other bad list item
+    is dropped and any other bad field is cleared.
+    """
+    document = copy.deepcopy(document)
+    dropped = {}
+    for error in errors:
+        parent, node, path = None, document, []
+        # Follow the location as far as it exists in the data; the rest names
+        # union members or missing keys
+        for part in error["loc"]:
+            found = (isinstance(node, dict) and part in node) or (
+                isinstance(node, list) and isinstance(part, int) and part < len(node)
+            )
+            if not found:
+                break
+            parent, node = node, node[part]
+            path.append(part)
+        if parent is None:
+            continue
+        key = path[-1]
+        if isinstance(parent, list):
+            if path[-2:-1] == ["activities"] and isinstance(node, str):
+                parent[key] = {"activity": node}
+            else:
+                dropped.setdefault(id(parent), (parent, set()))[1].add(key)
+        elif key in ("days", "activities"):
+            parent[key] = []
+        elif isinstance(node, list) and all(
+            isinstance(item, (str, int, float)) for item in node
+        ):
+            parent[key] = ", ".join(str(item) for item in node)
+        else:
+            parent[key] = None
+    for items, indexes in dropped.values():
+        for index in sorted(indexes, reverse=True):
+            del items[index]
+    return document
+
+
+def load_itinerary_document(text) -> dict:
+    """
+    Parse a stored itinerary blob into the document shape,
+    {"message": ..., "itinerary": {...}}. Blobs stored before documents were
+    validated on the way in may be the bare itinerary; this is the one place
+    they are wrapped.
+    """
+    document = json.loads(text)
+    if not isinstance(document, dict):
+        return {"itinerary": {}}
+    return wrap_bare_itinerary(document)
+
+
+def get_itinerary_object(document) -> dict:
+    """
+    Return the inner itinerary dict of a document, or of a stored blob if
+    given JSON text
+    """
+    if isinstance(document, (str, bytes)):
+        document = load_itinerary_document(document)
+    itinerary_obj = document.get("itinerary") if isinstance(document, dict) else None
+    return itinerary_obj if isinstance(itinerary_obj, dict) else {}
+
+
+def _day_number(day: dict, position: int) -> int:
+    day_number = day.get("day")
+    return day_number if isinstance(day_number, int) else position + 1
+
+
+def _build_day_rows(
+    itinerary_id: int, position: int, day: dict
+) -> Tuple[ItineraryDay, List[ItineraryActivity]]:
+    """The ItineraryDay row of one day dict (with its counts) and its activity rows"""
+    day_number = _day_number(day, position)
+    activity_rows = []
+    day_cost = 0.0
+    for activity_index, activity in enumerate(day.get("activities") or []):
+        if not isinstance(activity, dict):
+            continue
+        coordinates = activity.get("coordinates")
+        if not isinstance(coordinates, dict):
+            coordinates = {}
+        cost = to_number(activity.get("cost"))
+        extra = {k: v for k, v in activity.items() if k not in ACTIVITY_KEYS}
+        # Text such as "₹500 - ₹800" or "Free" is kept as written, as
+        # validation does; the column holds its first number for the totals
+        if isinstance(activity.get("cost"), str):
+            extra.setdefault("cost_text", activity["cost"])
+        if set(coordinates) - {"lat", "lng"}:
+            extra["coordinates"] = coordinates
+
+        activity_rows.append(
+            ItineraryActivity(
+                itinerary_id=itinerary_id,
+                day=day_number,
+                activity_index=activity_index,
+                time=activity.get("time"),
+                activity=activity.get("activity"),
+                location=activity.get("location"),
+                duration=activity.get("duration"),
+                cost=cost,
+                category=category_of(
+                    f"{activity.get('activity') or ''} "
+                    f"{activity.get('location') or ''}"
+                ),
+                description=activity.get("description"),
+                lat=to_number(coordinates.get("lat")),
+                lng=to_number(coordinates.get("lng")),
+                extra=json.dumps(extra, ensure_ascii=False) if extra else None,
+            )
+        )
+        day_cost += cost or 0.0
+
+    day_extra = {k: v for k, v in day.items() if k not in DAY_KEYS}
+    day_row = ItineraryDay(
+        itinerary_id=itinerary_id,
+        day=day_number,
+        position=position,
+        date=day.get("date"),
+        theme=day.get("theme"),
+        activity_count=len(activity_rows),
+        total_cost=day_cost,
+        extra=json.dumps(day_extra, ensure_ascii=False) if day_extra else None,
+    )
+    return day_row, activity_rows
+
+
+def sync_itinerary_structure(db: Session, itinerary: Itinerary, document) -> None:
+    """
+    Replace the structured rows of an itinerary with the contents of document
+    and refresh its counters. Does not commit - runs in the caller's transaction.
+    """
+    itinerary_obj = get_itinerary_object(document)
+
+    if itinerary.id is None:
+        db.flush()
+
+    db.query(ItineraryActivity).filter(
+        ItineraryActivity.itinerary_id == itinerary.id
+    ).delete(synchronize_session=False)
+    db.query(ItineraryDay).filter(ItineraryDay.itinerary_id == itinerary.id).delete(
+        synchronize_session=False
+    )
+
+    day_rows = []
+    activity_rows = []
+    for position, day in enumerate(itinerary_obj.get("days") or []):
+        if not isinstance(day, dict):
+            continue
+        day_row, rows = _build_day_rows(itinerary.id, position, day)
+        day_rows.append(day_row)
+        activity_rows.extend(rows)
+
+    db.add_all(day_rows)
+    db.add_all(activity_rows)
+
+    itinerary.day_count = len(day_rows)
+    itinerary.total_activities = sum(row.activity_count for row in day_rows)
+    itinerary.total_cost = sum(row.total_cost for row in day_rows)
+
+
+def sync_itinerary_days(
+    db: Session, itinerary: Itinerary, document, day_numbers: List[int]
+) -> None:
+    """
+    Replace the structured rows of only the given days with their contents in
+    document and move the counters by the difference; the other days' rows
+    are left as they are. Does not commit.
+    """
+    if itinerary.total_activities is None:
+        # No rows to update yet
+        sync_itinerary_structure(db, itinerary, document)
+        return
+
+    old_activities, old_cost = (
+        db.query(
+            func.coalesce(func.sum(ItineraryDay.activity_count), 0),
+            func.coalesce(func.sum(ItineraryDay.total_cost), 0.0),
+        )
+        .filter(
+            ItineraryDay.itinerary_id == itinerary.id,
+            ItineraryDay.day.in_(day_numbers),
+        )
+        .one()
+    )
+    db.query(ItineraryActivity).filter(
+        ItineraryActivity.itinerary_id == itinerary.id,
+        ItineraryActivity.day.in_(day_numbers),
+    ).delete(synchronize_session=False)
+    db.query(ItineraryDay).filter(
+        ItineraryDay.itinerary_id == itinerary.id,
+        ItineraryDay.day.in_(day_numbers),
+    ).delete(synchronize_session=False)
+
+    day_rows = []
+    for position, day in enumerate(get_itinerary_object(document).get("days") or []):
+        if isinstance(day, dict) and _day_number(day, position) in day_numbers:
+            day_row, activity_rows = _build_day_rows(itinerary.id, position, day)
+            day_rows.append(day_row)
+            db.add(day_row)
+            db.add_all(activity_rows)
+
+    itinerary.total_activities += (
+        sum(row.activity_count for row in day_rows) - old_activities
+    )
+    itinerary.total_cost = (
+        (itinerary.total_cost or 0.0)
+        + sum(row.total_cost for row in day_rows)
+        - old_cost
+    )
+
+
+def ensure_itinerary_structure(db: Session, itinerary: Itinerary) -> None:
+    """
+    Backfill rows and counters for itineraries written before structured
+    storage existed. Raises json.JSONDecodeError if the stored blob is corrupt.
+    """
+    if itinerary.total_activities is not None:
+        return
+    sync_itinerary_structure(db, itinerary, itinerary.itinerary_data)
+    db.commit()
+
+
+def ensure_itinerary_structures(db: Session, itinerary_query) -> List[int]:
+    """
+    ensure_itinerary_structure for each itinerary the query selects that has
+    no rows yet. Returns the ids of those whose stored blob can't be parsed;
+    they are left without rows.
+    """
+    unreadable = []
+    for itinerary in itinerary_query.filter(Itinerary.total_activities.is_(None)).all():
+        itinerary_id = itinerary.id
+        try:
+            ensure_itinerary_structure(db, itinerary)
+        except (TypeError, ValueError):
+            db.rollback()
+            unreadable.append(itinerary_id)
+    return unreadable
+
+
+def assemble_itinerary_days(
+    db: Session, itinerary_id: int, day: Optional[int] = None
+) -> List[dict]:
+    """Rebuild day dicts (with activities) from the structured rows"""
+    day_query = db.query(ItineraryDay).filter(ItineraryDay.itinerary_id == itinerary_id)
+    activity_query = db.query(ItineraryActivity).filter(
+        ItineraryActivity.itinerary_id == itinerary_id
+    )
+    if day is not None:
+        day_query = day_query.filter(ItineraryDay.day == day)
+        activity_query = activity_query.filter(ItineraryActivity.day == day)
+
+    activities_by_day = {}
+    for row in activity_query.order_by(
+        ItineraryActivity.day, ItineraryActivity.activity_index
+    ):
+        activity = {
+            "time": row.time,
+            "activity": row.activity,
+            "location": row.location,
+            "duration": row.duration,
+            "cost": _clean_number(row.cost),
+            "description": row.description,
+        }
+        activity = {k: v for k, v in activity.items() if v is not None}
+        if row.lat is not None and row.lng is not None:
+            activity["coordinates"] = {"lat": row.lat, "lng": row.lng}
+        if row.extra:
+            activity.update(json.loads(row.extra))
+        activities_by_day.setdefault(row.day, []).append(activity)
+
+    days = []
+    for row in day_query.order_by(ItineraryDay.position):
+        day_dict = {"day": row.day, "date": row.date, "theme": row.theme}
+        day_dict = {k: v for k, v in day_dict.items() if v is not None}
+        if row.extra:
+            day_dict.update(json.loads(row.extra))
+        day_dict["activities"] = activities_by_day.get(row.day, [])
+        days.append(day_dict)
+
+    return days
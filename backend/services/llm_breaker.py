@@ -0,0 +1,176 @@
+"""
+LLM Circuit Breaker
+Stops sending jobs to Gemini while it is down or far too slow, instead of
+letting every request sit through its timeouts and retries.
+
+- closed: jobs go through. The outcome of each attempt upstream is kept for
+  LLM_BREAKER_WINDOW_SECONDS; once there are LLM_BREAKER_MIN_CALLS, the
+  breaker opens if LLM_BREAKER_FAILURE_RATE of them failed (a 5xx or a
+  timeout - quota 429s are left to the scheduler) or LLM_BREAKER_SLOW_RATE
+  of them ran longer than LLM_BREAKER_SLOW_SECONDS. LLM_BREAKER_MIN_CALLS
+  failed or slow ones in a row open it too, so an outage right after a busy
+  healthy spell doesn't have to outweigh all of it first
+- open: jobs are refused at once, as are the ones waiting in the scheduler
+  (callers fail fast or fall back, see services/itinerary_fallback.py), for
+  LLM_BREAKER_OPEN_SECONDS
+- half open: LLM_BREAKER_PROBES jobs are let through. If they all succeed in
+  time the breaker closes, one failure opens it again
+
+Like the scheduler, it runs on the event loop and has no locks. Outcomes of
+jobs let through before the last change of state are ignored: a job sent
+before the breaker opened says nothing about Gemini now.
+"""
+
+import time
+from collections import deque
+from typing import Optional
+
+from utils.config import (
+    LLM_BREAKER_WINDOW_SECONDS,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_SLOW_SECONDS,
+    LLM_BREAKER_SLOW_RATE,
+    LLM_BREAKER_OPEN_SECONDS,
+    LLM_BREAKER_PROBES,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BreakerPass:
+    """A job the breaker let through; hand it back to record() or cancel()"""
+
+    __slots__ = ("generation", "probe")
+
+    def __init__(self, generation: int, probe: bool):
+        self.generation = generation
+        self.probe = probe
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window_seconds: float = LLM_BREAKER_WINDOW_SECONDS,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+        slow_seconds: float = LLM_BREAKER_SLOW_SECONDS,
+        slow_rate: float = LLM_BREAKER_SLOW_RATE,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        probes: int = LLM_BREAKER_PROBES,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = max(probes, 1)
+
+        self.state = CLOSED
+        self.generation = 0
+        self.opened_until = 0.0
+        self._outcomes = deque()  # (finished, failed, slow)
+        self._failures = 0
+        self._slow = 0
+        self._bad_streak = 0
+        self._probes_out = 0
+        self._probes_passed = 0
+
+        self._trips = 0
+        self._rejected = 0
+
+    def admit(self) -> Optional[BreakerPass]:
+        """Let a job through, or None if it should fail fast"""
+        if self.state == OPEN and time.monotonic() >= self.opened_until:
+            self._change(HALF_OPEN)
+            print("LLM circuit breaker half open, probing Gemini")
+        if self.state == CLOSED:
+            return BreakerPass(self.generation, probe=False)
+        if self.state == HALF_OPEN and self._probes_out < self.probes:
+            self._probes_out += 1
+            return BreakerPass(self.generation, probe=True)
+        self._rejected += 1
+        return None
+
+    def still_admitted(self, admitted: BreakerPass) -> bool:
+        """Whether a job let through earlier may still go upstream"""
+        if admitted.probe:
+            return admitted.generation == self.generation
+        return self.state == CLOSED
+
+    def record(self, admitted: BreakerPass, failed: bool, seconds: float):
+        """Outcome of a job that went upstream"""
+        slow = seconds > self.slow_seconds
+        if admitted.generation != self.generation:
+            return
+        if self.state == HALF_OPEN:
+            self._probes_out -= 1
+            if failed or slow:
+                self._open(f"probe {'failed' if failed else 'too slow'}")
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.probes:
+                self._change(CLOSED)
+                print("LLM circuit breaker closed, Gemini is back")
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        self._bad_streak = self._bad_streak + 1 if failed or slow else 0
+        self._expire(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        if self._bad_streak >= self.min_calls:
+            self._open(f"{self._bad_streak} calls in a row failed or too slow")
+        elif self._failures >= calls * self.failure_rate:
+            self._open(f"{self._failures}/{calls} calls failed")
+        elif self._slow >= calls * self.slow_rate:
+            self._open(f"{self._slow}/{calls} calls over {self.slow_seconds:g}s")
+
+    def cancel(self, admitted: BreakerPass):
+        """The job never went upstream"""
+        if admitted.probe and admitted.generation == self.generation:
+            self._probes_out -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the breaker next lets a job through, for Retry-After"""
+        if self.state != OPEN:
+            return 1
+        return max(int(self.opened_until - time.monotonic() + 0.999), 1)
+
+    def _open(self, reason: str):
+        self._change(OPEN)
+        self.opened_until = time.monotonic() + self.open_seconds
+        self._trips += 1
+        print(f"LLM circuit breaker open for {self.open_seconds:g}s: {reason}")
+
+    def _change(self, state: str):
+        self.state = state
+        self.generation += 1
+        self._outcomes.clear()
+        self._failures = self._slow = self._bad_streak = 0
+        self._probes_out = self._probes_passed = 0
+
+    def _expire(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            _, failed, slow = self._outcomes.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def metrics(self) -> dict:
+        self._expire(time.monotonic())
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_failures": self._failures,
+            "window_slow": self._slow,
+            "retry_after_seconds": self.retry_after() if self.state == OPEN else None,
+            "trips": self._trips,
+            "rejected": self._rejected,
+        }
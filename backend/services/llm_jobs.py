@@ -0,0 +1,857 @@
+"""
+LLM Jobs
+Gemini calls leave the web process. Route handlers await llm_client, which
+has the same coroutines as GeminiTravelAgent; each call becomes a job that a
+pool of worker processes runs, and the handler gets the result back through a
+future. A slow or busy Gemini then ties up worker threads, not the event loop
+serving every other request.
+
+LLM_QUEUE_BACKEND picks the queue:
+    process   LLM_WORKERS processes started with the app, fed through a
+              multiprocessing queue (default)
+    database  jobs are rows in llm_jobs (SQLite locally) run by separate
+              worker processes, which may be on other machines:
+                  python -m services.llm_jobs [processes]
+    inline    the agent runs in the web process, as before
+
+Each worker process runs up to LLM_WORKER_CONCURRENCY calls at once and only
+takes a job when it has a free slot, so idle workers get the next one. Before
+that, jobs wait their turn to go upstream in the web process
+(services/llm_scheduler.py). Jobs waiting or in flight are capped at
+LLM_MAX_PENDING (then 503) and abandoned after LLM_JOB_TIMEOUT_SECONDS
+(then 504). While Gemini is down, a circuit breaker fails them at once
+(services/llm_breaker.py).
+"""
+
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import engine
+from models.llm_job import LLMJob
+from models.schemas import TripRequest
+from services.itinerary_planner import ChunkedItineraryPlanner
+from services.llm_breaker import CircuitBreaker, OPEN
+from services.llm_scheduler import LLMScheduler, THROTTLE_STATUSES
+from utils.config import (
+    LLM_QUEUE_BACKEND,
+    LLM_WORKERS,
+    LLM_WORKER_CONCURRENCY,
+    LLM_MAX_PENDING,
+    LLM_JOB_TIMEOUT_SECONDS,
+    LLM_POLL_INTERVAL_MS,
+    LLM_RATE_LIMIT,
+    LLM_THROTTLE_RETRIES,
+    LONG_TRIP_DAYS,
+    ITINERARY_CHUNK_DAYS,
+)
+
+# GeminiTravelAgent coroutines that can be queued
+JOB_KINDS = ("validate_query", "generate_itinerary", "chat_response", "regenerate_days")
+# Finished llm_jobs rows are deleted after this long
+FINISHED_JOB_RETENTION = timedelta(hours=1)
+
+BUSY_DETAIL = "The travel assistant is busy, please try again shortly"
+TIMEOUT_DETAIL = "The travel assistant took too long to respond, please try again"
+UNAVAILABLE_DETAIL = "The travel assistant is temporarily unavailable, please try again in a little while"
+
+# A job's outcome: ("ok", result) or ("error", http_status, detail)
+Outcome = Tuple
+
+# The queue has its own small pool: handlers waiting on a job may hold
+# connections from the app's pool for the whole LLM call, and enqueueing or
+# polling must not wait behind them
+queue_engine = create_engine(
+    engine.url,
+    pool_pre_ping=True,
+    pool_size=2,
+    max_overflow=LLM_WORKER_CONCURRENCY,
+    connect_args=(
+        {"check_same_thread": False} if engine.dialect.name == "sqlite" else {}
+    ),
+)
+QueueSession = sessionmaker(autocommit=False, autoflush=False, bind=queue_engine)
+
+
+def execute_job(kind: str, arguments: Dict) -> Outcome:
+    """Run one agent call to completion. Worker side - never raises."""
+    # Imported here so the web process doesn't need Gemini for the queue
+    from services.gemini_service import gemini_agent
+
+    if kind not in JOB_KINDS:
+        return ("error", 500, f"Unknown LLM job kind: {kind}")
+    arguments = dict(arguments)
+    if "trip_request" in arguments:
+        arguments["trip_request"] = TripRequest(**arguments["trip_request"])
+    try:
+        result = asyncio.run(getattr(gemini_agent, kind)(**arguments))
+    except HTTPException as e:
+        return ("error", e.status_code, str(e.detail))
+    except Exception as e:
+        return ("error", 500, f"{type(e).__name__}: {str(e)}")
+    if isinstance(result, tuple):
+        result = list(result)
+    return ("ok", result)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _resolve(future: Optional[Future], value):
+    # The waiting handler may have been cancelled (timeout, client gone)
+    if future is None:
+        return
+    try:
+        future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+# -- process backend ----------------------------------------------------------
+
+
+def serve_queue(jobs, results, concurrency: int):
+    """Worker process: run jobs from the queue, up to concurrency at a time"""
+    from services.gemini_service import gemini_agent  # noqa: F401 - load up front
+
+    slots = threading.BoundedSemaphore(concurrency)
+    executor = ThreadPoolExecutor(concurrency, thread_name_prefix="llm")
+    pid = os.getpid()
+
+    def run(job_id, kind, arguments):
+        try:
+            results.put(("started", job_id, pid, time.time()))
+            outcome = execute_job(kind, arguments)
+            results.put(("finished", job_id, outcome, time.time()))
+        finally:
+            slots.release()
+
+    while True:
+        # Only take a job with a free slot, so an idle worker gets it instead
+        slots.acquire()
+        job = jobs.get()
+        if job is None:
+            break
+        executor.submit(run, *job)
+    executor.shutdown(wait=True)
+
+
+class ProcessQueue:
+    """LLM_WORKERS worker processes behind a multiprocessing queue"""
+
+    def __init__(self, processes: int, concurrency: int, on_started: Callable):
+        self.processes = processes
+        self.concurrency = concurrency
+        self.on_started = on_started
+        # Not forked: the web process has threads and open connections
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs = None
+        self._results = None
+        self._workers: List = []
+        self._futures: Dict[str, Future] = {}
+        self._running: Dict[str, int] = {}  # job id -> worker pid
+        self._lock = threading.Lock()
+        self._collector = None
+        self._stopped = False
+
+    def start(self):
+        self._stopped = False
+        self._jobs = self._context.Queue()
+        self._results = self._context.Queue()
+        self._workers = [self._spawn(index) for index in range(self.processes)]
+        self._collector = threading.Thread(
+            target=self._collect, name="llm-results", daemon=True
+        )
+        self._collector.start()
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=serve_queue,
+            args=(self._jobs, self._results, self.concurrency),
+            name=f"llm-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def stop(self):
+        self._stopped = True
+        for _ in self._workers:
+            self._jobs.put(None)
+        for process in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if self._collector:
+            self._collector.join(timeout=5)
+        self._fail_jobs(list(self._futures), "LLM workers stopped")
+        self._workers = []
+
+    def submit(self, job_id: str, kind: str, arguments: Dict) -> Future:
+        future = Future()
+        with self._lock:
+            self._futures[job_id] = future
+        self._jobs.put((job_id, kind, arguments))
+        return future
+
+    def cancel(self, job_id: str):
+        # A job already running finishes anyway; its result is dropped
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _collect(self):
+        checked = time.monotonic()
+        while not self._stopped:
+            if time.monotonic() - checked > 1:
+                self._replace_dead_workers()
+                checked = time.monotonic()
+            try:
+                message = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            if message[0] == "started":
+                _, job_id, pid, started = message
+                with self._lock:
+                    if job_id not in self._futures:
+                        continue
+                    self._running[job_id] = pid
+                self.on_started(job_id, started)
+            else:
+                _, job_id, outcome, finished = message
+                with self._lock:
+                    future = self._futures.pop(job_id, None)
+                    self._running.pop(job_id, None)
+                _resolve(future, (outcome, finished))
+
+    def _replace_dead_workers(self):
+        for index, process in enumerate(self._workers):
+            if process.is_alive() or self._stopped:
+                continue
+            print(f"LLM worker {process.pid} exited ({process.exitcode}), restarting")
+            with self._lock:
+                lost = [j for j, pid in self._running.items() if pid == process.pid]
+            self._fail_jobs(lost, "LLM worker exited")
+            self._workers[index] = self._spawn(index)
+
+    def _fail_jobs(self, job_ids: List[str], detail: str):
+        for job_id in job_ids:
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+                self._running.pop(job_id, None)
+            _resolve(future, (("error", 503, detail), time.time()))
+
+
+# -- database backend ---------------------------------------------------------
+
+
+def enqueue_job(job_id: str, kind: str, arguments: Dict):
+    db = QueueSession()
+    try:
+        db.add(
+            LLMJob(
+                id=job_id,
+                kind=kind,
+                payload=json.dumps(arguments, ensure_ascii=False),
+                status="queued",
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def claim_job(db, worker: str) -> Optional[LLMJob]:
+    """Oldest queued job, marked running for this worker - None if there is none"""
+    for _ in range(5):
+        job_id = (
+            db.query(LLMJob.id)
+            .filter(LLMJob.status == "queued")
+            .order_by(LLMJob.created_at)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            return None
+        # Conditional update: of two workers racing for it only one matches
+        claimed = (
+            db.query(LLMJob)
+            .filter(LLMJob.id == job_id, LLMJob.status == "queued")
+            .update(
+                {
+                    "status": "running",
+                    "worker": worker,
+                    "started_at": datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return db.get(LLMJob, job_id)
+    return None
+
+
+def finish_job(job_id: str, worker: str, outcome: Outcome):
+    values = {"finished_at": datetime.utcnow()}
+    if outcome[0] == "ok":
+        values.update(status="done", result=json.dumps(outcome[1], ensure_ascii=False))
+    else:
+        values.update(status="failed", error_status=outcome[1], error=outcome[2])
+    db = QueueSession()
+    try:
+        # Not if the web side gave up on it in the meantime
+        db.query(LLMJob).filter(
+            LLMJob.id == job_id, LLMJob.status == "running", LLMJob.worker == worker
+        ).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_finished_jobs(db) -> int:
+    cutoff = datetime.utcnow() - FINISHED_JOB_RETENTION
+    deleted = (
+        db.query(LLMJob)
+        .filter(LLMJob.status.in_(("done", "failed")), LLMJob.finished_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def serve_database(concurrency: int = LLM_WORKER_CONCURRENCY):
+    """Worker process: claim and run llm_jobs rows, up to concurrency at a time"""
+    from services.gemini_service import gemini_agent  # noqa: F401 - load up front
+
+    worker = worker_name()
+    slots = threading.BoundedSemaphore(concurrency)
+    executor = ThreadPoolExecutor(concurrency, thread_name_prefix="llm")
+    idle = LLM_POLL_INTERVAL_MS / 1000
+    last_purge = 0.0
+
+    def run(job_id, kind, arguments):
+        try:
+            finish_job(job_id, worker, execute_job(kind, arguments))
+        except Exception as e:
+            print(f"LLM job {job_id} could not be saved: {str(e)}")
+        finally:
+            slots.release()
+
+    print(f"LLM worker {worker} serving llm_jobs, {concurrency} at a time")
+    while True:
+        slots.acquire()
+        db = QueueSession()
+        try:
+            job = claim_job(db, worker)
+            if job is None and time.monotonic() - last_purge > 60:
+                purge_finished_jobs(db)
+                last_purge = time.monotonic()
+        except Exception as e:
+            print(f"LLM worker {worker} could not claim a job: {str(e)}")
+            job = None
+        finally:
+            db.close()
+        if job is None:
+            slots.release()
+            time.sleep(idle)
+            continue
+        executor.submit(run, job.id, job.kind, json.loads(job.payload))
+
+
+class DatabaseQueue:
+    """Jobs in the llm_jobs table; one poller thread resolves all waiting futures"""
+
+    def __init__(self, on_started: Callable, poll_interval_ms: float):
+        self.on_started = on_started
+        self.poll_interval = poll_interval_ms / 1000
+        self._futures: Dict[str, Future] = {}
+        self._started = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._poller = None
+        self._stopped = False
+
+    def start(self):
+        self._stopped = False
+        self._poller = threading.Thread(
+            target=self._poll, name="llm-job-poller", daemon=True
+        )
+        self._poller.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._poller:
+            self._poller.join(timeout=5)
+
+    def submit(self, job_id: str, kind: str, arguments: Dict) -> Future:
+        enqueue_job(job_id, kind, arguments)
+        future = Future()
+        with self._lock:
+            self._futures[job_id] = future
+        self._wake.set()
+        return future
+
+    def cancel(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+            self._started.discard(job_id)
+        db = QueueSession()
+        try:
+            db.query(LLMJob).filter(
+                LLMJob.id == job_id, LLMJob.status.in_(("queued", "running"))
+            ).update(
+                {
+                    "status": "failed",
+                    "error_status": 504,
+                    "error": "Abandoned by the web process",
+                    "finished_at": datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _poll(self):
+        while not self._stopped:
+            with self._lock:
+                waiting = list(self._futures)
+            if not waiting:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.poll_interval)
+            try:
+                self._check(waiting)
+            except Exception as e:
+                print(f"Polling llm_jobs failed: {str(e)}")
+
+    def _check(self, job_ids: List[str]):
+        db = QueueSession()
+        try:
+            rows = (
+                db.query(
+                    LLMJob.id,
+                    LLMJob.status,
+                    LLMJob.result,
+                    LLMJob.error_status,
+                    LLMJob.error,
+                    LLMJob.started_at,
+                    LLMJob.finished_at,
+                )
+                .filter(
+                    LLMJob.id.in_(job_ids),
+                    LLMJob.status.in_(("running", "done", "failed")),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+        for job_id, status, result, error_status, error, started, finished in rows:
+            if job_id not in self._started and started is not None:
+                self._started.add(job_id)
+                self.on_started(job_id, _timestamp(started))
+            if status == "running":
+                continue
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+                self._started.discard(job_id)
+            if status == "done":
+                outcome = ("ok", json.loads(result))
+            else:
+                outcome = ("error", error_status or 500, error)
+            _resolve(future, (outcome, _timestamp(finished)))
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """utcnow() datetime from the database as a time.time() value"""
+    if value is None:
+        return time.time()
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+# -- web side -----------------------------------------------------------------
+
+
+class LLMJobClient:
+    """
+    Drop-in for gemini_agent in route handlers - each call is a queued job.
+    The extra priority (see services/llm_scheduler.py) and user_id arguments
+    decide when it goes upstream.
+    """
+
+    def __init__(
+        self,
+        backend: str = LLM_QUEUE_BACKEND,
+        workers: int = LLM_WORKERS,
+        concurrency: int = LLM_WORKER_CONCURRENCY,
+        max_pending: int = LLM_MAX_PENDING,
+        timeout: float = LLM_JOB_TIMEOUT_SECONDS,
+        rate_limit: float = LLM_RATE_LIMIT,
+        throttle_retries: int = LLM_THROTTLE_RETRIES,
+    ):
+        if backend not in ("process", "database", "inline"):
+            raise ValueError(f"Unknown LLM_QUEUE_BACKEND: {backend}")
+        if backend == "process" and workers < 1:
+            backend = "inline"
+        self.backend = backend
+        self.workers = workers
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.throttle_retries = throttle_retries
+        self._queue = None
+        self._start_lock = threading.Lock()
+        # Jobs out at once: every worker slot, assuming database workers run
+        # with the same LLM_WORKERS and LLM_WORKER_CONCURRENCY
+        slots = concurrency if backend == "inline" else workers * concurrency
+        self.scheduler = LLMScheduler(slots, rate_limit)
+        self.breaker = CircuitBreaker()
+
+        self._stats_lock = threading.Lock()
+        self._submitted: Dict[str, float] = {}  # job id -> time.time()
+        self._stats = {
+            "queued": 0,  # waiting for a worker
+            "running": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "short_circuited": 0,  # failed fast, circuit breaker open
+            "max_pending": 0,
+            "total_wait_ms": 0.0,
+            "total_run_ms": 0.0,
+        }
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        with self._start_lock:
+            if self._queue is not None or self.backend == "inline":
+                return
+            if self.backend == "process":
+                self._queue = ProcessQueue(
+                    self.workers, self.concurrency, self._job_started
+                )
+                print(
+                    f"Starting {self.workers} LLM worker processes, "
+                    f"{self.concurrency} calls each"
+                )
+            else:
+                self._queue = DatabaseQueue(self._job_started, LLM_POLL_INTERVAL_MS)
+            self._queue.start()
+
+    def stop(self):
+        with self._start_lock:
+            if self._queue is not None:
+                self._queue.stop()
+                self._queue = None
+
+    # -- GeminiTravelAgent interface ---------------------------------------
+
+    async def validate_query(
+        self, query: str, priority: str = "interactive", user_id=None
+    ) -> dict:
+        try:
+            return await self.submit("validate_query", priority, user_id, query=query)
+        except HTTPException as e:
+            # Same as the agent: a failed check lets the query through
+            print(f"Query validation error: {e.detail}")
+            return {
+                "is_valid": True,
+                "reason": "Validation check failed, defaulting to allow",
+            }
+
+    async def generate_itinerary(
+        self,
+        trip_request: TripRequest,
+        user_preferences: dict,
+        review_snippets: str = "",
+        destination_knowledge: str = "",
+        priority: str = "interactive",
+        user_id=None,
+    ):
+        return await self.submit(
+            "generate_itinerary",
+            priority,
+            user_id,
+            trip_request=trip_request,
+            user_preferences=user_preferences,
+            review_snippets=review_snippets,
+            destination_knowledge=destination_knowledge,
+        )
+
+    async def chat_response(
+        self,
+        message: str,
+        conversation_history: List[Dict],
+        user_preferences: dict,
+        priority: str = "interactive",
+        user_id=None,
+    ):
+        return await self.submit(
+            "chat_response",
+            priority,
+            user_id,
+            message=message,
+            conversation_history=conversation_history,
+            user_preferences=user_preferences,
+        )
+
+    async def regenerate_days(
+        self,
+        itinerary_obj: dict,
+        days: List[dict],
+        update_request: str,
+        user_preferences: dict,
+        priority: str = "interactive",
+        user_id=None,
+    ):
+        text, usage = await self.submit(
+            "regenerate_days",
+            priority,
+            user_id,
+            itinerary_obj=itinerary_obj,
+            days=days,
+            update_request=update_request,
+            user_preferences=user_preferences,
+        )
+        return text, usage
+
+    # -- jobs --------------------------------------------------------------
+
+    async def submit(
+        self, kind: str, priority: str = "interactive", user_id=None, **arguments
+    ):
+        """
+        Run an agent call on the workers once the scheduler lets it go
+        upstream, and return its result. Jobs Gemini throttles are queued
+        again; while the circuit breaker is open, calls fail at once.
+        """
+        pending = self.scheduler.waiting + self.scheduler.in_flight
+        with self._stats_lock:
+            if pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise HTTPException(status_code=503, detail=BUSY_DETAIL)
+            self._stats["max_pending"] = max(self._stats["max_pending"], pending + 1)
+        admitted = self.breaker.admit()
+        if admitted is None:
+            self._fail_fast()
+        if self._queue is None:
+            self.start()
+        cost = self.upstream_calls(kind, arguments)
+        if self.backend != "inline" and "trip_request" in arguments:
+            arguments["trip_request"] = arguments["trip_request"].model_dump()
+
+        try:
+            outcome = await self._attempts(
+                kind, arguments, priority, user_id, cost, admitted
+            )
+        except BaseException:
+            self.breaker.cancel(admitted)
+            raise
+        if outcome[0] == "ok":
+            return outcome[1]
+        if outcome[1] in THROTTLE_STATUSES:
+            raise HTTPException(status_code=503, detail=BUSY_DETAIL)
+        raise HTTPException(status_code=outcome[1], detail=outcome[2])
+
+    async def _attempts(
+        self, kind: str, arguments: Dict, priority: str, user_id, cost: int, admitted
+    ) -> Outcome:
+        """
+        Send the job upstream whenever the scheduler lets it, until it isn't
+        throttled or is out of retries, and tell the breaker how each attempt
+        went - or, for a half-open probe, how the last one went. Returns the
+        last outcome.
+        """
+        deadline = time.monotonic() + self.timeout
+        for attempt in range(self.throttle_retries + 1):
+            try:
+                grant = await asyncio.wait_for(
+                    self.scheduler.acquire(priority, user_id, cost, front=attempt > 0),
+                    timeout=deadline - time.monotonic(),
+                )
+            except asyncio.TimeoutError:
+                with self._stats_lock:
+                    self._stats["timed_out"] += 1
+                raise HTTPException(status_code=504, detail=TIMEOUT_DETAIL)
+            if not self.breaker.still_admitted(admitted):
+                # The breaker opened while the job was waiting its turn
+                self.scheduler.refund(grant)
+                self._fail_fast()
+            outcome = None
+            started = time.monotonic()
+            try:
+                outcome = await self._run(kind, arguments, deadline - time.monotonic())
+            except HTTPException as e:
+                outcome = ("error", e.status_code, str(e.detail))
+            finally:
+                if outcome is None:
+                    status = 504
+                else:
+                    status = outcome[1] if outcome[0] == "error" else None
+                self.scheduler.release(grant, status)
+            throttled = outcome[0] == "error" and outcome[1] in THROTTLE_STATUSES
+            if throttled and admitted.probe and attempt < self.throttle_retries:
+                # A probe and its retries are one probe: its outcome is
+                # recorded once, when it has one, not after every 429
+                continue
+            self._record(admitted, status, time.monotonic() - started)
+            if not throttled:
+                break
+        return outcome
+
+    def _record(self, admitted, status: Optional[int], seconds: float):
+        # Quota 429s are the scheduler's to deal with; 5xx mean Gemini is down
+        was_open = self.breaker.state == OPEN
+        self.breaker.record(admitted, status is not None and status >= 500, seconds)
+        if self.breaker.state == OPEN and not was_open:
+            # Jobs still waiting their turn would only fail more slowly, and
+            # the probes shouldn't wait out rate cuts from the outage
+            self.scheduler.fail_waiting(self._unavailable)
+            self.scheduler.reset_rate()
+
+    def _unavailable(self) -> HTTPException:
+        with self._stats_lock:
+            self._stats["short_circuited"] += 1
+        return HTTPException(
+            status_code=503,
+            detail=UNAVAILABLE_DETAIL,
+            headers={"Retry-After": str(self.breaker.retry_after())},
+        )
+
+    def _fail_fast(self):
+        raise self._unavailable()
+
+    @staticmethod
+    def upstream_calls(kind: str, arguments: Dict) -> int:
+        """Gemini calls a job makes: a long trip is a skeleton plus one per chunk"""
+        if kind != "generate_itinerary":
+            return 1
+        trip_request = arguments["trip_request"]
+        dates = ChunkedItineraryPlanner.trip_dates(
+            trip_request.start_date, trip_request.end_date
+        )
+        if len(dates) < LONG_TRIP_DAYS:
+            return 1
+        return 1 + math.ceil(len(dates) / ITINERARY_CHUNK_DAYS)
+
+    async def _run(self, kind: str, arguments: Dict, timeout: float) -> Outcome:
+        """One attempt at the job, on the workers (or inline)"""
+        if self.backend == "inline":
+            from services.gemini_service import gemini_agent
+
+            try:
+                return ("ok", await getattr(gemini_agent, kind)(**arguments))
+            except HTTPException as e:
+                return ("error", e.status_code, str(e.detail))
+
+        with self._stats_lock:
+            self._stats["queued"] += 1
+            job_id = uuid.uuid4().hex
+            self._submitted[job_id] = time.time()
+        try:
+            if self.backend == "database":
+                future = await asyncio.to_thread(
+                    self._queue.submit, job_id, kind, arguments
+                )
+            else:
+                future = self._queue.submit(job_id, kind, arguments)
+            outcome, finished = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self._job_done(job_id, None, "timed_out")
+            await asyncio.to_thread(self._queue.cancel, job_id)
+            raise HTTPException(status_code=504, detail=TIMEOUT_DETAIL)
+        except BaseException:
+            # Includes the client going away - the result is no longer wanted
+            self._job_done(job_id, None, "failed")
+            if self.backend == "process":
+                self._queue.cancel(job_id)
+            raise
+
+        ok = outcome[0] == "ok"
+        self._job_done(job_id, finished, "completed" if ok else "failed")
+        return outcome
+
+    def _job_started(self, job_id: str, started: float):
+        with self._stats_lock:
+            submitted = self._submitted.get(job_id)
+            if submitted is None:
+                return
+            self._submitted[job_id] = -started  # negative: running since
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+            self._stats["total_wait_ms"] += max(started - submitted, 0) * 1000
+
+    def _job_done(self, job_id: str, finished: Optional[float], result: str):
+        with self._stats_lock:
+            mark = self._submitted.pop(job_id, None)
+            if mark is not None and mark < 0:
+                self._stats["running"] -= 1
+                if finished is not None:
+                    self._stats["total_run_ms"] += max(finished + mark, 0) * 1000
+            else:
+                self._stats["queued"] -= 1
+            self._stats[result] += 1
+
+    def get_stats(self) -> dict:
+        """Snapshot of the LLM job queue for health/metrics endpoints"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        started = (stats["completed"] + stats["failed"]) or 1
+        stats["avg_wait_ms"] = round(stats.pop("total_wait_ms") / started, 2)
+        stats["avg_run_ms"] = round(stats.pop("total_run_ms") / started, 2)
+        stats["backend"] = self.backend
+        stats["workers"] = self.workers if self.backend == "process" else None
+        stats["concurrency"] = self.concurrency
+        stats["max_queue"] = self.max_pending
+        stats["scheduler"] = self.scheduler.metrics()
+        stats["breaker"] = self.breaker.metrics()
+        return stats
+
+
+llm_client = LLMJobClient()
+
+
+if __name__ == "__main__":
+    # Database backend workers: python -m services.llm_jobs [processes]
+    from models.database import Base, engine
+
+    Base.metadata.create_all(bind=engine, tables=[LLMJob.__table__])
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else LLM_WORKERS
+    if processes <= 1:
+        serve_database()
+    else:
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=serve_database, name=f"llm-worker-{index}")
+            for index in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            for process in workers:
+                process.terminate()
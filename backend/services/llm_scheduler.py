@@ -0,0 +1,259 @@
+"""
+LLM Scheduler
+Decides when each LLM job may go upstream. Jobs wait here, in the web
+process, before they are handed to the workers (services/llm_jobs.py):
+
+- a token bucket paces upstream calls to LLM_RATE_LIMIT per second, with
+  bursts of up to LLM_RATE_BURST. A job costs as many tokens as the Gemini
+  calls it makes - a chunked long trip is a skeleton call plus one per chunk
+- the rate adapts: a 429 or 503 from Gemini halves it (once per round of
+  calls, not once per failed call), every successful call adds back a
+  twentieth of the configured rate. The throttled job is queued again at the
+  front of its user's queue, up to LLM_THROTTLE_RETRIES times
+- waiting jobs go out by priority class - interactive (a user waiting on
+  chat or their itinerary), then group, then background - and within a
+  class round-robin across users, so one user's burst doesn't queue
+  everyone else behind it
+- at most `slots` jobs are out at once, so jobs wait here, in order, rather
+  than in the workers' first-in-first-out queue
+
+Everything runs on the event loop; there are no locks.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from utils.config import (
+    LLM_RATE_LIMIT,
+    LLM_RATE_BURST,
+    LLM_RATE_MIN,
+)
+
+PRIORITIES = ("interactive", "group", "background")
+# Upstream statuses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+BACKOFF_FACTOR = 0.5
+RECOVERY_SHARE = 0.05
+# Recent waits kept per class for the latency percentiles in metrics()
+WAIT_WINDOW = 1000
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "user", "cost", "enqueued")
+
+    def __init__(self, future, priority: str, user, cost: int):
+        self.future = future
+        self.priority = priority
+        self.user = user
+        self.cost = cost
+        self.enqueued = time.monotonic()
+
+
+class Grant:
+    """A job's permission to go upstream; hand it back to release()"""
+
+    __slots__ = ("cost", "dispatched")
+
+    def __init__(self, cost: int):
+        self.cost = cost
+        self.dispatched = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        slots: int,
+        rate: float = LLM_RATE_LIMIT,
+        burst: float = LLM_RATE_BURST,
+        min_rate: float = LLM_RATE_MIN,
+    ):
+        """rate 0 turns the token bucket off; priorities and slots still apply"""
+        self.slots = slots
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate) if rate else 0
+        self.tokens = burst
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.last_cut = 0.0
+        self._queues: Dict[str, OrderedDict] = {p: OrderedDict() for p in PRIORITIES}
+        self._timer = None
+
+        self._waits = {p: deque(maxlen=WAIT_WINDOW) for p in PRIORITIES}
+        self._granted = {p: 0 for p in PRIORITIES}
+        self._throttled = 0
+        self._rate_cuts = 0
+
+    # -- callers -----------------------------------------------------------
+
+    async def acquire(
+        self, priority: str, user=None, cost: int = 1, front: bool = False
+    ) -> Grant:
+        """Wait for the job's turn; front puts it ahead of the user's other jobs"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        waiter = _Waiter(
+            asyncio.get_running_loop().create_future(), priority, user, cost
+        )
+        queue = self._queues[priority].setdefault(user, deque())
+        if front:
+            queue.appendleft(waiter)
+        else:
+            queue.append(waiter)
+        self._dispatch()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller gave up
+                self.release(waiter.future.result())
+            else:
+                self._remove(waiter)
+            raise
+
+    def release(self, grant: Grant, status: Optional[int] = None):
+        """The job is back; status is the upstream HTTP status it failed with"""
+        self.in_flight -= 1
+        if status in THROTTLE_STATUSES:
+            self._throttled += 1
+            # Calls already out when the rate was cut were sent too fast as
+            # well; their failures must not cut it again
+            if self.max_rate and grant.dispatched >= self.last_cut:
+                self._refill()
+                self.rate = max(self.rate * BACKOFF_FACTOR, self.min_rate)
+                self.last_cut = time.monotonic()
+                # And no burst right after being told to slow down
+                self.tokens = min(self.tokens, 0)
+                self._rate_cuts += 1
+                print(f"Gemini throttled ({status}), LLM rate cut to {self.rate:.2f}/s")
+        elif status is None and self.max_rate:
+            self.rate = min(
+                self.rate + self.max_rate * RECOVERY_SHARE * grant.cost, self.max_rate
+            )
+        self._dispatch()
+
+    def refund(self, grant: Grant):
+        """The job didn't go upstream after all; its tokens go back"""
+        self.in_flight -= 1
+        if self.max_rate:
+            self._refill()
+            self.tokens = min(self.tokens + grant.cost, self.burst)
+        self._dispatch()
+
+    def reset_rate(self):
+        """Back to the configured rate, forgetting earlier cuts"""
+        self.rate = self.max_rate
+        self.last_cut = time.monotonic()
+
+    def fail_waiting(self, make_error: Callable[[], Exception]):
+        """Fail every job still waiting its turn with a fresh make_error()"""
+        for users in self._queues.values():
+            for queue in users.values():
+                for waiter in queue:
+                    if not waiter.future.done():
+                        waiter.future.set_exception(make_error())
+            users.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(
+            len(queue) for users in self._queues.values() for queue in users.values()
+        )
+
+    # -- dispatch ----------------------------------------------------------
+
+    def _next(self) -> Optional[_Waiter]:
+        for priority in PRIORITIES:
+            users = self._queues[priority]
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _pop(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        queue = users.pop(waiter.user)
+        queue.popleft()
+        if queue:
+            # Round robin: this user goes behind the others in the class
+            users[waiter.user] = queue
+
+    def _remove(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        queue = users.get(waiter.user)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del users[waiter.user]
+        self._dispatch()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.refilled) * self.rate, self.burst)
+        self.refilled = now
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.in_flight < self.slots:
+            waiter = self._next()
+            if waiter is None:
+                return
+            if waiter.future.cancelled():
+                self._pop(waiter)
+                continue
+            if self.max_rate:
+                self._refill()
+                # A job costing more than a burst goes out on a full bucket
+                # and leaves it in debt
+                needed = min(waiter.cost, self.burst)
+                if self.tokens < needed:
+                    delay = (needed - self.tokens) / self.rate
+                    self._timer = asyncio.get_running_loop().call_later(
+                        delay, self._dispatch
+                    )
+                    return
+                self.tokens -= waiter.cost
+            self._pop(waiter)
+            self.in_flight += 1
+            self._granted[waiter.priority] += 1
+            self._waits[waiter.priority].append(time.monotonic() - waiter.enqueued)
+            waiter.future.set_result(Grant(waiter.cost))
+
+    def metrics(self) -> dict:
+        classes = {}
+        for priority in PRIORITIES:
+            waits = np.asarray(self._waits[priority]) * 1000
+            classes[priority] = {
+                "queued": sum(len(q) for q in self._queues[priority].values()),
+                "users_waiting": len(self._queues[priority]),
+                "granted": self._granted[priority],
+                "wait_ms_p50": (
+                    round(float(np.percentile(waits, 50)), 1) if len(waits) else 0.0
+                ),
+                "wait_ms_p95": (
+                    round(float(np.percentile(waits, 95)), 1) if len(waits) else 0.0
+                ),
+            }
+        return {
+            "rate_per_second": round(self.rate, 3) if self.max_rate else None,
+            "max_rate_per_second": self.max_rate or None,
+            "tokens": round(self.tokens, 2) if self.max_rate else None,
+            "in_flight": self.in_flight,
+            "slots": self.slots,
+            "throttled": self._throttled,
+            "rate_cuts": self._rate_cuts,
+            "classes": classes,
+        }
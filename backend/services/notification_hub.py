@@ -0,0 +1,142 @@
+"""
+Notification Hub
+In-process pub/sub that pushes notification events to connected clients
+(Server-Sent Events) instead of having every tab poll /notifications.
+With NOTIFICATION_FANOUT=postgres, events go through Postgres LISTEN/NOTIFY
+so every worker process delivers them to its own connected clients.
+Streams are keyed by an id - a user id for notifications, an itinerary id for
+collaborative editing. Event types with a handler (on_event) are internal:
+every worker runs the handler instead of sending the event to streams.
+"""
+
+import asyncio
+import json
+import select
+import threading
+from typing import Callable, Dict, Set
+
+from sqlalchemy import text
+from models.database import engine
+from utils.config import DATABASE_URL, NOTIFICATION_FANOUT
+
+# Comment line sent on idle streams so proxies don't close them
+STREAM_HEARTBEAT_SECONDS = 25
+
+
+class NotificationHub:
+    def __init__(self, channel: str, max_queue_size: int = 100):
+        self.channel = channel
+        self.max_queue_size = max_queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._handlers: Dict[str, Callable[[int, dict], None]] = {}
+        self._loop = None
+        self._listener = None
+        self._stop = threading.Event()
+        self.use_postgres = (
+            NOTIFICATION_FANOUT == "postgres" and "postgresql" in DATABASE_URL
+        )
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the server's event loop and start the Postgres listener if enabled"""
+        self._loop = loop
+        if self.use_postgres and self._listener is None:
+            self._stop.clear()
+            self._listener = threading.Thread(
+                target=self._listen_postgres, name="notification-listener", daemon=True
+            )
+            self._listener.start()
+            print(f"Notification hub listening on Postgres channel {self.channel}")
+
+    def stop(self):
+        self._stop.set()
+        if self._listener:
+            self._listener.join(timeout=10)
+            self._listener = None
+
+    def subscribe(self, key: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, key: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(key)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[key]
+
+    def on_event(self, event_type: str, handler: Callable[[int, dict], None]):
+        """Run handler(key, event) in every worker for events of event_type"""
+        self._handlers[event_type] = handler
+
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, key: int, event: dict):
+        """Send an event to every open stream of a key (on any worker when fanned out)"""
+        if self.use_postgres:
+            try:
+                payload = json.dumps({"key": key, "event": event}, default=str)
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": self.channel, "payload": payload},
+                    )
+                    conn.commit()
+                return
+            except Exception as e:
+                print(f"Postgres notify failed, delivering locally: {str(e)}")
+        self._dispatch_threadsafe(key, event)
+
+    def _dispatch_threadsafe(self, key: int, event: dict):
+        handler = self._handlers.get(event.get("type"))
+        if handler is not None:
+            # On the publishing or listener thread; handlers must be thread-safe
+            handler(key, event)
+            return
+        if self._loop is None or self._loop.is_closed():
+            self._dispatch(key, event)
+            return
+        self._loop.call_soon_threadsafe(self._dispatch, key, event)
+
+    def _dispatch(self, key: int, event: dict):
+        for queue in list(self._subscribers.get(key, ())):
+            if queue.full():
+                # Slow consumer - drop the oldest event rather than block writers
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _listen_postgres(self):
+        """Background thread: relay NOTIFY payloads to local subscribers"""
+        import psycopg2
+        import psycopg2.extensions
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel};")
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            message = json.loads(notify.payload)
+                            self._dispatch_threadsafe(message["key"], message["event"])
+                        except (ValueError, KeyError) as e:
+                            print(f"Ignoring malformed notification payload: {e}")
+            except Exception as e:
+                print(f"Notification listener error, reconnecting: {str(e)}")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+# Initialize notification hub singleton
+notification_hub = NotificationHub(channel="vandreren_notifications")
@@ -0,0 +1,225 @@
+"""
+Partial itinerary updates
+Works out which days an update request is about ("change day 3 dinner",
+"make the last day relaxed", "2025-10-30") so only those days are sent to
+Gemini and regenerated, then merges and validates just the changed days.
+"""
+
+import copy
+import re
+from typing import List, Optional
+
+from services.itinerary_store_service import get_itinerary_object, to_number
+
+ORDINAL_WORDS = {
+    "first": 1,
+    "second": 2,
+    "third": 3,
+    "fourth": 4,
+    "fifth": 5,
+    "sixth": 6,
+    "seventh": 7,
+    "eighth": 8,
+    "ninth": 9,
+    "tenth": 10,
+}
+NUMBER_WORDS = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+
+# Requests that change the shape of the trip need a full regeneration
+WHOLE_TRIP_PATTERN = re.compile(
+    r"\b(all days|every day|each day|entire|whole|extend|shorten|"
+    r"add (a|another|one more) day|more days|fewer days|remove (a )?day|"
+    r"delete (a )?day|dates?\s+to)\b"
+)
+# Days we can't pin down from the wording alone - regenerate everything
+AMBIGUOUS_PATTERN = re.compile(
+    r"\b(next|following|previous|other|remaining|middle|some|few|couple of)\s+days?\b"
+    r"|\brest of the (trip|days|itinerary)\b"
+)
+
+NUMBER = r"\d{1,2}|" + "|".join(NUMBER_WORDS)
+ORDINAL = r"\d{1,2}(?:st|nd|rd|th)|" + "|".join(ORDINAL_WORDS)
+LIST_SEPARATOR = r"\s*(?:,|&|\band\b|\bor\b|-|–)\s*"
+RANGE_WORD = r"\b(?:to|through|thru)\b"
+# What may follow the number that closes "day 2 to 4" - in "day 2 to 3 relaxing
+# activities" the 3 counts activities, and only day 2 is meant
+DAY_BOUNDARY = (
+    r"(?=\s*(?:$|[^\w\s]|(?:and|or|to|for|with|of|in|on|at|as|so|instead|"
+    r"please|because|into|should|be|is|are)\b))"
+)
+# "to day 4" always closes a range; "to 4" only at a day boundary
+DAY_RANGE_END = (
+    rf"\s*{RANGE_WORD}\s*(?:days?\s*(?:{NUMBER})\b|(?:{NUMBER})\b{DAY_BOUNDARY})"
+)
+# "day 3", "days 1, 3 and 5", "day 1 and day 2", "days 2-4", "days 2 to 4"
+DAY_LIST_PATTERN = re.compile(
+    rf"\bdays?\s*((?:{NUMBER})\b"
+    rf"(?:{LIST_SEPARATOR}(?:days?\s*)?(?:{NUMBER})\b|{DAY_RANGE_END})*)"
+)
+# "3rd day", "first and second days", "2nd to 4th day"
+ORDINAL_LIST_PATTERN = re.compile(
+    rf"\b((?:{ORDINAL})"
+    rf"(?:(?:{LIST_SEPARATOR}|\s*{RANGE_WORD}\s*)(?:the\s+)?(?:{ORDINAL}))*)\s+days?\b"
+)
+# "first two days", "last 3 days"
+EDGE_DAYS_PATTERN = re.compile(rf"\b(first|last|final)\s+({NUMBER})\s+days\b")
+LIST_TOKEN_PATTERN = re.compile(rf"({ORDINAL}|{NUMBER})|(-|–|{RANGE_WORD})|(\bor\b)")
+
+
+def _number(token: str) -> int:
+    token = re.sub(r"(st|nd|rd|th)$", "", token) if token[0].isdigit() else token
+    if token.isdigit():
+        return int(token)
+    return ORDINAL_WORDS.get(token) or NUMBER_WORDS[token]
+
+
+def _parse_day_list(text: str) -> Optional[List[int]]:
+    """Day numbers in a list like "1, 3 and 5" or "2-4"; None for "2 or 3" """
+    numbers = []
+    in_range = False
+    for number, range_word, either in LIST_TOKEN_PATTERN.findall(text):
+        if either:
+            return None
+        if range_word:
+            in_range = bool(numbers)
+            continue
+        value = _number(number)
+        if in_range and numbers[-1] < value:
+            numbers.extend(range(numbers[-1] + 1, value + 1))
+        else:
+            numbers.append(value)
+        in_range = False
+    return numbers
+
+
+def detect_target_days(update_request: str, itinerary_obj: dict) -> List[int]:
+    """
+    Day numbers the request refers to, or [] when it needs a full regeneration
+    (no specific day mentioned, whole-trip wording, every day targeted, or days
+    it can't pin down: "day 2 or 3", "the next day", a day the trip doesn't have).
+    """
+    text = update_request.lower()
+    if WHOLE_TRIP_PATTERN.search(text) or AMBIGUOUS_PATTERN.search(text):
+        return []
+
+    days = [d for d in itinerary_obj.get("days", []) if isinstance(d, dict)]
+    day_numbers = [d.get("day") for d in days]
+    if not day_numbers:
+        return []
+
+    found = set()
+    for pattern in (DAY_LIST_PATTERN, ORDINAL_LIST_PATTERN):
+        for match in pattern.finditer(text):
+            numbers = _parse_day_list(match.group(1))
+            if numbers is None:
+                return []
+            found.update(numbers)
+    for match in EDGE_DAYS_PATTERN.finditer(text):
+        count = _number(match.group(2))
+        if match.group(1) == "first":
+            found.update(day_numbers[:count])
+        else:
+            found.update(day_numbers[-count:])
+    if re.search(r"\b(last|final)\s+day\b", text):
+        found.add(day_numbers[-1])
+    for date in re.findall(r"\b\d{4}-\d{2}-\d{2}\b", text):
+        matched = [day.get("day") for day in days if day.get("date") == date]
+        if not matched:
+            return []
+        found.update(matched)
+
+    # A day the itinerary doesn't have means we misread the request
+    if not found or not found <= set(day_numbers):
+        return []
+    if len(found) == len(day_numbers):
+        return []
+    return sorted(found)
+
+
+def validate_day(day) -> Optional[str]:
+    """Return a problem description for a regenerated day, or None if it's usable"""
+    if not isinstance(day, dict):
+        return "day is not an object"
+    activities = day.get("activities")
+    if not isinstance(activities, list) or not activities:
+        return f"day {day.get('day')} has no activities"
+    for activity in activities:
+        if not isinstance(activity, dict) or not activity.get("activity"):
+            return f"day {day.get('day')} has an activity without a name"
+    return None
+
+
+def merge_regenerated_days(document: dict, regenerated, target_days: List[int]) -> dict:
+    """
+    Put regenerated days back into a copy of document. Only the target days are
+    replaced and validated; total_estimated_cost is adjusted by their cost change.
+    Raises ValueError if the response can't be used.
+    """
+    if isinstance(regenerated, dict):
+        regenerated = regenerated.get("days", [])
+    if not isinstance(regenerated, list):
+        raise ValueError("Regenerated response has no days list")
+
+    merged = copy.deepcopy(document)
+    itinerary_obj = get_itinerary_object(merged)
+    days = itinerary_obj.get("days", [])
+    by_number = {d.get("day"): i for i, d in enumerate(days) if isinstance(d, dict)}
+
+    replaced = set()
+    cost_change = 0.0
+    for position, new_day in enumerate(regenerated):
+        problem = validate_day(new_day)
+        if problem:
+            raise ValueError(problem)
+
+        day_number = new_day.get("day")
+        if day_number not in target_days:
+            # Fall back to position when the model renumbered the days
+            if position < len(target_days):
+                day_number = target_days[position]
+            else:
+                continue
+        if day_number in replaced:
+            continue
+
+        index = by_number[day_number]
+        old_day = days[index]
+        new_day = dict(new_day, day=day_number)
+        if not new_day.get("date") and old_day.get("date"):
+            new_day["date"] = old_day["date"]
+
+        cost_change += _day_cost(new_day) - _day_cost(old_day)
+        days[index] = new_day
+        replaced.add(day_number)
+
+    if replaced != set(target_days):
+        raise ValueError(
+            f"Expected days {target_days}, got {sorted(replaced)} from regeneration"
+        )
+
+    total = to_number(itinerary_obj.get("total_estimated_cost"))
+    if total is not None:
+        new_total = total + cost_change
+        itinerary_obj["total_estimated_cost"] = (
+            int(new_total) if float(new_total).is_integer() else new_total
+        )
+    return merged
+
+
+def _day_cost(day: dict) -> float:
+    return sum(
+        to_number(a.get("cost")) or 0.0
+        for a in day.get("activities", [])
+        if isinstance(a, dict)
+    )
@@ -0,0 +1,366 @@
+"""
+Activity progress bookkeeping
+Writes ActivityProgress rows and keeps the per-user ProgressSummary counts in
+step with them inside the caller's transaction, so progress reads don't have to
+scan every progress row of an itinerary.
+
+Every write also stamps its rows with the itinerary's next progress revision,
+a counter on the itinerary row. Offline clients sync against revisions rather
+than timestamps: taking the revision locks the itinerary row until commit, so
+revisions are committed in order and a delta read after revision N can't miss
+a write that commits later with a revision at or below N.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models.itinerary import Itinerary
+from models.progress import ActivityProgress, ProgressSummary
+
+# Columns of ux_activity_progress_activity, the target of the upserts
+PROGRESS_KEY = ["itinerary_id", "user_id", "day", "activity_index"]
+
+
+def _insert(db: Session):
+    """The dialect's INSERT, which has on_conflict_do_update()"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert
+    return sqlite_insert
+
+
+def next_progress_revision(db: Session, itinerary_id: int) -> int:
+    """Take the itinerary's next progress revision for this transaction's writes"""
+    db.query(Itinerary).filter(Itinerary.id == itinerary_id).update(
+        {
+            Itinerary.progress_revision: func.coalesce(Itinerary.progress_revision, 0)
+            + 1
+        },
+        synchronize_session=False,
+    )
+    return current_progress_revision(db, itinerary_id)
+
+
+def current_progress_revision(db: Session, itinerary_id: int) -> int:
+    """Latest progress revision of the itinerary visible to this transaction"""
+    return (
+        db.query(func.coalesce(Itinerary.progress_revision, 0))
+        .filter(Itinerary.id == itinerary_id)
+        .scalar()
+    ) or 0
+
+
+def rebuild_progress_summaries(db: Session, itinerary_id: int) -> List[ProgressSummary]:
+    """Recompute summaries for an itinerary from its ActivityProgress rows"""
+    counts = (
+        db.query(ActivityProgress.user_id, func.sum(ActivityProgress.completed))
+        .filter(ActivityProgress.itinerary_id == itinerary_id)
+        .group_by(ActivityProgress.user_id)
+        .all()
+    )
+
+    # Upserted rather than deleted and re-added, so two requests backfilling
+    # the same itinerary don't collide on the (itinerary_id, user_id) key
+    summary_query = db.query(ProgressSummary).filter(
+        ProgressSummary.itinerary_id == itinerary_id
+    )
+    if counts:
+        now = datetime.utcnow()
+        stmt = _insert(db)(ProgressSummary).values(
+            [
+                {
+                    "itinerary_id": itinerary_id,
+                    "user_id": user_id,
+                    "completed_activities": int(completed or 0),
+                    "updated_at": now,
+                }
+                for user_id, completed in counts
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["itinerary_id", "user_id"],
+            set_={
+                "completed_activities": stmt.excluded.completed_activities,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+        summary_query.filter(
+            ProgressSummary.user_id.notin_([user_id for user_id, _ in counts])
+        ).delete(synchronize_session=False)
+    else:
+        summary_query.delete(synchronize_session=False)
+
+    return summary_query.populate_existing().all()
+
+
+def get_progress_summaries(db: Session, itinerary_id: int) -> List[ProgressSummary]:
+    """Summary rows for an itinerary, backfilling them for pre-existing progress"""
+    summaries = (
+        db.query(ProgressSummary)
+        .filter(ProgressSummary.itinerary_id == itinerary_id)
+        .all()
+    )
+    if summaries:
+        return summaries
+    return rebuild_progress_summaries(db, itinerary_id)
+
+
+def _upsert_progress_summary(
+    db: Session, itinerary_id: int, user_id: int, completed: int, increment: bool
+) -> None:
+    """Set (or add to) a user's completed count in one INSERT ... ON CONFLICT"""
+    now = datetime.utcnow()
+    stmt = _insert(db)(ProgressSummary).values(
+        itinerary_id=itinerary_id,
+        user_id=user_id,
+        completed_activities=max(completed, 0),
+        updated_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["itinerary_id", "user_id"],
+        set_={
+            "completed_activities": (
+                ProgressSummary.completed_activities + completed
+                if increment
+                else completed
+            ),
+            "updated_at": now,
+        },
+    )
+    db.execute(stmt)
+
+
+def adjust_progress_summary(
+    db: Session, itinerary_id: int, user_id: int, delta: int
+) -> None:
+    """Add delta to a user's completed count, creating the summary row if needed"""
+    if delta == 0:
+        return
+    _upsert_progress_summary(db, itinerary_id, user_id, delta, increment=True)
+
+
+def set_activity_progress(
+    db: Session,
+    itinerary_id: int,
+    user_id: int,
+    day: int,
+    activity_index: int,
+    completed: bool,
+    notes: Optional[str] = None,
+    progress: Optional[ActivityProgress] = None,
+    lookup: bool = True,
+    revision: Optional[int] = None,
+) -> int:
+    """
+    Create or update one ActivityProgress row. Batch callers that already loaded
+    the existing rows pass progress (or None) with lookup=False, and the
+    revision they took once for the batch. Returns the change
+    in the user's completed count (-1, 0, 1) without touching the summary, so
+    batch callers can apply it once.
+
+    The revision is taken before the row is read: it locks the itinerary row,
+    so concurrent toggles of the same activity read and change it in turn
+    instead of both applying a delta computed from the same old state.
+    """
+    if revision is None:
+        revision = next_progress_revision(db, itinerary_id)
+    if progress is None and lookup:
+        progress = (
+            db.query(ActivityProgress)
+            .filter(
+                ActivityProgress.itinerary_id == itinerary_id,
+                ActivityProgress.user_id == user_id,
+                ActivityProgress.day == day,
+                ActivityProgress.activity_index == activity_index,
+            )
+            .first()
+        )
+
+    new_state = 1 if completed else 0
+    now = datetime.utcnow()
+
+    if progress:
+        old_state = progress.completed or 0
+        progress.completed = new_state
+        progress.notes = notes
+        progress.completed_at = now if new_state else None
+        progress.client_updated_at = now
+        progress.updated_at = now
+        progress.revision = revision
+    else:
+        old_state = 0
+        # An upsert, so a row that appeared anyway (a writer that didn't take
+        # the revision first) is updated instead of failing the request
+        stmt = _insert(db)(ActivityProgress).values(
+            itinerary_id=itinerary_id,
+            user_id=user_id,
+            day=day,
+            activity_index=activity_index,
+            completed=new_state,
+            notes=notes,
+            completed_at=now if new_state else None,
+            client_updated_at=now,
+            updated_at=now,
+            revision=revision,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=PROGRESS_KEY,
+            set_={
+                "completed": stmt.excluded.completed,
+                "notes": stmt.excluded.notes,
+                "completed_at": stmt.excluded.completed_at,
+                "client_updated_at": stmt.excluded.client_updated_at,
+                "updated_at": stmt.excluded.updated_at,
+                "revision": stmt.excluded.revision,
+            },
+        )
+        db.execute(stmt)
+
+    return new_state - old_state
+
+
+def set_day_progress(
+    db: Session,
+    itinerary_id: int,
+    user_id: int,
+    day: int,
+    activity_count: int,
+    completed: bool,
+    revision: Optional[int] = None,
+) -> int:
+    """Mark every activity of a day for one user. Returns the completed-count delta"""
+    # Lock before reading, as in set_activity_progress
+    if revision is None:
+        revision = next_progress_revision(db, itinerary_id)
+    existing: Dict[int, ActivityProgress] = {
+        p.activity_index: p
+        for p in db.query(ActivityProgress).filter(
+            ActivityProgress.itinerary_id == itinerary_id,
+            ActivityProgress.user_id == user_id,
+            ActivityProgress.day == day,
+        )
+    }
+
+    delta = 0
+    for activity_index in range(activity_count):
+        progress = existing.get(activity_index)
+        delta += set_activity_progress(
+            db,
+            itinerary_id,
+            user_id,
+            day,
+            activity_index,
+            completed,
+            notes=progress.notes if progress else None,
+            progress=progress,
+            lookup=False,
+            revision=revision,
+        )
+    return delta
+
+
+def refresh_progress_summary(db: Session, itinerary_id: int, user_id: int) -> int:
+    """Recount one user's completed activities after a bulk write"""
+    completed = (
+        db.query(func.count(ActivityProgress.id))
+        .filter(
+            ActivityProgress.itinerary_id == itinerary_id,
+            ActivityProgress.user_id == user_id,
+            ActivityProgress.completed == 1,
+        )
+        .scalar()
+    ) or 0
+
+    _upsert_progress_summary(db, itinerary_id, user_id, completed, increment=False)
+    return completed
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    """Stored timestamps are naive UTC; clients may send offsets"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def upsert_progress_changes(
+    db: Session,
+    itinerary_id: int,
+    user_id: int,
+    changes: list,
+    revision: Optional[int] = None,
+) -> Tuple[int, list]:
+    """
+    Apply a batch of offline progress changes with a single
+    INSERT ... ON CONFLICT DO UPDATE. Last write wins by client timestamp, so
+    a stale change never overwrites a newer one already on the server.
+    Returns the number of activities written and the changes that were
+    rejected as stale.
+    """
+    # Postgres rejects an upsert that touches the same row twice, so keep
+    # only the newest change per activity
+    latest = {}
+    for change in changes:
+        key = (change.day, change.activity_index)
+        client_time = _to_utc_naive(change.client_timestamp)
+        if key not in latest or latest[key][0] < client_time:
+            latest[key] = (client_time, change)
+
+    if not latest:
+        return 0, []
+
+    now = datetime.utcnow()
+    if revision is None:
+        revision = next_progress_revision(db, itinerary_id)
+    rows = [
+        {
+            "itinerary_id": itinerary_id,
+            "user_id": user_id,
+            "day": change.day,
+            "activity_index": change.activity_index,
+            "completed": 1 if change.completed else 0,
+            "completed_at": client_time if change.completed else None,
+            "notes": change.notes,
+            "client_updated_at": client_time,
+            "updated_at": now,
+            "revision": revision,
+        }
+        for client_time, change in latest.values()
+    ]
+
+    stmt = _insert(db)(ActivityProgress).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=PROGRESS_KEY,
+        set_={
+            "completed": stmt.excluded.completed,
+            "completed_at": stmt.excluded.completed_at,
+            "notes": stmt.excluded.notes,
+            "client_updated_at": stmt.excluded.client_updated_at,
+            "updated_at": stmt.excluded.updated_at,
+            "revision": stmt.excluded.revision,
+        },
+        where=or_(
+            ActivityProgress.client_updated_at.is_(None),
+            ActivityProgress.client_updated_at < stmt.excluded.client_updated_at,
+        ),
+    )
+    # Rows the WHERE skipped aren't returned
+    stmt = stmt.returning(ActivityProgress.day, ActivityProgress.activity_index)
+    written = {tuple(row) for row in db.execute(stmt)}
+    rejected = [change for key, (_, change) in latest.items() if key not in written]
+    return len(written), rejected
+
+
+def get_progress_changes_since(
+    db: Session, itinerary_id: int, since: Optional[int]
+) -> List[ActivityProgress]:
+    """Progress rows of every member written after progress revision since"""
+    query = db.query(ActivityProgress).filter(
+        ActivityProgress.itinerary_id == itinerary_id
+    )
+    if since is not None:
+        query = query.filter(ActivityProgress.revision > since)
+    return query.order_by(ActivityProgress.revision, ActivityProgress.id).all()
@@ -0,0 +1,244 @@
+"""
+Review ANN Index
+Inverted-file (IVF) index over a ReviewEmbeddingStore. Spherical k-means
+splits the normalized embeddings into nlist clusters; a query is only scored
+against the rows of its nprobe closest clusters instead of the whole matrix.
+Each cluster's vectors are stored contiguously (a reordered copy in the
+store's dtype), so probing a cluster is one sequential read and a batch of
+queries probing the same cluster is scored with a single matrix product.
+
+Files (next to the store's own):
+    ivf.json           row count covered, nlist - written last
+    ivf_centroids.npy  nlist x dim float32
+    ivf_offsets.npy    nlist + 1 int64 offsets into the two arrays below
+    ivf_rows.npy       store rows grouped by cluster
+    ivf_vectors.npy    embeddings in the same order
+
+Rows appended after the index was built are scanned exactly as a "tail" until
+the index is rebuilt. Filters that leave only a few thousand rows skip the
+index and score those rows exactly, which is both faster and exact.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from utils.config import REVIEW_ANN_NPROBE, REVIEW_ANN_EXACT_FILTER_ROWS
+
+TRAIN_SAMPLES_PER_LIST = 64
+TRAIN_ITERATIONS = 10
+BLOCK_ROWS = 65536
+INDEX_FILES = (
+    "ivf_centroids.npy",
+    "ivf_offsets.npy",
+    "ivf_rows.npy",
+    "ivf_vectors.npy",
+)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    """Best k (score, row) pairs of one query, unordered"""
+    if len(scores) <= k:
+        return scores, rows
+    best = np.argpartition(-scores, k - 1)[:k]
+    return scores[best], rows[best]
+
+
+def _save_array(path: str, name: str, data: np.ndarray):
+    tmp = os.path.join(path, name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, name))
+
+
+class ReviewANNIndex:
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        vectors: np.ndarray,
+        count: int,
+        nprobe: int = REVIEW_ANN_NPROBE,
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        self.count = count
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    # -- build -------------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        store,
+        nlist: Optional[int] = None,
+        iterations: int = TRAIN_ITERATIONS,
+        seed: int = 0,
+    ) -> "ReviewANNIndex":
+        """Train on the store's current rows and write the index next to it"""
+        count = len(store)
+        if count == 0:
+            raise ValueError("Cannot build an index over an empty store")
+        nlist = min(nlist or max(1, int(np.sqrt(count))), count)
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample - a few dozen points per cluster is plenty
+        sample_size = min(count, nlist * TRAIN_SAMPLES_PER_LIST)
+        sample = store.vectors(np.sort(rng.choice(count, sample_size, replace=False)))
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            # Reseed empty clusters with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, BLOCK_ROWS):
+            block = store.vectors(slice(start, start + BLOCK_ROWS))
+            assignment[start : start + len(block)] = np.argmax(
+                block @ centroids.T, axis=1
+            )
+        rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+
+        # Arrays first, ivf.json last: an index is only visible once complete
+        path = store.path
+        _save_array(path, "ivf_centroids.npy", centroids)
+        _save_array(path, "ivf_offsets.npy", offsets)
+        _save_array(path, "ivf_rows.npy", rows)
+        tmp = os.path.join(path, "ivf_vectors.npy.tmp")
+        vectors = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=store.dtype, shape=(count, store.dim)
+        )
+        for start in range(0, count, BLOCK_ROWS):
+            vectors[start : start + BLOCK_ROWS] = store.embeddings[
+                rows[start : start + BLOCK_ROWS]
+            ]
+        vectors.flush()
+        del vectors
+        os.replace(tmp, os.path.join(path, "ivf_vectors.npy"))
+
+        tmp = os.path.join(path, "ivf.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"count": count, "nlist": nlist}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, "ivf.json"))
+        print(f"Built IVF index over {count} reviews ({nlist} lists)")
+        return cls.load(path)
+
+    # -- persistence -------------------------------------------------------
+
+    @staticmethod
+    def modified(path: str) -> Optional[float]:
+        """When the index was last (re)built, None if there is none"""
+        try:
+            return os.path.getmtime(os.path.join(path, "ivf.json"))
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, path: str) -> "ReviewANNIndex":
+        with open(os.path.join(path, "ivf.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        centroids, offsets, rows, vectors = [
+            np.load(os.path.join(path, name), mmap_mode="r") for name in INDEX_FILES
+        ]
+        # Centroids and offsets are small and used by every query - keep in RAM
+        return cls(np.array(centroids), np.array(offsets), rows, vectors, info["count"])
+
+    # -- search ------------------------------------------------------------
+
+    def search(
+        self,
+        store,
+        queries: np.ndarray,
+        top_k: int,
+        mask: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+    ):
+        """Approximate top_k per query; same return shape as store.search"""
+        # Imported here - the store module imports this one
+        from services.review_embedding_store import dequantize
+
+        if mask is not None and mask.sum() <= REVIEW_ANN_EXACT_FILTER_ROWS:
+            return store.exact_search(queries, top_k, mask)
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        nq = len(queries)
+        k = min(top_k, len(store) if mask is None else int(mask.sum()))
+        tail = np.arange(self.count, len(store))
+        if mask is None:
+            list_sizes = np.diff(self.offsets)
+        else:
+            tail = tail[mask[self.count :]]
+            # Matching rows per list, so a restrictive filter probes further
+            matches = np.concatenate([[0], np.cumsum(mask[self.rows])])
+            list_sizes = matches[self.offsets[1:]] - matches[self.offsets[:-1]]
+
+        # Probe each query's nprobe nearest lists, more if they hold < k rows
+        list_order = np.argsort(-(queries @ self.centroids.T), axis=1)
+        reach = np.cumsum(list_sizes[list_order], axis=1) + len(tail)
+        probes = np.maximum(nprobe, (reach < k).sum(axis=1) + 1)
+        query_ids, ranks = np.nonzero(np.arange(self.nlist)[None, :] < probes[:, None])
+        lists = list_order[query_ids, ranks]
+
+        # Score list by list, all queries probing a list in one product
+        found_scores = [[] for _ in range(nq)]
+        found_rows = [[] for _ in range(nq)]
+        by_list = np.argsort(lists, kind="stable")
+        bounds = np.flatnonzero(np.diff(lists[by_list])) + 1
+        for group in np.split(by_list, bounds):
+            if len(group) == 0:
+                continue
+            list_id = lists[group[0]]
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            rows = self.rows[start:end]
+            vectors = self.vectors[start:end]
+            if mask is not None:
+                keep = mask[rows]
+                rows, vectors = rows[keep], vectors[keep]
+            if len(rows) == 0:
+                continue
+            scores = queries[query_ids[group]] @ dequantize(vectors).T
+            for query, query_scores in zip(query_ids[group], scores):
+                best_scores, best_rows = _top_k(query_scores, rows, k)
+                found_scores[query].append(best_scores)
+                found_rows[query].append(best_rows)
+        if len(tail):
+            tail_scores, tail_rows = store.search_rows(queries, tail, k)
+            for query in range(nq):
+                found_scores[query].append(tail_scores[query])
+                found_rows[query].append(tail_rows[query])
+
+        result_scores = np.full((nq, k), -np.inf, dtype=np.float32)
+        result_rows = np.zeros((nq, k), dtype=np.int64)
+        for query in range(nq):
+            if not found_scores[query]:
+                continue
+            best_scores, best_rows = _top_k(
+                np.concatenate(found_scores[query]),
+                np.concatenate(found_rows[query]),
+                k,
+            )
+            order = np.argsort(-best_scores)
+            result_scores[query, : len(order)] = best_scores[order]
+            result_rows[query, : len(order)] = best_rows[order]
+        return result_scores, result_rows
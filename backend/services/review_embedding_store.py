@@ -0,0 +1,447 @@
+"""
+Review Embedding Store
+Persistent, append-only vector store for review embeddings. Embeddings are
+L2-normalized and kept in a flat float16 (or int8) matrix that is memory
+mapped on open, so loading is zero-copy no matter how many reviews there are.
+Review metadata lives in a JSON-lines sidecar addressed by row offsets.
+
+Layout of a store directory:
+    header.json      dim, dtype, model, row count, sidecar size
+    embeddings.bin   count x dim matrix
+    hashes.bin       count x 16 byte content hashes, for deduplication
+    offsets.bin      count uint64 offsets into meta.jsonl
+    place_ids.bin    count int32 codes into header["places"], for filtering
+    location_ids.bin count int32 codes into header["locations"]
+    meta.jsonl       one review (author, rating, text, place...) per line
+    ivf_*.npy        optional ANN index (services/review_ann_index.py)
+
+The header is rewritten atomically after the data files are flushed, so a
+crash mid-append leaves at most some ignored bytes past the recorded count.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from services.review_ann_index import ReviewANNIndex
+from utils.config import REVIEW_ANN_MIN_ROWS
+
+HASH_BYTES = 16
+INT8_SCALE = 127.0
+SEARCH_BLOCK_ROWS = 65536
+
+
+def review_hash(review: Dict) -> bytes:
+    """Content hash of a review - same text for the same place is a duplicate"""
+    text = " ".join(str(review.get("text", "")).lower().split())
+    key = f"{review.get('place', '')}|{review.get('location', '')}|{text}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=HASH_BYTES).digest()
+
+
+def normalize_label(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def dequantize(data: np.ndarray) -> np.ndarray:
+    if data.dtype == np.int8:
+        return data.astype(np.float32) / INT8_SCALE
+    return data.astype(np.float32)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ReviewEmbeddingStore:
+    def __init__(
+        self,
+        path: str,
+        dim: Optional[int] = None,
+        dtype: str = "float16",
+        model_name: Optional[str] = None,
+    ):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.path = path
+        self._lock = threading.Lock()  # writers, and the shared meta file handle
+        # Searches see the mapped arrays, header and index swap together
+        self._map_lock = threading.Lock()
+        self._hashes = None  # set of digests, built on first add
+        self._meta_file = None
+        self._label_lookup = {}  # kind -> {label: code}
+        os.makedirs(path, exist_ok=True)
+
+        header = self._read_header()
+        if header is None:
+            header = {
+                "dim": dim,
+                "dtype": dtype,
+                "model": model_name,
+                "count": 0,
+                "meta_bytes": 0,
+                "places": [],
+                "locations": [],
+            }
+        elif model_name and header.get("model") and header["model"] != model_name:
+            raise ValueError(
+                f"Store at {path} holds {header['model']} embeddings, not {model_name}"
+            )
+        self.header = header
+        if "places" not in header:
+            self._backfill_labels()
+        self._map()
+        self.index = None
+        self._index_mtime = None
+        self._load_index()
+
+    def _load_index(self):
+        mtime = ReviewANNIndex.modified(self.path)
+        if mtime is None or mtime == self._index_mtime:
+            return
+        index = ReviewANNIndex.load(self.path)
+        # An index newer than the header is from an append that never landed
+        if index.count <= len(self):
+            self.index = index
+            self._index_mtime = mtime
+
+    def reload(self) -> bool:
+        """
+        Pick up rows and an index another process (the ingestion job in
+        another worker) wrote since this store was opened. Costs one small
+        file read when nothing changed. Returns whether anything did.
+        """
+        header = self._read_header()
+        changed = header is not None and header["count"] != len(self)
+        with self._lock, self._map_lock:
+            if changed:
+                self.header = header
+                self._label_lookup = {}
+                self._hashes = None
+                self._map()
+            index = self.index
+            self._load_index()
+        return changed or self.index is not index
+
+    # -- files -------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_header(self) -> Optional[dict]:
+        try:
+            with open(self._file("header.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self):
+        tmp = self._file("header.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.header, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file("header.json"))
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.header["dim"]
+
+    @property
+    def dtype(self):
+        return np.dtype(self.header["dtype"])
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def _map(self):
+        """(Re)map the data files read-only; no data is read until it's used"""
+        count = len(self)
+        if count == 0 or not self.dim:
+            self.embeddings = np.zeros((0, self.dim or 0), dtype=self.dtype)
+            self.offsets = np.zeros(0, dtype=np.uint64)
+            self.place_ids = np.zeros(0, dtype=np.int32)
+            self.location_ids = np.zeros(0, dtype=np.int32)
+            return
+        self.embeddings = np.memmap(
+            self._file("embeddings.bin"),
+            dtype=self.dtype,
+            mode="r",
+            shape=(count, self.dim),
+        )
+        self.offsets = np.memmap(
+            self._file("offsets.bin"), dtype=np.uint64, mode="r", shape=(count,)
+        )
+        self.place_ids = np.memmap(
+            self._file("place_ids.bin"), dtype=np.int32, mode="r", shape=(count,)
+        )
+        self.location_ids = np.memmap(
+            self._file("location_ids.bin"), dtype=np.int32, mode="r", shape=(count,)
+        )
+
+    def _backfill_labels(self):
+        """Stores written before place/location filtering get their codes once"""
+        self.header["places"] = []
+        self.header["locations"] = []
+        place_ids = []
+        location_ids = []
+        if self.header["count"]:
+            with open(self._file("meta.jsonl"), "rb") as f:
+                for _ in range(self.header["count"]):
+                    review = json.loads(f.readline())
+                    place_ids.append(self._label_code("places", review.get("place")))
+                    location_ids.append(
+                        self._label_code("locations", review.get("location"))
+                    )
+        for name, codes in (
+            ("place_ids.bin", place_ids),
+            ("location_ids.bin", location_ids),
+        ):
+            with open(self._file(name), "wb") as f:
+                f.write(np.asarray(codes, dtype=np.int32).tobytes())
+        self._write_header()
+
+    def _label_code(self, kind: str, value) -> int:
+        labels = self.header[kind]
+        lookup = self._label_lookup.get(kind)
+        if lookup is None or len(lookup) != len(labels):
+            lookup = {label: i for i, label in enumerate(labels)}
+            self._label_lookup[kind] = lookup
+        label = normalize_label(value)
+        if label not in lookup:
+            lookup[label] = len(labels)
+            labels.append(label)
+        return lookup[label]
+
+    def filter_rows(self, place=None, location=None) -> Optional[np.ndarray]:
+        """Boolean row mask for a place/location filter, None when unfiltered"""
+        mask = None
+        for kind, ids, value in (
+            ("places", self.place_ids, place),
+            ("locations", self.location_ids, location),
+        ):
+            if value is None:
+                continue
+            try:
+                code = self.header[kind].index(normalize_label(value))
+            except ValueError:
+                return np.zeros(len(self), dtype=bool)
+            match = np.asarray(ids) == code
+            mask = match if mask is None else mask & match
+        return mask
+
+    # -- reads -------------------------------------------------------------
+
+    def vectors(self, rows=None) -> np.ndarray:
+        """Embeddings as float32 (dequantized), for all rows or the given ones"""
+        return dequantize(self.embeddings if rows is None else self.embeddings[rows])
+
+    def get(self, row: int) -> Dict:
+        if self._meta_file is None:
+            self._meta_file = open(self._file("meta.jsonl"), "rb")
+        with self._lock:
+            self._meta_file.seek(int(self.offsets[row]))
+            return json.loads(self._meta_file.readline())
+
+    def get_many(self, rows: Iterable[int]) -> List[Dict]:
+        return [self.get(int(row)) for row in rows]
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        place: Optional[str] = None,
+        location: Optional[str] = None,
+        exact: bool = False,
+    ):
+        """
+        Cosine search for one or more query vectors, optionally limited to a
+        place and/or location. Uses the ANN index when one has been built.
+        Returns (scores, rows) arrays of shape (n_queries, k), best first.
+        """
+        queries = normalize_rows(query_vectors)
+        with self._map_lock:
+            mask = self.filter_rows(place, location)
+            if self.index is not None and not exact:
+                return self.index.search(self, queries, top_k, mask)
+            return self.exact_search(queries, top_k, mask)
+
+    def exact_search(self, queries: np.ndarray, top_k: int, mask=None):
+        """Brute-force search; mask limits it to the matching rows"""
+        rows = None if mask is None else np.flatnonzero(mask)
+        return self.search_rows(queries, rows, top_k)
+
+    def search_rows(self, queries: np.ndarray, rows: Optional[np.ndarray], top_k: int):
+        """Exact top_k among the given rows (all rows when None)"""
+        total = len(self) if rows is None else len(rows)
+        k = min(top_k, total)
+        if k == 0:
+            return (
+                np.zeros((len(queries), 0), dtype=np.float32),
+                np.zeros((len(queries), 0), dtype=np.int64),
+            )
+
+        # Score in blocks so the matrix is never dequantized all at once
+        scores = np.empty((len(queries), total), dtype=np.float32)
+        for start in range(0, total, SEARCH_BLOCK_ROWS):
+            end = start + SEARCH_BLOCK_ROWS
+            block = slice(start, end) if rows is None else rows[start:end]
+            scores[:, start:end] = queries @ self.vectors(block).T
+
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-top, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        if rows is not None:
+            best = rows[best]
+        return np.take_along_axis(top, order, axis=1), best
+
+    def build_index(self, nlist: Optional[int] = None, **kwargs):
+        """Train and save the ANN index over everything stored so far"""
+        # Rows are never rewritten, so searches can go on during the build
+        index = ReviewANNIndex.build(self, nlist=nlist, **kwargs)
+        with self._map_lock:
+            self.index = index
+        return index
+
+    def refresh_index(self, min_rows: int = REVIEW_ANN_MIN_ROWS) -> bool:
+        """
+        (Re)build the ANN index once the store is big enough for it to pay
+        off, or when rows added since the last build exceed a tenth of it.
+        """
+        if len(self) < min_rows:
+            return False
+        if (
+            self.index is not None
+            and len(self) - self.index.count <= self.index.count // 10
+        ):
+            return False
+        self.build_index()
+        return True
+
+    # -- writes ------------------------------------------------------------
+
+    def _load_hashes(self):
+        if self._hashes is not None:
+            return
+        self._hashes = set()
+        if len(self):
+            raw = np.fromfile(
+                self._file("hashes.bin"), dtype=np.uint8, count=len(self) * HASH_BYTES
+            )
+            self._hashes = {
+                raw[i : i + HASH_BYTES].tobytes()
+                for i in range(0, len(raw), HASH_BYTES)
+            }
+
+    def _truncate_to_header(self):
+        """Drop bytes of an append that crashed before its header was written"""
+        sizes = {
+            "embeddings.bin": len(self) * (self.dim or 0) * self.dtype.itemsize,
+            "hashes.bin": len(self) * HASH_BYTES,
+            "offsets.bin": len(self) * 8,
+            "place_ids.bin": len(self) * 4,
+            "location_ids.bin": len(self) * 4,
+            "meta.jsonl": self.header["meta_bytes"],
+        }
+        for name, size in sizes.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def add(
+        self, reviews: List[Dict], encode: Callable[[List[str]], np.ndarray]
+    ) -> int:
+        """
+        Embed and append reviews that aren't stored yet. encode takes a list
+        of texts and returns an (n, dim) array. Returns the number added.
+        """
+        with self._lock:
+            self._load_hashes()
+            new_reviews = []
+            new_hashes = []
+            seen = set()
+            for review in reviews:
+                if not review.get("text"):
+                    continue
+                digest = review_hash(review)
+                if digest in self._hashes or digest in seen:
+                    continue
+                seen.add(digest)
+                new_reviews.append(review)
+                new_hashes.append(digest)
+        if not new_reviews:
+            return 0
+
+        # Encoding is the slow part - don't hold the lock for it
+        vectors = normalize_rows(encode([r["text"] for r in new_reviews]))
+
+        with self._lock:
+            # Skip anything a concurrent add() stored in the meantime
+            self._load_hashes()
+            keep = [i for i, d in enumerate(new_hashes) if d not in self._hashes]
+            if not keep:
+                return 0
+            new_reviews = [new_reviews[i] for i in keep]
+            new_hashes = [new_hashes[i] for i in keep]
+            vectors = vectors[keep]
+            if self.dim is None:
+                self.header["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding size {vectors.shape[1]} does not match store ({self.dim})"
+                )
+            if self.dtype == np.int8:
+                stored = np.clip(np.round(vectors * INT8_SCALE), -127, 127)
+            else:
+                stored = vectors
+            stored = stored.astype(self.dtype)
+
+            self._truncate_to_header()
+            place_ids = np.asarray(
+                [self._label_code("places", r.get("place")) for r in new_reviews],
+                dtype=np.int32,
+            )
+            location_ids = np.asarray(
+                [self._label_code("locations", r.get("location")) for r in new_reviews],
+                dtype=np.int32,
+            )
+            offsets = []
+            meta_bytes = self.header["meta_bytes"]
+            with open(self._file("meta.jsonl"), "ab") as f:
+                for review in new_reviews:
+                    line = (json.dumps(review, ensure_ascii=False) + "\n").encode(
+                        "utf-8"
+                    )
+                    offsets.append(meta_bytes)
+                    f.write(line)
+                    meta_bytes += len(line)
+                f.flush()
+                os.fsync(f.fileno())
+            for name, data in (
+                ("embeddings.bin", stored.tobytes()),
+                ("hashes.bin", b"".join(new_hashes)),
+                ("offsets.bin", np.asarray(offsets, dtype=np.uint64).tobytes()),
+                ("place_ids.bin", place_ids.tobytes()),
+                ("location_ids.bin", location_ids.tobytes()),
+            ):
+                with open(self._file(name), "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            with self._map_lock:
+                self.header["count"] += len(new_reviews)
+                self.header["meta_bytes"] = meta_bytes
+                self._write_header()
+                self._map()
+            self._hashes.update(new_hashes)
+            return len(new_reviews)
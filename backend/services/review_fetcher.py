@@ -0,0 +1,193 @@
+"""
+Review Fetcher
+Async HTTP fetch-and-parse path for review pages that are server rendered
+and don't need a browser. One pooled httpx client is shared by all requests,
+concurrency is capped per host, transient failures (connection errors, 429,
+5xx) are retried with exponential backoff, and responses are cached on disk:
+fresh entries are served without a request, stale ones are revalidated with
+If-None-Match / If-Modified-Since.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.review_parsers import parse_tripadvisor_reviews
+from utils.config import (
+    REVIEW_HTTP_CACHE_DIR,
+    REVIEW_HTTP_CACHE_TTL,
+    REVIEW_FETCH_PER_HOST,
+    REVIEW_FETCH_MAX_CONNECTIONS,
+    REVIEW_FETCH_RETRIES,
+    REVIEW_FETCH_TIMEOUT,
+)
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF_SECONDS = 0.5
+MAX_RETRY_AFTER_SECONDS = 30
+
+
+class ReviewFetcher:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = REVIEW_HTTP_CACHE_DIR,
+        cache_ttl: float = REVIEW_HTTP_CACHE_TTL,
+        per_host: int = REVIEW_FETCH_PER_HOST,
+        max_connections: int = REVIEW_FETCH_MAX_CONNECTIONS,
+        retries: int = REVIEW_FETCH_RETRIES,
+        timeout: float = REVIEW_FETCH_TIMEOUT,
+        parser: Optional[str] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.per_host = per_host
+        self.retries = retries
+        self.parser = parser
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "revalidated": 0,
+            "retries": 0,
+            "failures": 0,
+        }
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    # -- disk cache --------------------------------------------------------
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def _read_cache(self, url: str) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(url) + ".json", "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(self._cache_path(url) + ".html", "r", encoding="utf-8") as f:
+                entry["body"] = f.read()
+            return entry
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_cache(self, url: str, body: str, headers: httpx.Headers):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(url)
+        entry = {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        }
+        # Body first, metadata last - an entry without metadata is a miss
+        for suffix, data in ((".html", body), (".json", json.dumps(entry))):
+            with open(path + suffix + ".tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(path + suffix + ".tmp", path + suffix)
+
+    # -- fetching ----------------------------------------------------------
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+        delay = RETRY_BACKOFF_SECONDS * 2**attempt
+        return delay + random.uniform(0, delay)
+
+    async def fetch(self, url: str) -> str:
+        """Page body, from the cache when fresh; raises httpx.HTTPError"""
+        cached = self._read_cache(url)
+        if cached and time.time() - cached["fetched_at"] < self.cache_ttl:
+            self.stats["cache_hits"] += 1
+            return cached["body"]
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with self._host_limit(url):
+            for attempt in range(self.retries + 1):
+                response = None
+                self.stats["requests"] += 1
+                try:
+                    response = await self.client.get(url, headers=headers)
+                except httpx.TransportError as e:
+                    error = e
+                else:
+                    if response.status_code == 304 and cached:
+                        self.stats["revalidated"] += 1
+                        self._write_cache(url, cached["body"], response.headers)
+                        return cached["body"]
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        self._write_cache(url, response.text, response.headers)
+                        return response.text
+                    error = httpx.HTTPStatusError(
+                        f"{response.status_code} from {url}",
+                        request=response.request,
+                        response=response,
+                    )
+                if attempt == self.retries:
+                    self.stats["failures"] += 1
+                    raise error
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def fetch_tripadvisor_reviews(
+        self, place_urls: List[str], max_reviews: int = 20
+    ) -> List[Dict]:
+        """Fetch and parse several TripAdvisor pages concurrently"""
+
+        async def fetch_one(url: str) -> List[Dict]:
+            try:
+                html = await self.fetch(url)
+            except httpx.HTTPError as e:
+                print(f"Error fetching {url}: {e}")
+                return []
+            # Parsing is CPU work - keep it off the event loop
+            return await asyncio.to_thread(
+                parse_tripadvisor_reviews, html, max_reviews, self.parser
+            )
+
+        results = await asyncio.gather(*(fetch_one(url) for url in place_urls))
+        return [review for reviews in results for review in reviews]
@@ -0,0 +1,289 @@
+"""
+Review Ingestion
+Crawls and embeds reviews per destination in the background, so itinerary
+requests never wait on a browser or a model. Creating an itinerary only
+records the destination (request_destination) and does a top-k lookup in the
+persistent review store (get_review_snippets); the scheduler job
+(run_review_ingestion) later scrapes destinations that have been requested
+but not crawled yet, or whose reviews are older than REVIEW_REFRESH_DAYS.
+
+Every uvicorn worker schedules the job, so each destination is claimed with
+a conditional UPDATE before it is crawled, and a run only starts while it
+holds an exclusive lock on the store directory - one process appends at a
+time. Lookups in the other workers pick the new rows up from disk. The
+embedding model is loaded by the worker holding that lock when it has
+destinations to ingest; any other worker loads it on its first lookup, which
+returns no snippets rather than waiting for it.
+
+The crawler needs selenium, Chrome and sentence-transformers, which the API
+server doesn't require. Without them ingestion is skipped and itineraries are
+generated without review snippets, as before.
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal
+from models.review import ReviewIngestion
+
+try:
+    import fcntl
+except ImportError:  # Windows - only the database claims guard the crawls
+    fcntl = None
+from utils.config import (
+    REVIEW_STORE_PATH,
+    REVIEW_EMBEDDING_DTYPE,
+    EMBEDDING_MODEL,
+    REVIEW_INGEST_BATCH,
+    REVIEW_INGEST_CATEGORIES,
+    REVIEW_INGEST_MAX_REVIEWS,
+    REVIEW_REFRESH_DAYS,
+    REVIEW_SNIPPETS_TOP_K,
+    REVIEW_LOOKUP_TIMEOUT_MS,
+)
+
+try:
+    from services.review_embedding_store import ReviewEmbeddingStore, normalize_label
+    from services.embedding_service import get_embedding_service
+except ImportError:  # numpy isn't installed - no review store
+    ReviewEmbeddingStore = None
+
+    def normalize_label(value) -> str:
+        return " ".join(str(value or "").lower().split())
+
+
+# Longest review excerpt put into the prompt
+SNIPPET_CHARS = 200
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_review_store() -> Optional["ReviewEmbeddingStore"]:
+    """Process-wide review store shared by ingestion and lookups"""
+    global _store
+    if ReviewEmbeddingStore is None:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ReviewEmbeddingStore(
+                REVIEW_STORE_PATH,
+                dtype=REVIEW_EMBEDDING_DTYPE,
+                model_name=EMBEDDING_MODEL,
+            )
+        return _store
+
+
+def encode(texts: List[str]):
+    return get_embedding_service().encode(texts)
+
+
+def request_destination(db: Session, destination: str) -> ReviewIngestion:
+    """Queue a destination for ingestion unless it is already known"""
+    key = normalize_label(destination)
+    ingestion = (
+        db.query(ReviewIngestion).filter(ReviewIngestion.destination == key).first()
+    )
+    if ingestion is None:
+        ingestion = ReviewIngestion(destination=key, status="pending")
+        db.add(ingestion)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request queued it first
+            db.rollback()
+    return ingestion
+
+
+def ingest_destination(destination: str) -> int:
+    """
+    Scrape reviews for every REVIEW_INGEST_CATEGORIES place type at the
+    destination and add them to the store. Returns the number of new reviews.
+    """
+    store = get_review_store()
+    if store is None:
+        raise RuntimeError("numpy is not installed")
+    # Selenium is only needed here, not by the API
+    from services.similarity_search_service import PlaceReviewCrawler
+
+    crawler = PlaceReviewCrawler(store=store)
+    try:
+        reviews = crawler.scrape_places(
+            [(category, destination) for category in REVIEW_INGEST_CATEGORIES],
+            max_reviews=REVIEW_INGEST_MAX_REVIEWS,
+        )
+    finally:
+        crawler.close()
+
+    # Rows another process appended since the store was opened
+    store.reload()
+    added = store.add(reviews, encode)
+    store.refresh_index()
+    return added
+
+
+def due_destinations(db: Session, limit: int = REVIEW_INGEST_BATCH):
+    """Destinations never crawled, or crawled more than REVIEW_REFRESH_DAYS ago"""
+    cutoff = datetime.utcnow() - timedelta(days=REVIEW_REFRESH_DAYS)
+    return (
+        db.query(ReviewIngestion)
+        .filter(
+            or_(
+                ReviewIngestion.last_ingested_at.is_(None),
+                ReviewIngestion.last_ingested_at < cutoff,
+            )
+        )
+        .order_by(ReviewIngestion.requested_at)
+        .limit(limit)
+        .all()
+    )
+
+
+def claim_destination(db: Session, ingestion: ReviewIngestion) -> bool:
+    """
+    Mark a due destination as running unless another worker got to it first.
+    The claim moves last_ingested_at, so a run that dies mid-crawl is retried
+    on the next refresh like a failed one.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=REVIEW_REFRESH_DAYS)
+    claimed = (
+        db.query(ReviewIngestion)
+        .filter(
+            ReviewIngestion.id == ingestion.id,
+            or_(
+                ReviewIngestion.last_ingested_at.is_(None),
+                ReviewIngestion.last_ingested_at < cutoff,
+            ),
+        )
+        .update(
+            {"status": "running", "last_ingested_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return bool(claimed)
+
+
+def _lock_store(path: str):
+    """Exclusive lock on the store directory, None if another process has it"""
+    os.makedirs(path, exist_ok=True)
+    handle = open(os.path.join(path, "ingest.lock"), "a")
+    if fcntl is None:
+        return handle
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def run_review_ingestion():
+    """Scheduler job: ingest up to REVIEW_INGEST_BATCH due destinations"""
+    store = get_review_store()
+    if store is None:
+        print("Review ingestion skipped: numpy is not installed")
+        return
+    lock = _lock_store(store.path)
+    if lock is None:
+        print("Review ingestion skipped: another worker is running it")
+        return
+    db = SessionLocal()
+    try:
+        due = due_destinations(db)
+        if due:
+            # Only the worker holding the lock, with work to do, loads the
+            # model here; the others load it on their first lookup
+            try:
+                get_embedding_service().warm_up().result()
+            except ImportError as e:
+                print(f"Review ingestion skipped: {e}")
+                return
+        for ingestion in due:
+            if not claim_destination(db, ingestion):
+                continue
+            db.refresh(ingestion)
+            print(f"Ingesting reviews for {ingestion.destination}...")
+            try:
+                added = ingest_destination(ingestion.destination)
+            except Exception as e:
+                print(f"Review ingestion failed for {ingestion.destination}: {e}")
+                ingestion.status = "failed"
+                ingestion.error = str(e)
+            else:
+                print(f"Ingested {added} new reviews for {ingestion.destination}")
+                ingestion.status = "ok"
+                ingestion.error = None
+                ingestion.review_count = (ingestion.review_count or 0) + added
+            # Failures are retried on the next refresh, not every run
+            ingestion.last_ingested_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        lock.close()
+
+
+def review_query(trip_preferences: Optional[str], user_preferences: Dict) -> str:
+    interests = user_preferences.get("interests") or []
+    parts = [trip_preferences or "", " ".join(str(i) for i in interests)]
+    return " ".join(p for p in parts if p).strip() or "must visit places"
+
+
+def lookup_reviews(destination: str, query: str, top_k: int) -> List[Dict]:
+    store = get_review_store()
+    if store is None:
+        return []
+    # The ingestion job may run in another worker; this only reads the header
+    store.reload()
+    if len(store) == 0:
+        return []
+    service = get_embedding_service()
+    if not service.ready.is_set():
+        # Never load the model inside a request; the next one finds it ready
+        service.warm_up()
+        return []
+    scores, rows = store.search(encode([query]), top_k=top_k, location=destination)
+    return store.get_many(rows[0])
+
+
+def format_snippets(reviews: List[Dict]) -> str:
+    lines = []
+    for review in reviews:
+        text = " ".join(review["text"].split())
+        if len(text) > SNIPPET_CHARS:
+            text = text[:SNIPPET_CHARS].rstrip() + "..."
+        lines.append(f'- {review.get("place")}: "{text}" ({review.get("rating")})')
+    return "\n".join(lines)
+
+
+async def get_review_snippets(
+    destination: str,
+    trip_preferences: Optional[str] = None,
+    user_preferences: Optional[Dict] = None,
+    top_k: int = REVIEW_SNIPPETS_TOP_K,
+) -> str:
+    """
+    Review excerpts for the destination that best match the trip, formatted
+    for the prompt. Empty when nothing has been ingested yet or the lookup
+    takes longer than REVIEW_LOOKUP_TIMEOUT_MS - reviews never hold up a trip.
+    """
+    query = review_query(trip_preferences, user_preferences or {})
+    try:
+        reviews = await asyncio.wait_for(
+            asyncio.to_thread(lookup_reviews, destination, query, top_k),
+            timeout=REVIEW_LOOKUP_TIMEOUT_MS / 1000,
+        )
+    except asyncio.TimeoutError:
+        print(f"Review lookup for {destination} timed out")
+        return ""
+    except Exception as e:
+        print(f"Review lookup for {destination} failed: {e}")
+        return ""
+    return format_snippets(reviews)
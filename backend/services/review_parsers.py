@@ -0,0 +1,118 @@
+"""
+Review Parsers
+HTML -> review dicts for the pages the review crawler reads, shared by the
+Selenium scraper and the plain-HTTP fetcher. Parsing uses lxml when it is
+installed (REVIEW_HTML_PARSER), which is several times faster than Python's
+html.parser on review pages.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from utils.config import REVIEW_HTML_PARSER
+
+try:
+    import lxml  # noqa: F401
+except ImportError:  # html.parser only
+    lxml = None
+
+GOOGLE_AUTHOR = re.compile("d4r55")
+GOOGLE_STARS = re.compile("stars")
+GOOGLE_TEXT = re.compile("wiI7pd")
+GOOGLE_DATE = re.compile("rsqaWe")
+TRIPADVISOR_AUTHOR = re.compile("BMQDV")
+TRIPADVISOR_RATING = re.compile("UctUV")
+TRIPADVISOR_TEXT = re.compile("QewHA")
+TRIPADVISOR_DATE = re.compile("biGQs")
+
+
+def html_parser(name: Optional[str] = None) -> str:
+    name = name or REVIEW_HTML_PARSER
+    if name == "lxml" and lxml is None:
+        return "html.parser"
+    return name
+
+
+def parse_google_maps_reviews(
+    html: str,
+    place_name: str,
+    location: str,
+    max_reviews: int = 20,
+    parser: Optional[str] = None,
+) -> List[Dict]:
+    soup = BeautifulSoup(html, html_parser(parser))
+    review_elements = soup.find_all("div", {"data-review-id": True})
+
+    reviews_data = []
+    for idx, review in enumerate(review_elements[:max_reviews]):
+        try:
+            author_elem = review.find("div", class_=GOOGLE_AUTHOR)
+            author = author_elem.text if author_elem else "Anonymous"
+
+            rating_elem = review.find(
+                "span", {"role": "img", "aria-label": GOOGLE_STARS}
+            )
+            rating = rating_elem["aria-label"].split()[0] if rating_elem else "N/A"
+
+            text_elem = review.find("span", class_=GOOGLE_TEXT)
+            review_text = text_elem.text if text_elem else ""
+
+            date_elem = review.find("span", class_=GOOGLE_DATE)
+            date = date_elem.text if date_elem else "N/A"
+
+            if review_text:
+                reviews_data.append(
+                    {
+                        "id": idx,
+                        "author": author,
+                        "rating": rating,
+                        "date": date,
+                        "text": review_text,
+                        "place": place_name,
+                        "location": location,
+                    }
+                )
+        except Exception as e:
+            print(f"Error parsing review: {e}")
+            continue
+    return reviews_data
+
+
+def parse_tripadvisor_reviews(
+    html: str, max_reviews: int = 20, parser: Optional[str] = None
+) -> List[Dict]:
+    soup = BeautifulSoup(html, html_parser(parser))
+    review_elements = soup.find_all("div", {"data-automation": "reviewCard"})
+
+    reviews_data = []
+    for idx, review in enumerate(review_elements[:max_reviews]):
+        try:
+            author_elem = review.find("a", class_=TRIPADVISOR_AUTHOR)
+            author = author_elem.text if author_elem else "Anonymous"
+
+            rating_elem = review.find("svg", class_=TRIPADVISOR_RATING)
+            rating = rating_elem["aria-label"].split()[0] if rating_elem else "N/A"
+
+            text_elem = review.find("span", class_=TRIPADVISOR_TEXT)
+            review_text = text_elem.text if text_elem else ""
+
+            date_elem = review.find("div", class_=TRIPADVISOR_DATE)
+            date = date_elem.text if date_elem else "N/A"
+
+            if review_text:
+                reviews_data.append(
+                    {
+                        "id": idx,
+                        "author": author,
+                        "rating": rating,
+                        "date": date,
+                        "text": review_text,
+                        "source": "TripAdvisor",
+                    }
+                )
+        except Exception as e:
+            print(f"Error parsing review: {e}")
+            continue
+    return reviews_data
@@ -1,236 +1,210 @@
 """
 Place Review Crawler with Semantic Search
-Single-file implementation using Selenium, BeautifulSoup, and Sentence Transformers
+Selenium and BeautifulSoup for scraping, Sentence Transformers for embeddings.
+Pages that don't need JavaScript can be fetched over plain async HTTP instead
+(services/review_fetcher.py), which is far cheaper than a browser per page.
+Embeddings are kept in a persistent ReviewEmbeddingStore, so only reviews that
+haven't been seen before are encoded and the index survives restarts.
+Run from the backend directory: python -m services.similarity_search_service
 """
 
-import time
-import re
-from typing import List, Dict
-from selenium import webdriver
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer, util
-import torch
 import numpy as np
 
+from services.browser_pool import BrowserPool, chrome_options, wait_for, wait_for_element, scroll_until_loaded
+from services.embedding_service import get_embedding_service
+from services.review_embedding_store import ReviewEmbeddingStore
+from services.review_fetcher import ReviewFetcher
+from services.review_parsers import parse_google_maps_reviews, parse_tripadvisor_reviews
+from utils.config import REVIEW_STORE_PATH, REVIEW_EMBEDDING_DTYPE, EMBEDDING_MODEL
+
+GOOGLE_MAPS_URL = 'https://www.google.com'
+
 class PlaceReviewCrawler:
-    def __init__(self, headless: bool = True):
-        """Initialize crawler with Selenium WebDriver"""
-        self.options = Options()
-        if headless:
-            self.options.add_argument('--headless')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.options.add_argument('--disable-blink-features=AutomationControlled')
-        self.driver = None
+    def __init__(self, headless: bool = True, store_path: str = REVIEW_STORE_PATH,
+                 pool: Optional[BrowserPool] = None, maps_base_url: str = GOOGLE_MAPS_URL,
+                 store: Optional[ReviewEmbeddingStore] = None):
+        """Initialize crawler with a pool of Selenium WebDrivers"""
+        # Browsers are started on first use and reused across places
+        self.pool = pool or BrowserPool(options=chrome_options(headless))
+        self.maps_base_url = maps_base_url.rstrip('/')
         self.reviews = []
+        self._reviews_lock = threading.Lock()
         
-        # Initialize semantic search model
-        print("Loading semantic search model...")
-        self.model = SentenceTransformer('paraphrase-multilingual-mpnet-base-v2')
-        self.review_embeddings = None
-        
-    def start_driver(self):
-        """Start the WebDriver"""
-        self.driver = webdriver.Chrome(options=self.options)
+        # The embedding model is shared and only loaded when first needed;
+        # encoding goes through the process-wide micro-batching service.
+        # Pass store to share one with other users in the process
+        self.store = store or ReviewEmbeddingStore(
+            store_path, dtype=REVIEW_EMBEDDING_DTYPE, model_name=EMBEDDING_MODEL
+        )
         
-    def close_driver(self):
-        """Close the WebDriver"""
-        if self.driver:
-            self.driver.quit()
+    def close(self):
+        """Shut down the pooled browsers"""
+        self.pool.close()
+
+    def _add_reviews(self, reviews: List[Dict]):
+        with self._reviews_lock:
+            self.reviews.extend(reviews)
+
+    def scrape_places(self, places: List[Tuple[str, str]], max_reviews: int = 20) -> List[Dict]:
+        """
+        Scrape Google Maps reviews for several (place_name, location) pairs
+        concurrently, one pooled browser per place at a time
+        """
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            results = executor.map(
+                lambda place: self.scrape_google_maps_reviews(place[0], place[1], max_reviews),
+                places
+            )
+            return [review for reviews in results for review in reviews]
             
     def scrape_google_maps_reviews(self, place_name: str, location: str, max_reviews: int = 20) -> List[Dict]:
         """
         Scrape reviews from Google Maps
         """
         try:
-            self.start_driver()
-            
-            # Construct search query
-            query = f"{place_name} {location}"
-            search_url = f"https://www.google.com/maps/search/{query.replace(' ', '+')}"
-            
-            print(f"Searching for: {query}")
-            self.driver.get(search_url)
-            time.sleep(3)
-            
-            # Click on first result
-            try:
-                first_result = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "a[href*='/maps/place/']"))
-                )
-                first_result.click()
-                time.sleep(2)
-            except Exception as e:
-                print(f"Error clicking first result: {e}")
+            with self.pool.driver() as driver:
+                page_source = self._load_google_maps_reviews(driver, place_name, location, max_reviews)
+            if page_source is None:
                 return []
             
-            # Click on reviews tab
-            try:
-                reviews_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Reviews')]"))
-                )
-                reviews_button.click()
-                time.sleep(2)
-            except Exception as e:
-                print(f"Could not find reviews button: {e}")
-            
-            # Scroll to load reviews
-            scrollable_div = self.driver.find_element(By.CSS_SELECTOR, "div[role='main']")
-            for _ in range(5):
-                self.driver.execute_script('arguments[0].scrollTop = arguments[0].scrollHeight', scrollable_div)
-                time.sleep(1)
-            
-            # Parse reviews
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            review_elements = soup.find_all('div', {'data-review-id': True})
-            
-            reviews_data = []
-            for idx, review in enumerate(review_elements[:max_reviews]):
-                try:
-                    # Extract reviewer name
-                    author_elem = review.find('div', class_=re.compile('d4r55'))
-                    author = author_elem.text if author_elem else "Anonymous"
-                    
-                    # Extract rating
-                    rating_elem = review.find('span', {'role': 'img', 'aria-label': re.compile('stars')})
-                    rating = rating_elem['aria-label'].split()[0] if rating_elem else "N/A"
-                    
-                    # Extract review text
-                    text_elem = review.find('span', class_=re.compile('wiI7pd'))
-                    review_text = text_elem.text if text_elem else ""
-                    
-                    # Extract date
-                    date_elem = review.find('span', class_=re.compile('rsqaWe'))
-                    date = date_elem.text if date_elem else "N/A"
-                    
-                    if review_text:
-                        reviews_data.append({
-                            'id': idx,
-                            'author': author,
-                            'rating': rating,
-                            'date': date,
-                            'text': review_text,
-                            'place': place_name,
-                            'location': location
-                        })
-                        
-                except Exception as e:
-                    print(f"Error parsing review: {e}")
-                    continue
-            
-            self.reviews.extend(reviews_data)
+            reviews_data = parse_google_maps_reviews(page_source, place_name, location, max_reviews)
+            self._add_reviews(reviews_data)
             print(f"Scraped {len(reviews_data)} reviews")
             return reviews_data
             
         except Exception as e:
             print(f"Error during scraping: {e}")
             return []
-        finally:
-            self.close_driver()
+
+    def _load_google_maps_reviews(self, driver, place_name: str, location: str,
+                                  max_reviews: int) -> Optional[str]:
+        """
+        Open the place's reviews and scroll until enough have loaded. Every
+        step waits for the element it needs rather than a fixed time.
+        """
+        # Construct search query
+        query = f"{place_name} {location}"
+        search_url = f"{self.maps_base_url}/maps/search/{query.replace(' ', '+')}"
+        
+        print(f"Searching for: {query}")
+        driver.get(search_url)
+        
+        # Click on first result
+        try:
+            first_result = wait_for(
+                driver, EC.element_to_be_clickable((By.CSS_SELECTOR, "a[href*='/maps/place/']"))
+            )
+            first_result.click()
+        except Exception as e:
+            print(f"Error clicking first result: {e}")
+            return None
+        
+        # Click on reviews tab
+        try:
+            reviews_button = wait_for(
+                driver, EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Reviews')]"))
+            )
+            reviews_button.click()
+            wait_for_element(driver, By.CSS_SELECTOR, "div[data-review-id]")
+        except Exception as e:
+            print(f"Could not find reviews button: {e}")
+        
+        # Scroll until enough reviews have loaded or no more appear
+        scrollable_div = driver.find_element(By.CSS_SELECTOR, "div[role='main']")
+        scroll_until_loaded(driver, "div[data-review-id]", max_reviews, container=scrollable_div)
+        return driver.page_source
     
     def scrape_tripadvisor_reviews(self, place_url: str, max_reviews: int = 20) -> List[Dict]:
         """
         Scrape reviews from TripAdvisor
         """
         try:
-            self.start_driver()
-            self.driver.get(place_url)
-            time.sleep(3)
-            
-            # Scroll to load reviews
-            for _ in range(3):
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(1)
-            
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            review_elements = soup.find_all('div', {'data-automation': 'reviewCard'})
-            
-            reviews_data = []
-            for idx, review in enumerate(review_elements[:max_reviews]):
-                try:
-                    # Extract reviewer name
-                    author_elem = review.find('a', class_=re.compile('BMQDV'))
-                    author = author_elem.text if author_elem else "Anonymous"
-                    
-                    # Extract rating
-                    rating_elem = review.find('svg', class_=re.compile('UctUV'))
-                    rating = rating_elem['aria-label'].split()[0] if rating_elem else "N/A"
-                    
-                    # Extract review text
-                    text_elem = review.find('span', class_=re.compile('QewHA'))
-                    review_text = text_elem.text if text_elem else ""
-                    
-                    # Extract date
-                    date_elem = review.find('div', class_=re.compile('biGQs'))
-                    date = date_elem.text if date_elem else "N/A"
-                    
-                    if review_text:
-                        reviews_data.append({
-                            'id': idx,
-                            'author': author,
-                            'rating': rating,
-                            'date': date,
-                            'text': review_text,
-                            'source': 'TripAdvisor'
-                        })
-                        
-                except Exception as e:
-                    print(f"Error parsing review: {e}")
-                    continue
+            with self.pool.driver() as driver:
+                driver.get(place_url)
+                
+                # Scroll until enough reviews have loaded or no more appear
+                card_selector = "div[data-automation='reviewCard']"
+                wait_for_element(driver, By.CSS_SELECTOR, card_selector)
+                scroll_until_loaded(driver, card_selector, max_reviews)
+                page_source = driver.page_source
             
-            self.reviews.extend(reviews_data)
+            reviews_data = parse_tripadvisor_reviews(page_source, max_reviews)
+            self._add_reviews(reviews_data)
             print(f"Scraped {len(reviews_data)} reviews from TripAdvisor")
             return reviews_data
             
         except Exception as e:
             print(f"Error during TripAdvisor scraping: {e}")
             return []
-        finally:
-            self.close_driver()
     
+    def fetch_tripadvisor_reviews(self, place_urls: List[str], max_reviews: int = 20) -> List[Dict]:
+        """
+        Fetch server-rendered TripAdvisor pages over plain HTTP - no browser,
+        pages fetched concurrently, responses cached on disk
+        """
+        async def fetch_all():
+            async with ReviewFetcher() as fetcher:
+                return await fetcher.fetch_tripadvisor_reviews(place_urls, max_reviews)
+        
+        reviews_data = asyncio.run(fetch_all())
+        self._add_reviews(reviews_data)
+        print(f"Fetched {len(reviews_data)} reviews from {len(place_urls)} TripAdvisor pages")
+        return reviews_data
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return get_embedding_service().encode(texts)
+
     def build_semantic_index(self):
         """
-        Build semantic search index from scraped reviews
+        Add scraped reviews to the persistent index (only new ones are encoded)
         """
         if not self.reviews:
             print("No reviews to index!")
             return
         
         print("Building semantic search index...")
-        review_texts = [r['text'] for r in self.reviews]
-        self.review_embeddings = self.model.encode(review_texts, convert_to_tensor=True)
-        print(f"Indexed {len(self.reviews)} reviews")
+        added = self.store.add(self.reviews, self.encode)
+        print(f"Indexed {added} new reviews ({len(self.store)} total)")
+        # Large stores are searched through the IVF index instead of brute force
+        self.store.refresh_index()
     
-    def semantic_search(self, query: str, top_k: int = 5) -> List[Dict]:
+    def semantic_search(self, query: str, top_k: int = 5, place: Optional[str] = None,
+                        location: Optional[str] = None) -> List[Dict]:
         """
-        Perform semantic search on reviews
+        Perform semantic search on reviews, optionally only for one place/location
         """
-        if self.review_embeddings is None:
+        print(f"\nSearching for: '{query}'")
+        results = self.semantic_search_batch([query], top_k, place, location)
+        return results[0] if results else []
+
+    def semantic_search_batch(self, queries: List[str], top_k: int = 5, place: Optional[str] = None,
+                              location: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Search several queries at once - they are encoded in one batch
+        """
+        if len(self.store) == 0:
             print("Index not built! Call build_semantic_index() first.")
             return []
         
-        print(f"\nSearching for: '{query}'")
-        
-        # Encode query
-        query_embedding = self.model.encode(query, convert_to_tensor=True)
-        
-        # Calculate cosine similarity
-        cos_scores = util.cos_sim(query_embedding, self.review_embeddings)[0]
-        
-        # Get top k results
-        top_results = torch.topk(cos_scores, k=min(top_k, len(self.reviews)))
+        # Encode queries and take the top k by cosine similarity
+        query_embeddings = self.encode(queries)
+        scores, rows = self.store.search(query_embeddings, top_k=top_k, place=place, location=location)
         
         results = []
-        for score, idx in zip(top_results[0], top_results[1]):
-            review = self.reviews[idx]
-            results.append({
-                'score': float(score),
-                'review': review
-            })
+        for query_scores, query_rows in zip(scores, rows):
+            results.append([
+                {
+                    'score': float(score),
+                    'review': self.store.get(int(row))
+                }
+                for score, row in zip(query_scores, query_rows)
+            ])
         
         return results
     
@@ -266,10 +240,9 @@ def main():
         max_reviews=15
     )
     
-    # You can scrape multiple places
-    crawler.scrape_google_maps_reviews(
-        place_name="hotels",
-        location="Pune India",
+    # You can scrape multiple places - concurrently across the browser pool
+    crawler.scrape_places(
+        [("hotels", "Pune India"), ("cafes", "Goa India")],
         max_reviews=15
     )
     
@@ -280,6 +253,7 @@ def main():
     # )
     
     # Build semantic search index
+    crawler.close()
     crawler.build_semantic_index()
     
     # Perform semantic searches
@@ -291,10 +265,9 @@ def main():
         "expensive but worth it"
     ]
     
-    for query in search_queries:
-        results = crawler.semantic_search(query, top_k=3)
+    for query, results in zip(search_queries, crawler.semantic_search_batch(search_queries, top_k=3)):
+        print(f"\nSearching for: '{query}'")
         crawler.print_search_results(results)
-        time.sleep(1)
     
     # Interactive search mode
     print("\n" + "="*80)
@@ -0,0 +1,270 @@
+"""
+Test script for the cost analytics engine
+Checks the category of activity names that only contain a keyword inside
+another word ("Steamboat" is not tea), prints the budget report of the
+sample Meghalaya itinerary, then stores
+synthetic itineraries in a temporary SQLite database and times bulk analytics
+over all of them against a plain per-itinerary Python loop, end to end and
+with the rows already in memory. Also checks that itineraries stored before
+structured storage are backfilled before they are analyzed, and unreadable
+ones are reported rather than counted as free:
+    python test_cost_analytics.py [itineraries]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base
+from models.itinerary import Itinerary, ItineraryActivity
+from services.itinerary_store_service import ensure_itinerary_structures
+from services.cost_analytics import (
+    ACTIVITY_COLUMNS,
+    CATEGORIES,
+    CostFrame,
+    analyze,
+    budget_report,
+    category_of,
+    load_cost_frame,
+    summarize,
+)
+
+SAMPLE = os.path.join(
+    os.path.dirname(__file__), "similarity_search_output_laya itinerary for 7 .txt"
+)
+ACTIVITIES = [
+    ("Breakfast at the hotel", "Hotel Cafe", 400),
+    ("Check-in to Hotel", "Hotel Polo Towers", 3500),
+    ("Transfer to the fort", "Taxi stand", 600),
+    ("Visit the City Palace", "City Palace", 700),
+    ("Scuba diving session", "Dive Centre", 4500),
+    ("Shopping at the local bazaar", "Main Bazaar", 1500),
+    ("Sunset at the beach", "Baga Beach", 0),
+    ("Dinner at a dhaba", "Highway Dhaba", 800),
+    ("Heritage walk tour", "Old Town", 1200),
+    ("Evening at leisure", "Promenade", 0),
+]
+
+CODES = {
+    (name, location): category_of(f"{name} {location}")
+    for name, location, _ in ACTIVITIES
+}
+
+# Names whose category used to come from a keyword inside another word
+CATEGORY_CASES = [
+    ("Great Wall viewpoint", "sightseeing"),
+    ("Theatre performance", "experiences"),
+    ("Shillong Peak plateau walk", "sightseeing"),
+    ("Steamboat jetty", "transport"),
+    ("Cathedral of Mary Help of Christians", "sightseeing"),
+    ("Evening at the theater", "experiences"),
+    ("Tea tasting at a tea estate", "food"),
+    ("Boating on Umiam Lake", "transport"),
+    ("Visiting the temples", "sightseeing"),
+    ("Snorkelling at Grande Island", "experiences"),
+]
+
+
+def check_categories():
+    for name, expected in CATEGORY_CASES:
+        category = CATEGORIES[category_of(name)]
+        assert category == expected, (name, category, expected)
+    print(f"  {len(CATEGORY_CASES)} word-boundary cases match")
+
+
+def run_sample():
+    with open(SAMPLE, encoding="utf-8") as f:
+        document = json.load(f)["itinerary"]
+    activities = [
+        (1, day["day"], a.get("cost"), a.get("activity"), a.get("location"))
+        for day in document["days"]
+        for a in day["activities"]
+    ]
+    frame = CostFrame.from_rows([(1, 20000)], activities, {1: 2})
+    report = budget_report(frame, 0, document["total_estimated_cost"])
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def store_synthetic(session, count: int):
+    rng = random.Random(0)
+    itineraries = []
+    activities = []
+    for itinerary_id in range(1, count + 1):
+        days = rng.randint(2, 7)
+        itineraries.append(
+            {
+                "id": itinerary_id,
+                "user_id": 1,
+                "destination": "Synthetic",
+                "budget": rng.choice([None, 15000, 25000, 40000]),
+            }
+        )
+        for day in range(1, days + 1):
+            for index in range(rng.randint(3, 6)):
+                name, location, cost = rng.choice(ACTIVITIES)
+                # Category worked out once at write time, as
+                # sync_itinerary_structure does
+                activities.append(
+                    {
+                        "itinerary_id": itinerary_id,
+                        "day": day,
+                        "activity_index": index,
+                        "activity": name,
+                        "location": location,
+                        "cost": cost * rng.uniform(0.5, 1.5),
+                        "category": CODES[name, location],
+                    }
+                )
+    session.execute(insert(Itinerary), itineraries)
+    session.execute(insert(ItineraryActivity), activities)
+    session.commit()
+    return len(activities)
+
+
+def check_backfill():
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'old.db')}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    with open(SAMPLE, encoding="utf-8") as f:
+        document = json.load(f)
+    # As written before structured storage: a blob, no rows, no counters
+    session.add_all(
+        [
+            Itinerary(
+                user_id=1, destination="Meghalaya", itinerary_data=json.dumps(document)
+            ),
+            Itinerary(user_id=1, destination="Broken", itinerary_data='{"itinerary": '),
+        ]
+    )
+    session.commit()
+    owned = session.query(Itinerary).filter(Itinerary.user_id == 1)
+    unreadable = ensure_itinerary_structures(session, owned)
+    assert unreadable == [2], unreadable
+    summary = summarize(
+        load_cost_frame(session, owned.filter(Itinerary.total_activities.isnot(None)))
+    )
+    activities = sum(len(day["activities"]) for day in document["itinerary"]["days"])
+    assert summary["itineraries"] == 1 and summary["activities"] == activities, summary
+    assert session.get(Itinerary, 1).total_cost > 0
+    print(
+        f"  legacy itinerary backfilled ({activities} activities), corrupt one reported"
+    )
+
+
+def python_loop(itineraries, activities):
+    """The same totals the straightforward way, one itinerary at a time"""
+    by_itinerary = {}
+    for itinerary_id, day, cost, category in activities:
+        by_itinerary.setdefault(itinerary_id, []).append((day, cost, category))
+    results = {}
+    for itinerary_id, budget in itineraries:
+        rows = by_itinerary.get(itinerary_id, [])
+        per_day = {}
+        per_category = {}
+        total = 0.0
+        for day, cost, category in rows:
+            cost = cost or 0.0
+            total += cost
+            per_day[day] = per_day.get(day, 0.0) + cost
+            per_category[category] = per_category.get(category, 0.0) + cost
+        results[itinerary_id] = (
+            total,
+            per_day,
+            per_category,
+            budget and total > budget,
+        )
+    return results
+
+
+def run_bulk(count: int):
+    path = os.path.join(tempfile.mkdtemp(), "costs.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    start = time.perf_counter()
+    activity_count = store_synthetic(session, count)
+    print(
+        f"Stored {count} itineraries, {activity_count} activities "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    start = time.perf_counter()
+    frame = load_cost_frame(session, session.query(Itinerary))
+    summary = summarize(frame)
+    bulk = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+    start = time.perf_counter()
+    itineraries = session.query(Itinerary.id, Itinerary.budget).all()
+    activities = session.execute(
+        select(
+            ItineraryActivity.itinerary_id,
+            ItineraryActivity.day,
+            ItineraryActivity.cost,
+            ItineraryActivity.category,
+        )
+    ).all()
+    python_loop(itineraries, activities)
+    loop_time = time.perf_counter() - start
+    print(
+        f"  end to end: load_cost_frame + summarize {bulk:.2f}s, "
+        f"query + Python loop {loop_time:.2f}s ({loop_time / bulk:.1f}x faster)"
+    )
+    assert bulk < loop_time, (bulk, loop_time)
+
+    # Same rows in memory, to compare the computation alone
+    activities = [tuple(row) for row in activities]
+    start = time.perf_counter()
+    frame = CostFrame.from_columns(
+        itineraries, np.fromiter(activities, ACTIVITY_COLUMNS, len(activities))
+    )
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    result = analyze(frame)
+    analyzed = time.perf_counter() - start
+    vectorized = built + analyzed
+    print(
+        f"  in memory: vectorized {vectorized:.2f}s "
+        f"(arrays {built:.2f}s, totals {analyzed:.2f}s)"
+    )
+    start = time.perf_counter()
+    loop = python_loop(itineraries, activities)
+    loop_time = time.perf_counter() - start
+    print(
+        f"  in memory: per-itinerary Python loop {loop_time:.2f}s "
+        f"({loop_time / vectorized:.1f}x faster)"
+    )
+    assert vectorized < loop_time, (vectorized, loop_time)
+
+    # Both ways agree
+    for index in random.Random(1).sample(range(count), min(count, 100)):
+        total = loop[int(frame.ids[index])][0]
+        assert abs(result["total"][index] - total) < 1e-6 * max(total, 1)
+    over_loop = sum(1 for r in loop.values() if r[3])
+    assert over_loop == summary["over_budget"], (over_loop, summary["over_budget"])
+    print("  totals and overrun counts match")
+
+    # Rows stored before categories were: worked out from the text on load
+    session.execute(update(ItineraryActivity).values(category=None))
+    legacy = summarize(load_cost_frame(session, session.query(Itinerary)))
+    assert legacy == summary, "categories of legacy rows differ"
+    print("  rows without a stored category give the same summary")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("Activity categories:")
+    check_categories()
+    print("Budget report of the sample itinerary (budget ₹20,000, 2 travellers):")
+    run_sample()
+    print("Itineraries stored before structured storage:")
+    check_backfill()
+    print(f"\nBulk analytics over {count} stored itineraries:")
+    run_bulk(count)
@@ -0,0 +1,139 @@
+"""
+Benchmark for the embedding service's micro-batching
+Uses a stub encoder (no model) whose cost is a fixed overhead per call plus
+the padded tokens of the batch - batch size x longest text - like a
+transformer forward pass. Compares:
+    queries   many threads each encoding one query at a time, directly and
+              through EmbeddingService with a short and a longer wait window
+    bulk      encoding reviews of mixed length in arrival order and sorted by
+              length, as the service does
+and checks the service hands every caller its own vectors.
+    python test_embedding_service.py [clients] [queries]
+"""
+
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+
+from services.embedding_service import EmbeddingService
+
+DIM = 16
+CALL_MS = 4.0
+# Per padded token; about 4 characters per token
+TOKEN_MS = 0.002
+BATCH_SIZE = 32
+REVIEWS = 2048
+
+
+def vector_of(text: str) -> np.ndarray:
+    seed = sum(text.encode()) * 31 + len(text)
+    return np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+
+
+def stub_encode(texts):
+    """Sleeps like a model would for this batch and returns vectors per text"""
+    longest = max(len(text) for text in texts) // 4 + 1
+    time.sleep((CALL_MS + TOKEN_MS * len(texts) * longest) / 1000)
+    return np.stack([vector_of(text) for text in texts])
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def run_clients(encode, clients: int, queries: int):
+    """Each client thread encodes queries one at a time; returns latencies"""
+    latencies = []
+    wrong = []
+    lock = threading.Lock()
+
+    def client(number: int):
+        for i in range(number, queries, clients):
+            text = f"quiet cafe with a view {i}"
+            start = time.perf_counter()
+            vector = encode([text])[0]
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not np.array_equal(vector, vector_of(text)):
+                    wrong.append(text)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not wrong, wrong[:3]
+    return queries / (time.perf_counter() - start), latencies
+
+
+def check_queries(clients: int, queries: int):
+    # The model is not thread-safe, so direct callers take turns on it
+    model_lock = threading.Lock()
+
+    def direct(texts):
+        with model_lock:
+            return stub_encode(texts)
+
+    results = {"direct": run_clients(direct, clients, queries)}
+    for wait_ms in (2, 10):
+        service = EmbeddingService(
+            encode=stub_encode, batch_size=BATCH_SIZE, max_wait_ms=wait_ms, workers=0
+        )
+        results[f"batched, {wait_ms} ms"] = run_clients(
+            service.encode, clients, queries
+        )
+        metrics = service.metrics()
+        service.stop()
+        print(
+            f"  {wait_ms} ms window: {metrics['batches']} batches, "
+            f"mean {metrics['mean_batch_texts']} texts, "
+            f"queue wait p95 {metrics['queue_wait_ms_p95']} ms"
+        )
+    for name, (rate, latencies) in results.items():
+        print(
+            f"  {name:15} {rate:6.0f} q/s  "
+            f"p50 {statistics.median(latencies) * 1000:5.0f} ms  "
+            f"p95 {percentile(latencies, 0.95) * 1000:5.0f} ms"
+        )
+    assert results["batched, 2 ms"][0] > results["direct"][0]
+
+
+def check_bulk():
+    rng = np.random.default_rng(20261019)
+    texts = [
+        f"review {i} " + "x" * int(length)
+        for i, length in enumerate(rng.integers(20, 1500, size=REVIEWS))
+    ]
+
+    start = time.perf_counter()
+    for offset in range(0, len(texts), BATCH_SIZE):
+        stub_encode(texts[offset : offset + BATCH_SIZE])
+    unsorted = time.perf_counter() - start
+
+    service = EmbeddingService(encode=stub_encode, batch_size=BATCH_SIZE, workers=0)
+    start = time.perf_counter()
+    vectors = service.encode(texts)
+    in_service = time.perf_counter() - start
+    service.stop()
+
+    assert all(np.array_equal(v, vector_of(t)) for v, t in zip(vectors, texts))
+    print(
+        f"  {REVIEWS} reviews of 20 to 1500 chars: {unsorted:.1f}s in arrival "
+        f"order, {in_service:.1f}s length-sorted ({unsorted / in_service:.1f}x)"
+    )
+    assert in_service < unsorted
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+    print(f"{clients} clients, {queries} single-query encodes:")
+    check_queries(clients, queries)
+    print("Bulk encoding:")
+    check_bulk()
@@ -0,0 +1,141 @@
+"""
+Benchmark for the typed itinerary model (models/schemas.py)
+Checks that documents with null fields ("activity": null, "cost": null)
+validate, that fields the model got wrong are coerced rather than failing
+the request, then times itineraries of several lengths, plus the sample
+Meghalaya one, through each step against plain json:
+    decode    json.loads vs ItineraryDocument.model_validate_json
+    encode    json.dumps vs model_dump_json of a validated model
+    ingest    json.loads + json.dumps vs validate_itinerary_document, which
+              validates once and gives the compact JSON that is stored
+and prints the size of what is stored and sent: the model's pretty-printed
+output, json.dumps and the canonical compact form.
+    python test_itinerary_model.py [repeats]
+"""
+
+import json
+import os
+import sys
+import time
+
+from fake_gemini_server import make_itinerary
+from models.schemas import ItineraryDocument
+from services.itinerary_store_service import (
+    ItineraryFormatError,
+    validate_itinerary_document,
+)
+
+SAMPLE = os.path.join(
+    os.path.dirname(__file__), "similarity_search_output_laya itinerary for 7 .txt"
+)
+NULL_FIELDS = {
+    "itinerary": {
+        "days": [
+            {
+                "day": "Day 1",
+                "activities": [
+                    {"time": "09:00", "activity": None, "location": "Ward's Lake"},
+                    {"activity": "Lunch", "cost": None, "coordinates": None},
+                ],
+            }
+        ]
+    }
+}
+
+
+def check_null_fields():
+    document, _ = validate_itinerary_document(NULL_FIELDS)
+    activities = document["itinerary"]["days"][0]["activities"]
+    assert activities[0]["activity"] is None, activities[0]
+    assert activities[1]["cost"] is None, activities[1]
+    assert document["itinerary"]["days"][0]["day"] == 1
+    print("  null activity, cost and coordinates validate")
+
+
+# Deviations seen from Gemini: a bare itinerary, coordinates as "lat, lng",
+# time as a list, an activity as a plain string, activities not a list
+DEVIATIONS = {
+    "days": [
+        {
+            "activities": [
+                "Ward's Lake",
+                {"activity": "Lunch", "coordinates": "25.57, 91.88"},
+                {"activity": "Market", "time": ["09:00", "11:00"], "cost": "Free"},
+            ]
+        },
+        {"activities": "Rest day"},
+    ]
+}
+
+
+def check_deviations():
+    document, _ = validate_itinerary_document(json.dumps(DEVIATIONS))
+    days = document["itinerary"]["days"]
+    activities = days[0]["activities"]
+    assert activities[0] == {"activity": "Ward's Lake"}, activities[0]
+    assert activities[1]["coordinates"] is None, activities[1]
+    assert activities[2]["time"] == "09:00, 11:00", activities[2]
+    assert activities[2]["cost_text"] == "Free", activities[2]
+    assert days[1]["activities"] == [], days[1]
+    try:
+        validate_itinerary_document({"itinerary": "Ask me again later"})
+    except ItineraryFormatError as e:
+        assert "itinerary" in str(e), e
+    else:
+        raise AssertionError("an itinerary that is not an object validated")
+    print("  wrong fields coerced, a document with no itinerary rejected")
+
+
+def per_call_ms(function, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(label: str, document: dict, repeats: int):
+    # What Gemini returns: pretty-printed JSON
+    text = json.dumps(document, indent=2, ensure_ascii=False)
+    plain = json.dumps(document, ensure_ascii=False)
+    model = ItineraryDocument.model_validate_json(text)
+    _, compact = validate_itinerary_document(text)
+    assert json.loads(compact) == json.loads(model.model_dump_json(exclude_unset=True))
+
+    timings = {
+        "decode": (
+            per_call_ms(lambda: json.loads(text), repeats),
+            per_call_ms(lambda: ItineraryDocument.model_validate_json(text), repeats),
+        ),
+        "encode": (
+            per_call_ms(lambda: json.dumps(document, ensure_ascii=False), repeats),
+            per_call_ms(lambda: model.model_dump_json(exclude_unset=True), repeats),
+        ),
+        "ingest": (
+            per_call_ms(
+                lambda: json.dumps(json.loads(text), ensure_ascii=False), repeats
+            ),
+            per_call_ms(lambda: validate_itinerary_document(text), repeats),
+        ),
+    }
+    print(f"\n{label}")
+    for step, (plain_ms, model_ms) in timings.items():
+        print(
+            f"  {step:<7} json {plain_ms:6.3f} ms   model {model_ms:6.3f} ms   "
+            f"(model takes {model_ms / plain_ms:.1f}x as long)"
+        )
+    print(
+        f"  size    pretty {len(text.encode()):>7} B   json.dumps "
+        f"{len(plain.encode()):>7} B   compact {len(compact.encode()):>7} B"
+    )
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print("Null fields:")
+    check_null_fields()
+    print("Model deviations:")
+    check_deviations()
+    with open(SAMPLE, encoding="utf-8") as f:
+        run("sample Meghalaya itinerary (7 days)", json.load(f), repeats)
+    for days in (3, 7, 14):
+        run(f"synthetic itinerary, {days} days", make_itinerary(days), repeats)
@@ -0,0 +1,196 @@
+"""
+Test script for the chunked itinerary planner
+Runs ChunkedItineraryPlanner against a local stub model that takes time per
+output token, like Gemini does, and checks the stitched itinerary:
+    1. a 16-day trip with the planner's defaults, against one call writing
+       the whole itinerary - wall-clock time should drop with the chunks
+    2. max_concurrency 1, 2, 4 - calls in flight never exceed the limit
+    3. a chunk whose first answer is truncated JSON is asked again
+    4. a chunk that keeps answering with a day missing fails the plan
+    python test_itinerary_planner.py [seconds per output token]
+"""
+
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+
+from models.schemas import TripRequest
+from services.itinerary_planner import ChunkedItineraryPlanner
+
+TRIP = TripRequest(
+    destination="Shillong",
+    start_date="2026-11-01",
+    end_date="2026-11-16",
+    budget=60000,
+)
+SYSTEM_PROMPT = "You are Vandreren, an AI travel planning assistant."
+ACTIVITIES_PER_DAY = 4
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Blocking generate_content(prompt) that answers the planner's skeleton and
+    chunk prompts, sleeping base_latency plus seconds_per_token for each
+    output token (4 characters). truncate / drop_day name day numbers whose
+    chunk answers badly: truncated once, or always missing that day.
+    """
+
+    def __init__(self, seconds_per_token: float, base_latency: float = 0.2):
+        self.seconds_per_token = seconds_per_token
+        self.base_latency = base_latency
+        self.truncate = set()
+        self.drop_day = set()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def day(self, number: int, date: str) -> dict:
+        return {
+            "day": number,
+            "date": date,
+            "theme": f"Day {number} around Shillong",
+            "activities": [
+                {
+                    "time": f"{9 + 2 * index:02d}:00",
+                    "activity": f"Visit place {number}-{index}",
+                    "location": f"Place {number}-{index}, Shillong",
+                    "duration": "1.5 hours",
+                    "cost": 250,
+                    "description": "A short description of the place and what to do there",
+                    "coordinates": {"lat": 25.57 + index / 100, "lng": 91.88},
+                }
+                for index in range(ACTIVITIES_PER_DAY)
+            ],
+        }
+
+    def answer(self, prompt: str) -> str:
+        outline = re.search(r"outline of a (\d+)-day trip", prompt)
+        if outline:
+            days = int(outline.group(1))
+            return json.dumps(
+                {
+                    "days": [
+                        {"day": n, "theme": f"Theme {n}", "region": f"Area {n}"}
+                        for n in range(1, days + 1)
+                    ]
+                }
+            )
+        chunk = re.search(r"ONLY days (\d+) to (\d+)", prompt)
+        if chunk:
+            first, last = int(chunk.group(1)), int(chunk.group(2))
+            dates = dict(re.findall(r"- Day (\d+) \((\d{4}-\d{2}-\d{2})\)", prompt))
+            days = [
+                self.day(n, dates.get(str(n), ""))
+                for n in range(first, last + 1)
+                if n not in self.drop_day
+            ]
+            text = "```json\n" + json.dumps({"days": days}) + "\n```"
+            with self.lock:
+                if first in self.truncate:
+                    self.truncate.discard(first)
+                    return text[: len(text) // 2]
+            return text
+        days = re.search(r"(\d+)-day itinerary", prompt)
+        return json.dumps(
+            {
+                "itinerary": {
+                    "days": [self.day(n, "") for n in range(1, int(days.group(1)) + 1)]
+                }
+            }
+        )
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            text = self.answer(prompt)
+            time.sleep(self.base_latency + len(text) / 4 * self.seconds_per_token)
+            return StubResponse(text)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def check_itinerary(document_text: str, dates):
+    document = json.loads(document_text)
+    days = document["itinerary"]["days"]
+    assert [day["day"] for day in days] == list(range(1, len(dates) + 1))
+    assert [day["date"] for day in days] == dates
+    assert all(len(day["activities"]) == ACTIVITIES_PER_DAY for day in days)
+    expected_cost = 250 * ACTIVITIES_PER_DAY * len(dates)
+    assert document["itinerary"]["total_estimated_cost"] == expected_cost
+    return document
+
+
+async def plan(model, **planner_options):
+    planner = ChunkedItineraryPlanner(model, **planner_options)
+    dates = planner.trip_dates(TRIP.start_date, TRIP.end_date)
+    start = time.perf_counter()
+    document_text = await planner.generate(SYSTEM_PROMPT, TRIP, dates)
+    return document_text, dates, time.perf_counter() - start
+
+
+async def run(seconds_per_token: float):
+    dates = ChunkedItineraryPlanner.trip_dates(TRIP.start_date, TRIP.end_date)
+
+    print(f"\n1. {len(dates)}-day trip, {seconds_per_token * 1000:g} ms per output token")
+    model = StubModel(seconds_per_token)
+    start = time.perf_counter()
+    await asyncio.to_thread(
+        model.generate_content, f"Write a {len(dates)}-day itinerary"
+    )
+    single = time.perf_counter() - start
+    print(f"  one call for the whole itinerary: {single:.2f}s")
+    model = StubModel(seconds_per_token)
+    document_text, dates, seconds = await plan(model)
+    check_itinerary(document_text, dates)
+    print(
+        f"  planner (chunks of 4, 3 at a time): {seconds:.2f}s in {model.calls} "
+        f"calls, {single / seconds:.1f}x faster"
+    )
+
+    print("\n2. concurrency limit")
+    for limit in (1, 2, 4):
+        model = StubModel(seconds_per_token)
+        document_text, dates, seconds = await plan(model, max_concurrency=limit)
+        check_itinerary(document_text, dates)
+        assert model.max_in_flight <= limit
+        print(
+            f"  max_concurrency {limit}: {seconds:.2f}s, "
+            f"at most {model.max_in_flight} calls in flight"
+        )
+
+    print("\n3. truncated chunk is retried")
+    model = StubModel(seconds_per_token)
+    model.truncate = {5}
+    document_text, dates, seconds = await plan(model)
+    check_itinerary(document_text, dates)
+    print(f"  itinerary complete after {model.calls} calls ({seconds:.2f}s)")
+
+    print("\n4. chunk missing a day fails")
+    model = StubModel(seconds_per_token)
+    model.drop_day = {10}
+    try:
+        await plan(model)
+    except ValueError as e:
+        print(f"  failed as expected: {e}")
+    else:
+        raise AssertionError("plan with a missing day should fail")
+
+    print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    seconds_per_token = float(sys.argv[1]) if len(sys.argv) > 1 else 0.002
+    asyncio.run(run(seconds_per_token))
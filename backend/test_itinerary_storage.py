@@ -0,0 +1,214 @@
+"""
+Benchmark for structured itinerary storage
+Seeds a temporary SQLite database with large itineraries, runs the API with
+uvicorn and times GET /activity/progress/{id} and GET /itineraries. The
+database reads behind them are then timed in this process both ways: from
+the counters, and the old way - loading every itinerary_data blob and
+parsing it to count activities:
+    python test_itinerary_storage.py [itineraries] [days] [activities per day]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from test_llm_workers import BASE_URL, start_api, stop_api
+
+ROUNDS = 20
+USER = {
+    "email": "storage@example.com",
+    "username": "storage",
+    "password": "storage-test-password",
+    "full_name": "Storage Test",
+}
+
+
+def make_document(number: int, days: int, per_day: int) -> dict:
+    return {
+        "message": f"Benchmark itinerary {number}",
+        "itinerary": {
+            "destination": "Shillong",
+            "duration": f"{days} days",
+            "days": [
+                {
+                    "day": day + 1,
+                    "date": f"2026-11-{day % 28 + 1:02d}",
+                    "theme": f"Day {day + 1} around Shillong",
+                    "activities": [
+                        {
+                            "time": f"{9 + index % 10:02d}:00",
+                            "activity": f"Visit place {day}-{index}",
+                            "location": f"Place {day}-{index}, Shillong",
+                            "duration": "1 hour",
+                            "cost": "Rs. 500" if index % 3 else 250,
+                            "description": "A long description of the place " * 8,
+                            "coordinates": {"lat": 25.57 + index / 1000, "lng": 91.88},
+                        }
+                        for index in range(per_day)
+                    ],
+                }
+                for day in range(days)
+            ],
+        },
+    }
+
+
+def seed(user_id: int, count: int, days: int, per_day: int):
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary
+    from services.itinerary_store_service import sync_itinerary_structure
+
+    db = SessionLocal()
+    ids = []
+    try:
+        for number in range(count):
+            document = make_document(number, days, per_day)
+            itinerary = Itinerary(
+                user_id=user_id,
+                title=f"Benchmark {number}",
+                destination="Shillong",
+                start_date="2026-11-01",
+                end_date="2026-11-30",
+                budget=50000,
+                itinerary_data=json.dumps(document),
+            )
+            db.add(itinerary)
+            db.flush()
+            sync_itinerary_structure(db, itinerary, document)
+            ids.append(itinerary.id)
+        db.commit()
+    finally:
+        db.close()
+    return ids
+
+
+def old_progress(itinerary_id: int) -> int:
+    """Activity count as get_activity_progress used to get it"""
+    from sqlalchemy.orm import undefer
+
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary
+
+    db = SessionLocal()
+    try:
+        itinerary = (
+            db.query(Itinerary)
+            .options(undefer(Itinerary.itinerary_data))
+            .filter(Itinerary.id == itinerary_id)
+            .first()
+        )
+        itinerary_obj = json.loads(itinerary.itinerary_data).get("itinerary", {})
+        return sum(len(day.get("activities", [])) for day in itinerary_obj["days"])
+    finally:
+        db.close()
+
+
+def new_progress(itinerary_id: int) -> int:
+    """Activity count from the denormalized counter"""
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary
+
+    db = SessionLocal()
+    try:
+        itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
+        return itinerary.total_activities
+    finally:
+        db.close()
+
+
+def list_itineraries(user_id: int, with_blobs: bool) -> int:
+    """The list query, with the blobs loaded as before they were deferred"""
+    from sqlalchemy.orm import undefer
+
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary
+
+    db = SessionLocal()
+    try:
+        query = db.query(Itinerary)
+        if with_blobs:
+            query = query.options(undefer(Itinerary.itinerary_data))
+        itineraries = (
+            query.filter(Itinerary.user_id == user_id)
+            .order_by(Itinerary.created_at.desc())
+            .all()
+        )
+        return len(itineraries)
+    finally:
+        db.close()
+
+
+def timed_ms(call, rounds: int = ROUNDS):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+async def timed_get(client, url: str, headers, rounds: int = ROUNDS):
+    times = []
+    size = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        times.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return statistics.median(times), size
+
+
+async def run(count: int, days: int, per_day: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
+        response = await client.post("/register", json=USER)
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        user_id = (await client.get("/me", headers=headers)).json()["id"]
+
+        start = time.perf_counter()
+        ids = seed(user_id, count, days, per_day)
+        print(
+            f"  seeded {count} itineraries of {days} days x {per_day} activities "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        progress_url = f"/activity/progress/{ids[-1]}?include_details=false"
+        api_progress, _ = await timed_get(client, progress_url, headers)
+        api_list, list_size = await timed_get(client, "/itineraries", headers)
+
+    print(f"  GET {progress_url}: p50 {api_progress:.1f} ms")
+    print(f"  GET /itineraries ({list_size} bytes): p50 {api_list:.1f} ms")
+    print("  database reads, p50:")
+    print(
+        f"    activity count: counter {timed_ms(lambda: new_progress(ids[-1])):.2f} ms, "
+        f"parsing the blob {timed_ms(lambda: old_progress(ids[-1])):.2f} ms"
+    )
+    print(
+        f"    list: deferred {timed_ms(lambda: list_itineraries(user_id, False)):.2f} ms, "
+        f"with the blobs {timed_ms(lambda: list_itineraries(user_id, True)):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    per_day = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'storage.db')}"
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="fake-key",
+        LLM_QUEUE_BACKEND="inline",
+        BCRYPT_TARGET_MS="50",
+    )
+    processes = start_api(env, "inline")
+    try:
+        asyncio.run(run(count, days, per_day))
+    finally:
+        stop_api(processes)
@@ -0,0 +1,288 @@
+"""
+Fuzz test and benchmark for utils/json_repair.py
+Fuzz: random itinerary documents (unicode, escapes, nested lists) go through
+parse_llm_json() as they are and with the damage Gemini produces - code
+fences and prose around them, stray quotes before keys, trailing commas, raw
+newlines in strings - and must come back unchanged. Cut at a random point,
+they must come back as valid JSON keeping every day finished before the
+cut. Random noise must parse or raise JsonRepairError, nothing else.
+
+Benchmark: parse_llm_json() (with and without orjson) against the chain
+create_itinerary used before: extract_json, clean_json_string, json.loads,
+safe_json_dumps (clean and parse again) and a final json.loads.
+    python test_json_repair.py [fuzz cases] [benchmark days]
+"""
+
+import json
+import random
+import re
+import statistics
+import string
+import sys
+import time
+
+import utils.json_repair as json_repair
+from utils.json_repair import JsonRepairError, dumps_compact, parse_llm_json
+
+SEED = 20261019
+TEXT = string.ascii_letters + string.digits + " .,:;!?'-/()&" + "éü₹—🙂" + '"\\'
+
+
+# The chain before utils/json_repair.py, kept here for the comparison
+
+
+def extract_json(text):
+    start = text.find("{")
+    end = text.rfind("}") + 1
+    if start != -1 and end != 0:
+        return text[start:end]
+    return text
+
+
+def clean_json_string(json_str):
+    json_str = re.sub(r"^```json\s*", "", json_str)
+    json_str = re.sub(r"\s*```$", "", json_str)
+    json_str = re.sub(r',\s*"\s+"([a-zA-Z_]+)":', r', "\1":', json_str)
+    json_str = re.sub(r'," "([a-zA-Z_]+)":', r', "\1":', json_str)
+    json_str = re.sub(r",(\s*[}\]])", r"\1", json_str)
+    json_str = json_str.strip("﻿\x00")
+    return json_str
+
+
+def safe_json_dumps(data):
+    cleaned = clean_json_string(data)
+    json.loads(cleaned)
+    return cleaned
+
+
+def old_chain(text):
+    itinerary_text = clean_json_string(extract_json(text))
+    json.loads(itinerary_text)
+    itinerary_text = safe_json_dumps(itinerary_text)
+    return json.loads(itinerary_text), itinerary_text
+
+
+# Random documents and damage
+
+
+def random_text(rng, longest=40):
+    return "".join(rng.choice(TEXT) for _ in range(rng.randint(0, longest)))
+
+
+def random_value(rng, depth=0):
+    kind = rng.randint(0, 7 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randint(-(10**6), 10**6)
+    if kind == 1:
+        return round(rng.uniform(-1000, 1000), rng.randint(0, 6))
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind in (3, 4):
+        return random_text(rng)
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {
+        random_text(rng, 12) or "key": random_value(rng, depth + 1)
+        for _ in range(rng.randint(0, 4))
+    }
+
+
+def random_itinerary(rng, days=None):
+    days = days or rng.randint(1, 6)
+    return {
+        "message": random_text(rng, 80),
+        "itinerary": {
+            "destination": random_text(rng, 20),
+            "duration": f"{days} days",
+            "total_estimated_cost": rng.randint(0, 10**5),
+            "days": [
+                {
+                    "day": day,
+                    "date": f"2026-11-{day:02d}",
+                    "theme": random_text(rng),
+                    "activities": [
+                        {
+                            "time": f"{rng.randint(6, 22):02d}:00",
+                            "activity": random_text(rng),
+                            "location": random_text(rng),
+                            "cost": rng.choice([rng.randint(0, 5000), "₹500 - ₹800"]),
+                            "description": random_text(rng, 200),
+                            "coordinates": {
+                                "lat": round(rng.uniform(8, 35), 4),
+                                "lng": round(rng.uniform(68, 97), 4),
+                            },
+                            "extra": random_value(rng),
+                        }
+                        for _ in range(rng.randint(1, 5))
+                    ],
+                }
+                for day in range(1, days + 1)
+            ],
+        },
+    }
+
+
+def serialize(rng, document):
+    if rng.random() < 0.5:
+        return json.dumps(document, ensure_ascii=rng.random() < 0.3)
+    return json.dumps(document, ensure_ascii=False, indent=rng.choice([1, 2, 4]))
+
+
+def add_wrappers(rng, text):
+    fences = rng.choice([("```json\n", "\n```"), ("```\n", "\n```"), ("", "")])
+    prose = rng.choice(
+        ["", "Here is your itinerary:\n", "Sure! ", "Here is your [updated] plan: "]
+    )
+    after = rng.choice(["", "\nEnjoy your trip!", "\n\n"])
+    return prose + fences[0] + text + fences[1] + after
+
+
+def add_stray_quotes(rng, text):
+    # {"lat": 1, " "lng": 2} - only before keys, which follow a comma
+    return re.sub(
+        r', ?"(lng|location|cost|description)":',
+        lambda m: f', " "{m.group(1)}":' if rng.random() < 0.5 else m.group(0),
+        text,
+    )
+
+
+def add_trailing_commas(rng, text):
+    return re.sub(
+        r"(?<=[\d\"el\]}])(\s*)([}\]])",
+        lambda m: "," + m.group(1) + m.group(2) if rng.random() < 0.3 else m.group(0),
+        text,
+    )
+
+
+def fuzz(cases: int):
+    rng = random.Random(SEED)
+    failures = []
+    counts = {"clean": 0, "damaged": 0, "old chain ok": 0, "truncated": 0, "noise": 0}
+
+    for case in range(cases):
+        document = random_itinerary(rng)
+
+        # Valid JSON in any layout round-trips, and the serialization is canonical
+        text = serialize(rng, document)
+        obj, canonical = parse_llm_json(text)
+        if obj != document or canonical != dumps_compact(document):
+            failures.append(("clean", case, text[:200]))
+        counts["clean"] += 1
+
+        # Damage the parser is meant to undo
+        damaged = json.dumps(document, ensure_ascii=False, indent=rng.choice([None, 2]))
+        damaged = add_stray_quotes(rng, damaged)
+        damaged = add_trailing_commas(rng, damaged)
+        if rng.random() < 0.3:
+            # A raw newline inside a string
+            quoted = json.dumps(document["message"], ensure_ascii=False)
+            damaged = damaged.replace(quoted, quoted[:-1] + '\nsecond line"', 1)
+            document["message"] += "\nsecond line"
+        damaged = add_wrappers(rng, damaged)
+        try:
+            obj, _ = parse_llm_json(damaged)
+            if obj != document:
+                failures.append(("damaged", case, damaged[:200]))
+        except JsonRepairError as e:
+            failures.append(("damaged", case, f"{e}: {damaged[:200]}"))
+        counts["damaged"] += 1
+        try:
+            if old_chain(damaged)[0] == document:
+                counts["old chain ok"] += 1
+        except ValueError:
+            pass
+
+        # Truncation keeps every day that was complete before the cut
+        text = json.dumps(document, ensure_ascii=False)
+        cut = rng.randint(1, len(text) - 1)
+        truncated = text[:cut]
+        try:
+            obj, canonical = parse_llm_json(truncated)
+            json.loads(canonical)
+            complete = [
+                day
+                for day in document["itinerary"]["days"]
+                if json.dumps(day, ensure_ascii=False) in truncated
+                and not truncated.endswith(json.dumps(day, ensure_ascii=False))
+            ]
+            kept = (
+                obj.get("itinerary", {}).get("days", [])
+                if isinstance(obj, dict)
+                else []
+            )
+            if kept[: len(complete)] != complete:
+                failures.append(("truncated", case, f"cut at {cut}"))
+        except JsonRepairError:
+            pass  # nothing usable before the cut
+        except Exception as e:
+            failures.append(("truncated", case, f"{type(e).__name__}: {e}"))
+        counts["truncated"] += 1
+
+        # Noise never escapes as anything but JsonRepairError
+        noise = "".join(
+            rng.choice('{}[]",:\n 0123456789.-etruflasn\\`')
+            for _ in range(rng.randint(0, 60))
+        )
+        try:
+            parse_llm_json(noise)
+        except JsonRepairError:
+            pass
+        except Exception as e:
+            failures.append(("noise", case, f"{type(e).__name__}: {noise!r}"))
+        counts["noise"] += 1
+
+    return counts, failures
+
+
+def timed_ms(call, text, rounds):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call(text)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def benchmark(days: int, rounds: int = 50):
+    rng = random.Random(SEED)
+    document = random_itinerary(rng, days)
+    clean = "```json\n" + json.dumps(document, ensure_ascii=False, indent=2) + "\n```"
+    damaged = add_trailing_commas(rng, add_stray_quotes(rng, clean))
+    assert old_chain(damaged)[0] == parse_llm_json(damaged)[0] == document
+
+    installed = json_repair.orjson
+    print(
+        f"\nBenchmark: {days}-day itinerary, {len(clean) // 1024} KB, median of {rounds}"
+    )
+    for label, text in (
+        ("well-formed", clean),
+        ("stray quotes + trailing commas", damaged),
+    ):
+        old = timed_ms(old_chain, text, rounds)
+        json_repair.orjson = None
+        new_json = timed_ms(parse_llm_json, text, rounds)
+        json_repair.orjson = installed
+        line = f"  {label}: old chain {old:.2f} ms, parse_llm_json {new_json:.2f} ms"
+        if installed is not None:
+            line += f", with orjson {timed_ms(parse_llm_json, text, rounds):.2f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+
+    start = time.perf_counter()
+    counts, failures = fuzz(cases)
+    print(f"Fuzz: {cases} documents in {time.perf_counter() - start:.1f}s")
+    print(
+        f"  {counts['clean']} well-formed, {counts['damaged']} damaged "
+        f"(old chain recovered {counts['old chain ok']}), "
+        f"{counts['truncated']} truncated, {counts['noise']} noise"
+    )
+    for kind, case, detail in failures[:10]:
+        print(f"  FAILED {kind} case {case}: {detail}")
+    print(f"  {len(failures)} failures")
+
+    benchmark(days)
+    sys.exit(1 if failures else 0)
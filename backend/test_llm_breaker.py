@@ -0,0 +1,190 @@
+"""
+Chaos test for the LLM circuit breaker
+Runs the API with uvicorn against the fake Gemini server and breaks the fake
+through /_control while sending /chat and /itinerary/create requests:
+    1. healthy      - one itinerary is created and stored
+    2. outage       - every call answered 503: the first chats fail slowly,
+                      then the breaker opens and they fail at once;
+                      itineraries are served from the stored one
+    3. recovery     - the fake is healthy again: after the open period the
+                      probes succeed and the breaker closes
+    4. latency      - calls take longer than LLM_BREAKER_SLOW_SECONDS
+and first, in process, that a half-open probe Gemini throttles is recorded
+once, after its retries: a 429 neither closes nor reopens the breaker.
+Uses a temporary SQLite database:
+    python test_llm_breaker.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_gemini_server import serve_fake_gemini
+from test_llm_workers import BASE_URL, start_api, stop_api
+
+TRIP = {
+    "destination": "Shillong",
+    "start_date": "2026-11-01",
+    "end_date": "2026-11-02",
+    "budget": 10000,
+}
+BREAKER = {
+    "LLM_BREAKER_WINDOW_SECONDS": "30",
+    "LLM_BREAKER_MIN_CALLS": "4",
+    "LLM_BREAKER_SLOW_SECONDS": "2",
+    "LLM_BREAKER_OPEN_SECONDS": "5",
+    "LLM_THROTTLE_RETRIES": "1",
+}
+
+
+def check_throttled_probe():
+    from fastapi import HTTPException
+    from services.llm_breaker import CLOSED, OPEN
+    from services.llm_jobs import LLMJobClient
+
+    async def probe(statuses):
+        client = LLMJobClient(backend="inline", rate_limit=0, throttle_retries=2)
+        client.breaker.probes = 1
+        client.breaker.open_seconds = 0
+        client.breaker._open("test")
+        replies = iter(statuses)
+
+        async def run(kind, arguments, timeout):
+            status = next(replies)
+            return ("ok", "reply") if status is None else ("error", status, "")
+
+        client._run = run
+        try:
+            result = await client.submit("chat_response", message="hello")
+        except HTTPException as e:
+            result = e.status_code
+        return result, client.breaker
+
+    result, breaker = asyncio.run(probe([429, 429, None]))
+    assert result == "reply" and breaker.state == CLOSED, (result, breaker.state)
+    result, breaker = asyncio.run(probe([429, 500]))
+    assert result == 500 and breaker.state == OPEN, (result, breaker.state)
+    assert breaker.metrics()["trips"] == 2, breaker.metrics()
+    print("  throttled probe: recorded once, after its retries")
+
+
+async def timed(client, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    return response, (time.perf_counter() - start) * 1000
+
+
+async def chats(client, headers, count: int, label: str):
+    results = await asyncio.gather(
+        *(
+            timed(
+                client,
+                "POST",
+                "/chat",
+                json={"message": f"Plan a weekend in Shillong ({label} {index})"},
+                headers=headers,
+            )
+            for index in range(count)
+        )
+    )
+    return [(response.status_code, round(ms)) for response, ms in results]
+
+
+async def breaker_state(client) -> dict:
+    return (await client.get("/metrics/llm-jobs")).json()["breaker"]
+
+
+async def run(fake_url: str):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120) as client:
+        response = await client.post(
+            "/register",
+            json={
+                "email": "chaos@example.com",
+                "username": "chaos",
+                "password": "chaos-test-password",
+                "full_name": "Chaos Test",
+            },
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        print("\n1. healthy")
+        response, ms = await timed(
+            client, "POST", "/itinerary/create", json=TRIP, headers=headers
+        )
+        print(
+            f"  itinerary: {response.status_code} in {ms:.0f} ms, "
+            f"degraded={response.json().get('degraded')}"
+        )
+        print(f"  chats: {await chats(client, headers, 4, 'healthy')}")
+
+        print("\n2. outage (every Gemini call answered 503)")
+        await client.post(f"{fake_url}/_control", json={"error_rate": 1.0})
+        for wave in range(3):
+            results = await chats(client, headers, 4, f"outage {wave}")
+            state = await breaker_state(client)
+            print(f"  chats: {results} -> breaker {state['state']}")
+        for _ in range(2):
+            response, ms = await timed(
+                client, "POST", "/itinerary/create", json=TRIP, headers=headers
+            )
+            print(
+                f"  itinerary: {response.status_code} in {ms:.0f} ms, "
+                f"degraded={response.json().get('degraded')}"
+            )
+
+        print("\n3. recovery")
+        await client.post(f"{fake_url}/_control", json={"error_rate": 0.0})
+        start = time.perf_counter()
+        while True:
+            ((status, ms),) = await chats(client, headers, 1, "recovery")
+            if status == 200:
+                break
+            await asyncio.sleep(0.5)
+        state = await breaker_state(client)
+        print(
+            f"  first chat answered {time.perf_counter() - start:.1f}s after the "
+            f"fake recovered -> breaker {state['state']}"
+        )
+        print(f"  chats: {await chats(client, headers, 4, 'recovered')}")
+        print(f"  breaker {(await breaker_state(client))['state']}")
+
+        print("\n4. latency (calls take 3s, slow is over 2s)")
+        await client.post(f"{fake_url}/_control", json={"latency": 3.0})
+        for wave in range(2):
+            results = await chats(client, headers, 4, f"slow {wave}")
+            state = await breaker_state(client)
+            print(f"  chats: {results} -> breaker {state['state']}")
+
+        metrics = (await client.get("/metrics/llm-jobs")).json()
+        print(
+            f"\n  breaker trips {metrics['breaker']['trips']}, "
+            f"{metrics['short_circuited']} calls failed fast"
+        )
+
+
+if __name__ == "__main__":
+    check_throttled_probe()
+    server, fake, fake_url = serve_fake_gemini(latency=0.3, jitter=0)
+    print(f"Fake Gemini at {fake_url}")
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'chaos.db')}",
+        GEMINI_API_KEY="fake-key",
+        GEMINI_API_ENDPOINT=fake_url,
+        LLM_QUEUE_BACKEND="process",
+        LLM_WORKERS="2",
+        BCRYPT_TARGET_MS="50",
+        **BREAKER,
+    )
+    processes = start_api(env, "process")
+    try:
+        asyncio.run(run(fake_url))
+    finally:
+        stop_api(processes)
+        server.shutdown()
+    sys.exit(0)
@@ -0,0 +1,100 @@
+"""
+Test script for the LLM scheduler
+Points the LLM workers at the fake Gemini server with a requests-per-second
+quota and sends a mixed burst: one user firing many chats at once, a few
+users sending one chat each, and group itinerary jobs. Run twice - without
+the scheduler (no rate limit, throttled jobs fail) and with it (token bucket
+below the quota, adaptive backoff, priorities, per-user round robin):
+    python test_llm_scheduler.py [quota per second] [latency seconds]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from fake_gemini_server import serve_fake_gemini
+
+GREEDY_CHATS = 24
+LIGHT_USERS = 6
+GROUP_JOBS = 4
+
+
+async def run_burst(client):
+    timings = {"greedy": [], "light": [], "group": []}
+    failures = {"greedy": 0, "light": 0, "group": 0}
+
+    async def job(who: str, user_id: int, priority: str):
+        start = time.perf_counter()
+        try:
+            await client.chat_response(
+                f"Plan a weekend in Shillong ({who})",
+                [],
+                {},
+                priority=priority,
+                user_id=user_id,
+            )
+            timings[who].append(time.perf_counter() - start)
+        except Exception:
+            failures[who] += 1
+
+    jobs = [job("greedy", 1, "interactive") for _ in range(GREEDY_CHATS)]
+    jobs += [job("group", 100, "group") for _ in range(GROUP_JOBS)]
+    jobs += [job("light", 2 + user, "interactive") for user in range(LIGHT_USERS)]
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - start
+
+    print(f"  burst done in {elapsed:.1f}s")
+    for who, counts in (
+        ("greedy", GREEDY_CHATS),
+        ("light", LIGHT_USERS),
+        ("group", GROUP_JOBS),
+    ):
+        done = timings[who]
+        median = f"{statistics.median(done):.1f}s" if done else "-"
+        print(
+            f"  {who:6} {len(done)}/{counts} ok, {failures[who]} failed, "
+            f"median latency {median}"
+        )
+
+
+def run(fake, label: str, **settings):
+    from services.llm_jobs import LLMJobClient
+
+    client = LLMJobClient(backend="process", workers=2, concurrency=8, **settings)
+    client.start()
+    try:
+        # Worker processes load their Gemini client on the first job
+        asyncio.run(client.chat_response("warm up", [], {}))
+        time.sleep(1)
+        before = dict(fake.stats)
+        print(f"\n{label}")
+        asyncio.run(run_burst(client))
+        print(
+            f"  Gemini saw {fake.stats['calls'] - before['calls']} calls, "
+            f"{fake.stats['throttled'] - before['throttled']} answered 429"
+        )
+        metrics = client.scheduler.metrics()
+        print(
+            f"  scheduler: rate {metrics['rate_per_second']}/s, "
+            f"{metrics['rate_cuts']} rate cuts, "
+            f"interactive wait p95 {metrics['classes']['interactive']['wait_ms_p95']} ms, "
+            f"group wait p95 {metrics['classes']['group']['wait_ms_p95']} ms"
+        )
+    finally:
+        client.stop()
+
+
+if __name__ == "__main__":
+    quota = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    server, fake, fake_url = serve_fake_gemini(latency=latency, rate_limit=quota)
+    print(f"Fake Gemini at {fake_url}, {latency}s per call, {quota:g} calls/s quota")
+    os.environ.update(GEMINI_API_KEY="fake-key", GEMINI_API_ENDPOINT=fake_url)
+
+    run(fake, "No scheduler", rate_limit=0, throttle_retries=0)
+    # Configured above the quota, so the backoff has to find it
+    run(fake, "Scheduler", rate_limit=quota * 2, throttle_retries=3)
+    server.shutdown()
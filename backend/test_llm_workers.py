@@ -0,0 +1,138 @@
+"""
+Test script for the LLM worker pool
+Runs the API with uvicorn against the fake Gemini server and sends a burst
+of concurrent /chat requests (two Gemini calls each) while timing /ping
+every 50 ms - once per LLM_QUEUE_BACKEND. With "inline" the blocking Gemini
+calls stall the web process's event loop; with worker processes /ping stays
+fast. Uses a temporary SQLite database:
+    python test_llm_workers.py [chats] [latency seconds]
+"""
+
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_gemini_server import serve_fake_gemini
+
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+def start_api(env: dict, backend: str):
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    ]
+    if backend == "database":
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "services.llm_jobs", "2"],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        )
+    for _ in range(300):
+        try:
+            httpx.get(f"{BASE_URL}/ping", timeout=1)
+            return processes
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("API did not start")
+
+
+def stop_api(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=20)
+
+
+async def run_burst(chats: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120) as client:
+        response = await client.post(
+            "/register",
+            json={
+                "email": "load@example.com",
+                "username": "load",
+                "password": "load-test-password",
+                "full_name": "Load Test",
+            },
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        # Worker processes load their Gemini client on the first job
+        await client.post("/chat", json={"message": "warm up"}, headers=headers)
+
+        pings = []
+        done = asyncio.Event()
+
+        async def ping():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/ping")
+                pings.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        async def chat(index: int):
+            response = await client.post(
+                "/chat",
+                json={"message": f"Plan a weekend in Shillong #{index}"},
+                headers=headers,
+            )
+            return response.status_code
+
+        pinger = asyncio.create_task(ping())
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(chat(i) for i in range(chats)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await pinger
+        metrics = (await client.get("/metrics/llm-jobs")).json()
+
+    ok = sum(1 for status in statuses if status == 200)
+    pings.sort()
+    print(
+        f"  {ok}/{chats} chats in {elapsed:.1f}s | /ping over {len(pings)} calls: "
+        f"p50 {statistics.median(pings):.0f} ms, "
+        f"p95 {pings[int(len(pings) * 0.95) - 1]:.0f} ms, max {pings[-1]:.0f} ms"
+    )
+    print(
+        f"  queue: max pending {metrics['max_pending']}, "
+        f"avg wait {metrics['avg_wait_ms']} ms, avg run {metrics['avg_run_ms']} ms"
+    )
+
+
+if __name__ == "__main__":
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    server, fake, fake_url = serve_fake_gemini(latency=latency)
+    print(f"Fake Gemini at {fake_url}, {latency}s per call")
+
+    for backend in ("inline", "process", "database"):
+        workdir = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load.db')}",
+            GEMINI_API_KEY="fake-key",
+            GEMINI_API_ENDPOINT=fake_url,
+            LLM_QUEUE_BACKEND=backend,
+            LLM_WORKERS="2",
+            BCRYPT_TARGET_MS="50",
+        )
+        print(f"\n{backend}: {chats} concurrent chats")
+        processes = start_api(env, backend)
+        try:
+            asyncio.run(run_burst(chats))
+        finally:
+            stop_api(processes)
+    server.shutdown()
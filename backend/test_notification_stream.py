@@ -0,0 +1,207 @@
+"""
+Load test for the notification stream
+Runs the API with uvicorn and opens many idle Server-Sent Events connections
+to /notifications/stream (10k by default), then:
+    1. idle        - times /ping and /notifications/unread-count with every
+                     stream open, and reads the open count from /metrics/streams
+    2. push        - invites the listening user to a group and times how long
+                     the notification takes to reach every stream
+    3. disconnects - drops half of the streams, then opens more and drops them
+                     before the response starts; /metrics/streams must go back
+                     to the streams still open, so no queue is left behind
+Uses a temporary SQLite database. The client and the server each hold one
+file descriptor per stream, so ulimit -n must be above the stream count:
+    python test_notification_stream.py [streams]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from test_llm_workers import BASE_URL, PORT, start_api, stop_api
+
+# Streams opened at once while connecting
+CONNECT_CONCURRENCY = 200
+EARLY_DISCONNECTS = 500
+
+
+class Stream:
+    """One raw SSE connection; counts the events it receives"""
+
+    def __init__(self, ticket: str):
+        self.ticket = ticket
+        self.reader = None
+        self.writer = None
+        self.events = 0
+        self.received = asyncio.Event()
+        self.task = None
+
+    async def open(self, read: bool = True):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", PORT)
+        self.writer.write(
+            f"GET /notifications/stream?ticket={self.ticket} HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{PORT}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+        if read:
+            await self.next_event()
+            self.task = asyncio.create_task(self.listen())
+
+    async def next_event(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("stream closed")
+            if line.startswith(b"event:"):
+                self.events += 1
+                return line
+
+    async def listen(self):
+        try:
+            while True:
+                await self.next_event()
+                self.received.set()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def drop(self):
+        if self.task:
+            self.task.cancel()
+        self.writer.transport.abort()
+
+
+async def open_streams(ticket: str, count: int):
+    semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def open_one():
+        async with semaphore:
+            stream = Stream(ticket)
+            await stream.open()
+            return stream
+
+    return await asyncio.gather(*(open_one() for _ in range(count)))
+
+
+async def timed_get(client, url: str, headers=None, rounds: int = 20):
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+async def open_count(client) -> int:
+    return (await client.get("/metrics/streams")).json()["notification_streams"]
+
+
+async def wait_for_count(client, expected: int, timeout: float = 60) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if await open_count(client) == expected:
+            break
+        await asyncio.sleep(0.2)
+    return time.perf_counter() - start
+
+
+async def register(client, name: str) -> str:
+    response = await client.post(
+        "/register",
+        json={
+            "email": f"{name}@example.com",
+            "username": name,
+            "password": f"{name}-test-password",
+            "full_name": name.title(),
+        },
+    )
+    return response.json()["access_token"]
+
+
+async def stream_ticket(client, headers) -> str:
+    """Tickets are short-lived, so each batch of streams gets a fresh one"""
+    response = await client.post("/notifications/stream/ticket", headers=headers)
+    response.raise_for_status()
+    return response.json()["ticket"]
+
+
+async def run(count: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120) as client:
+        host = {"Authorization": f"Bearer {await register(client, 'host')}"}
+        listener = {"Authorization": f"Bearer {await register(client, 'listener')}"}
+
+        print(f"\n1. idle ({count} streams)")
+        start = time.perf_counter()
+        streams = await open_streams(await stream_ticket(client, listener), count)
+        print(f"  opened in {time.perf_counter() - start:.1f}s")
+        print(f"  server reports {await open_count(client)} open streams")
+        print(f"  /ping p50 {await timed_get(client, '/ping'):.1f} ms")
+        unread_ms = await timed_get(client, "/notifications/unread-count", listener)
+        print(f"  /notifications/unread-count p50 {unread_ms:.1f} ms")
+
+        print("\n2. push")
+        group = await client.post("/groups", json={"name": "Stream test"}, headers=host)
+        start = time.perf_counter()
+        response = await client.post(
+            f"/groups/{group.json()['id']}/invite",
+            json={"user_email": "listener@example.com"},
+            headers=host,
+        )
+        response.raise_for_status()
+        delays = []
+        for stream in streams:
+            await stream.received.wait()
+            delays.append((time.perf_counter() - start) * 1000)
+        print(
+            f"  invite reached {len(delays)} streams: first after {min(delays):.0f} ms, "
+            f"all after {max(delays):.0f} ms"
+        )
+
+        print("\n3. disconnects")
+        half = len(streams) // 2
+        for stream in streams[:half]:
+            stream.drop()
+        remaining = len(streams) - half
+        waited = await wait_for_count(client, remaining)
+        print(
+            f"  dropped {half}: server reports {await open_count(client)} open "
+            f"(expected {remaining}) after {waited:.1f}s"
+        )
+
+        ticket = await stream_ticket(client, listener)
+        early = [Stream(ticket) for _ in range(EARLY_DISCONNECTS)]
+        await asyncio.gather(*(stream.open(read=False) for stream in early))
+        for stream in early:
+            stream.drop()
+        await asyncio.sleep(2)
+        waited = await wait_for_count(client, remaining)
+        print(
+            f"  {EARLY_DISCONNECTS} dropped before the response: server reports "
+            f"{await open_count(client)} open (expected {remaining})"
+        )
+
+        for stream in streams[half:]:
+            stream.drop()
+        await wait_for_count(client, 0)
+        print(f"  all dropped: server reports {await open_count(client)} open")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'streams.db')}",
+        GEMINI_API_KEY="fake-key",
+        LLM_QUEUE_BACKEND="inline",
+    )
+    processes = start_api(env, "inline")
+    try:
+        asyncio.run(run(count))
+    finally:
+        stop_api(processes)
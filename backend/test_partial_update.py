@@ -0,0 +1,156 @@
+"""
+Latency and token report for targeted itinerary updates
+Runs the API with uvicorn against the fake Gemini server, which takes time
+in proportion to the tokens it writes, and stores itineraries of several
+lengths. Each gets updates through PUT /itinerary/{id}: targeted ones
+("change day 2 dinner", "change day 1 and 2", "change day 2 to 3 relaxing
+activities") and one that needs the whole trip regenerated. Prints the latency of each and the prompt and output tokens
+Gemini was asked for (from the fake's /_stats), and checks that the structured
+day/activity rows and counters match the stored document afterwards - a
+targeted update rewrites only its days' rows. Uses a temporary SQLite
+database:
+    python test_partial_update.py [output tokens per second]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_gemini_server import make_itinerary, serve_fake_gemini
+from test_llm_workers import BASE_URL, start_api, stop_api
+
+TRIP_LENGTHS = (3, 7, 14)
+UPDATES = (
+    "Change the dinner on day 2 to a rooftop restaurant",
+    "Change day 1 and 2 to start later",
+    # "to 3" counts activities here, not days - only day 2 is regenerated
+    "Change day 2 to 3 relaxing activities",
+    "Make the whole trip more relaxed",
+)
+
+
+def seed(user_id: int, days: int) -> int:
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary
+    from services.itinerary_store_service import sync_itinerary_structure
+
+    document = make_itinerary(days)
+    db = SessionLocal()
+    try:
+        itinerary = Itinerary(
+            user_id=user_id,
+            title=f"{days} days in Shillong",
+            destination="Shillong",
+            start_date="2026-11-01",
+            end_date=f"2026-11-{days:02d}",
+            budget=50000,
+            itinerary_data=json.dumps(document),
+        )
+        db.add(itinerary)
+        db.flush()
+        sync_itinerary_structure(db, itinerary, document)
+        db.commit()
+        return itinerary.id
+    finally:
+        db.close()
+
+
+def check_rows(itinerary_id: int):
+    """The itinerary's day rows and counters agree with its stored document"""
+    from models.database import SessionLocal
+    from models.itinerary import Itinerary, ItineraryDay
+    from services.itinerary_store_service import get_itinerary_object, to_number
+
+    db = SessionLocal()
+    try:
+        itinerary = db.get(Itinerary, itinerary_id)
+        expected = {
+            day["day"]: (
+                len(day["activities"]),
+                sum(to_number(a.get("cost")) or 0.0 for a in day["activities"]),
+            )
+            for day in get_itinerary_object(itinerary.itinerary_data)["days"]
+        }
+        rows = {
+            row.day: (row.activity_count, row.total_cost)
+            for row in db.query(ItineraryDay).filter(
+                ItineraryDay.itinerary_id == itinerary_id
+            )
+        }
+        assert rows == expected, (rows, expected)
+        assert itinerary.total_activities == sum(n for n, _ in expected.values())
+        assert itinerary.total_cost == sum(c for _, c in expected.values())
+    finally:
+        db.close()
+
+
+async def fake_tokens(client, fake_url: str):
+    stats = (await client.get(f"{fake_url}/_stats")).json()
+    return stats["prompt_tokens"], stats["output_tokens"]
+
+
+async def run(fake_url: str):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=300) as client:
+        response = await client.post(
+            "/register",
+            json={
+                "email": "update@example.com",
+                "username": "update",
+                "password": "update-test-password",
+                "full_name": "Update Test",
+            },
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        user_id = (await client.get("/me", headers=headers)).json()["id"]
+
+        print(
+            f"\n  {'days':>4}  {'mode':<8} {'updated':<9} {'latency':>8} "
+            f"{'prompt tok':>10} {'output tok':>10}  request"
+        )
+        for days in TRIP_LENGTHS:
+            for update in UPDATES:
+                itinerary_id = seed(user_id, days)
+                before = await fake_tokens(client, fake_url)
+                start = time.perf_counter()
+                response = await client.put(
+                    f"/itinerary/{itinerary_id}",
+                    json={"itinerary_id": itinerary_id, "update_request": update},
+                    headers=headers,
+                )
+                seconds = time.perf_counter() - start
+                response.raise_for_status()
+                after = await fake_tokens(client, fake_url)
+                body = response.json()
+                check_rows(itinerary_id)
+                print(
+                    f"  {days:>4}  {body['update_mode']:<8} "
+                    f"{str(body['updated_days'] or 'all'):<9} {seconds:>7.2f}s "
+                    f"{after[0] - before[0]:>10} {after[1] - before[1]:>10}  {update}"
+                )
+
+
+if __name__ == "__main__":
+    speed = float(sys.argv[1]) if len(sys.argv) > 1 else 150
+    server, fake, fake_url = serve_fake_gemini(
+        latency=0.5, jitter=0, output_tokens_per_second=speed
+    )
+    print(f"Fake Gemini at {fake_url}: 0.5s per call + {speed:g} output tokens/s")
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'update.db')}"
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="fake-key",
+        GEMINI_API_ENDPOINT=fake_url,
+        LLM_QUEUE_BACKEND="inline",
+    )
+    processes = start_api(env, "inline")
+    try:
+        asyncio.run(run(fake_url))
+    finally:
+        stop_api(processes)
+        server.shutdown()
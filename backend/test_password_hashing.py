@@ -0,0 +1,95 @@
+"""
+Load test for password hashing
+Runs the API with uvicorn and sends a burst of concurrent /login requests
+while timing /ping every 50 ms. bcrypt runs on the bounded password pool, so
+logins queue there (or get a 503 past PASSWORD_HASH_MAX_QUEUE) while /ping
+stays fast. Uses a temporary SQLite database:
+    python test_password_hashing.py [logins]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from test_llm_workers import BASE_URL, start_api, stop_api
+
+USER = {
+    "email": "login@example.com",
+    "username": "login",
+    "password": "login-test-password",
+    "full_name": "Login Test",
+}
+
+
+def percentile(values, share: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+async def run_burst(logins: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=300) as client:
+        await client.post("/register", json=USER)
+        credentials = {"username": USER["username"], "password": USER["password"]}
+
+        pings = []
+        done = asyncio.Event()
+
+        async def ping():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/ping")
+                pings.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.05)
+
+        async def login():
+            start = time.perf_counter()
+            response = await client.post("/login", json=credentials)
+            return response.status_code, (time.perf_counter() - start) * 1000
+
+        pinger = asyncio.create_task(ping())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await pinger
+        metrics = (await client.get("/metrics/password-hashing")).json()
+
+    ok = [ms for status, ms in results if status == 200]
+    busy = sum(1 for status, _ in results if status == 503)
+    print(f"  {len(ok)}/{logins} logins ok, {busy} turned away (503) in {elapsed:.1f}s")
+    if ok:
+        print(
+            f"  login latency: p50 {statistics.median(ok):.0f} ms, "
+            f"p95 {percentile(ok, 0.95):.0f} ms, max {max(ok):.0f} ms"
+        )
+    print(
+        f"  /ping over {len(pings)} calls: p50 {statistics.median(pings):.0f} ms, "
+        f"p95 {percentile(pings, 0.95):.0f} ms, max {max(pings):.0f} ms"
+    )
+    print(
+        f"  pool: {metrics['workers']} workers, bcrypt {metrics['bcrypt_rounds']} "
+        f"rounds, max queue depth {metrics['max_queue_depth']}, "
+        f"avg wait {metrics['avg_wait_ms']} ms, avg run {metrics['avg_run_ms']} ms"
+    )
+
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'login.db')}",
+        GEMINI_API_KEY="fake-key",
+        LLM_QUEUE_BACKEND="inline",
+    )
+    print(f"{logins} concurrent logins")
+    processes = start_api(env, "inline")
+    try:
+        asyncio.run(run_burst(logins))
+    finally:
+        stop_api(processes)
@@ -0,0 +1,221 @@
+"""
+Benchmark for progress summaries
+Runs the API with uvicorn against a temporary SQLite database holding a
+20-member group itinerary of 200 activities (20 days of 10). Every member
+marks half of the days done with POST /activity/progress/day, then single
+activities are toggled with POST /activity/progress, and
+GET /activity/progress/{id} is timed with and without the per-activity
+details. The summary read is compared in this process with the old way -
+loading every ActivityProgress row of the itinerary and counting in Python -
+and checked against it:
+    python test_progress_summary.py [members] [days] [activities per day]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from test_llm_workers import BASE_URL, start_api, stop_api
+
+ROUNDS = 20
+
+
+def seed_group(user_ids, days: int, per_day: int) -> int:
+    """A group of the users with one group itinerary; returns its id"""
+    from models.database import SessionLocal
+    from models.group import GroupMember, TravelGroup
+    from models.itinerary import Itinerary
+    from services.itinerary_store_service import sync_itinerary_structure
+
+    document = {
+        "message": "Benchmark group itinerary",
+        "itinerary": {
+            "destination": "Shillong",
+            "days": [
+                {
+                    "day": day + 1,
+                    "theme": f"Day {day + 1}",
+                    "activities": [
+                        {"time": "09:00", "activity": f"Place {day}-{index}", "cost": 300}
+                        for index in range(per_day)
+                    ],
+                }
+                for day in range(days)
+            ],
+        },
+    }
+
+    db = SessionLocal()
+    try:
+        group = TravelGroup(name="Benchmark group", creator_id=user_ids[0])
+        db.add(group)
+        db.flush()
+        db.add_all(
+            GroupMember(
+                group_id=group.id,
+                user_id=user_id,
+                role="creator" if position == 0 else "member",
+            )
+            for position, user_id in enumerate(user_ids)
+        )
+        itinerary = Itinerary(
+            user_id=user_ids[0],
+            title="Benchmark group trip",
+            destination="Shillong",
+            is_group=1,
+            group_id=group.id,
+            itinerary_data=json.dumps(document),
+        )
+        db.add(itinerary)
+        db.flush()
+        sync_itinerary_structure(db, itinerary, document)
+        db.commit()
+        return itinerary.id
+    finally:
+        db.close()
+
+
+def old_progress(itinerary_id: int, user_id: int):
+    """Completed counts as get_activity_progress used to compute them"""
+    from models.database import SessionLocal
+    from models.progress import ActivityProgress
+
+    db = SessionLocal()
+    try:
+        records = (
+            db.query(ActivityProgress)
+            .filter(ActivityProgress.itinerary_id == itinerary_id)
+            .all()
+        )
+        completed = sum(1 for p in records if p.completed == 1)
+        user_completed = sum(
+            1 for p in records if p.completed == 1 and p.user_id == user_id
+        )
+        return completed, user_completed
+    finally:
+        db.close()
+
+
+async def timed(client, method: str, url: str, rounds: int = ROUNDS, **kwargs):
+    times = []
+    response = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return statistics.median(times), response
+
+
+async def run(members: int, days: int, per_day: int):
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60) as client:
+        tokens = []
+        for number in range(members):
+            response = await client.post(
+                "/register",
+                json={
+                    "email": f"member{number}@example.com",
+                    "username": f"member{number}",
+                    "password": "member-test-password",
+                    "full_name": f"Member {number}",
+                },
+            )
+            tokens.append(response.json()["access_token"])
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        user_ids = [
+            (await client.get("/me", headers=member)).json()["id"]
+            for member in headers
+        ]
+        itinerary_id = seed_group(user_ids, days, per_day)
+        print(
+            f"  {members} members, {days} days x {per_day} activities "
+            f"({days * per_day} activities)"
+        )
+
+        day_times = []
+        for member in headers:
+            for day in range(1, days + 1, 2):
+                start = time.perf_counter()
+                response = await client.post(
+                    "/activity/progress/day",
+                    json={"itinerary_id": itinerary_id, "day": day, "completed": True},
+                    headers=member,
+                )
+                response.raise_for_status()
+                day_times.append((time.perf_counter() - start) * 1000)
+        print(
+            f"  POST /activity/progress/day x {len(day_times)}: "
+            f"p50 {statistics.median(day_times):.1f} ms"
+        )
+
+        toggle_times = []
+        for round_number in range(ROUNDS):
+            start = time.perf_counter()
+            response = await client.post(
+                "/activity/progress",
+                json={
+                    "itinerary_id": itinerary_id,
+                    "day": 2,
+                    "activity_index": 0,
+                    "completed": round_number % 2 == 0,
+                },
+                headers=headers[0],
+            )
+            response.raise_for_status()
+            toggle_times.append((time.perf_counter() - start) * 1000)
+        print(
+            f"  POST /activity/progress x {ROUNDS}: "
+            f"p50 {statistics.median(toggle_times):.1f} ms"
+        )
+
+        url = f"/activity/progress/{itinerary_id}"
+        summary_ms, summary = await timed(client, "GET", url, headers=headers[0])
+        details_ms, details = await timed(
+            client, "GET", url, params={"include_details": "true"}, headers=headers[0]
+        )
+        print(f"  GET {url}: p50 {summary_ms:.1f} ms ({len(summary.content)} bytes)")
+        print(
+            f"  GET {url}?include_details=true: p50 {details_ms:.1f} ms "
+            f"({len(details.content)} bytes)"
+        )
+
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        counts = old_progress(itinerary_id, user_ids[0])
+        times.append((time.perf_counter() - start) * 1000)
+    print(
+        f"  old way, counting every progress row in Python: "
+        f"p50 {statistics.median(times):.1f} ms"
+    )
+
+    summary = summary.json()
+    expected = (summary["completed_activities"], summary["user_completed_activities"])
+    print(
+        f"  summary {expected} vs counted {counts}: "
+        f"{'match' if expected == counts else 'MISMATCH'}"
+    )
+
+
+if __name__ == "__main__":
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    per_day = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'progress.db')}"
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY="fake-key",
+        LLM_QUEUE_BACKEND="inline",
+    )
+    processes = start_api(env, "inline")
+    try:
+        asyncio.run(run(members, days, per_day))
+    finally:
+        stop_api(processes)
@@ -0,0 +1,201 @@
+"""
+Test script for concurrent progress writes
+Calls the progress route handlers from many threads at once, each with its own
+session, against a temporary SQLite database (or DATABASE_URL if set, e.g. a
+Postgres test database), and checks:
+    toggles       members toggling the same activities concurrently leave
+                  every ProgressSummary equal to a recount of the rows
+    first insert  threads marking the same never-touched activity at once
+                  all succeed - no unique-index violation
+    stale sync    an offline change older than the server's copy is
+                  reported as rejected and not counted as applied
+    python test_progress_writes.py [threads] [toggles per thread]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'writes.db')}"
+
+from sqlalchemy import func
+
+from models.database import Base, SessionLocal, engine
+from models.group import GroupMember, TravelGroup
+from models.itinerary import Itinerary
+from models.progress import ActivityProgress, ProgressSummary
+from models.schemas import ActivityProgressUpdate, ProgressSyncRequest
+from models.user import User
+from routes.progress import sync_activity_progress, update_activity_progress
+from services.itinerary_store_service import sync_itinerary_structure
+
+MEMBERS = 3
+DAYS = 2
+PER_DAY = 4
+
+
+def seed() -> tuple:
+    """A group itinerary and its members; returns (itinerary id, user ids)"""
+    Base.metadata.create_all(bind=engine)
+    document = {
+        "itinerary": {
+            "destination": "Shillong",
+            "days": [
+                {
+                    "day": day + 1,
+                    "activities": [
+                        {"activity": f"Place {day}-{index}"} for index in range(PER_DAY)
+                    ],
+                }
+                for day in range(DAYS)
+            ],
+        }
+    }
+    db = SessionLocal()
+    try:
+        users = [
+            User(email=f"writer{n}@example.com", username=f"writer{n}")
+            for n in range(MEMBERS)
+        ]
+        db.add_all(users)
+        db.flush()
+        group = TravelGroup(name="Writers", creator_id=users[0].id)
+        db.add(group)
+        db.flush()
+        db.add_all(GroupMember(group_id=group.id, user_id=u.id) for u in users)
+        itinerary = Itinerary(
+            user_id=users[0].id,
+            title="Concurrent trip",
+            is_group=1,
+            group_id=group.id,
+            itinerary_data=json.dumps(document),
+        )
+        db.add(itinerary)
+        db.flush()
+        sync_itinerary_structure(db, itinerary, document)
+        db.commit()
+        return itinerary.id, [u.id for u in users]
+    finally:
+        db.close()
+
+
+def toggle(itinerary_id: int, user_id: int, day: int, index: int, completed: bool):
+    """One POST /activity/progress, in its own session as a request would be"""
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        update = ActivityProgressUpdate(
+            itinerary_id=itinerary_id,
+            day=day,
+            activity_index=index,
+            completed=completed,
+        )
+        asyncio.run(update_activity_progress(update, user, db))
+    finally:
+        db.close()
+
+
+def run_threads(jobs):
+    """Run each list of toggle() argument tuples on its own thread"""
+    errors = []
+    start = threading.Barrier(len(jobs))
+
+    def worker(calls):
+        start.wait()
+        for args in calls:
+            try:
+                toggle(*args)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=worker, args=(calls,)) for calls in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def check_summaries(itinerary_id: int):
+    db = SessionLocal()
+    try:
+        counted = dict(
+            db.query(ActivityProgress.user_id, func.sum(ActivityProgress.completed))
+            .filter(ActivityProgress.itinerary_id == itinerary_id)
+            .group_by(ActivityProgress.user_id)
+            .all()
+        )
+        summaries = {
+            s.user_id: s.completed_activities
+            for s in db.query(ProgressSummary).filter(
+                ProgressSummary.itinerary_id == itinerary_id
+            )
+        }
+        rows = (
+            db.query(func.count(ActivityProgress.id))
+            .filter(ActivityProgress.itinerary_id == itinerary_id)
+            .scalar()
+        )
+    finally:
+        db.close()
+    for user_id, completed in counted.items():
+        assert summaries.get(user_id) == int(completed or 0), (summaries, counted)
+    return summaries, rows
+
+
+def check_stale_sync(itinerary_id: int, user_id: int):
+    """A device syncing edits made before the server's last toggle"""
+    toggle(itinerary_id, user_id, 2, 0, True)
+    before = datetime.utcnow() - timedelta(hours=1)
+    changes = [
+        {"day": 2, "activity_index": 0, "completed": False, "client_timestamp": before},
+        {"day": 2, "activity_index": 1, "completed": True, "client_timestamp": before},
+    ]
+    db = SessionLocal()
+    try:
+        sync = ProgressSyncRequest(itinerary_id=itinerary_id, changes=changes)
+        result = asyncio.run(sync_activity_progress(sync, db.get(User, user_id), db))
+    finally:
+        db.close()
+    assert result["applied"] == 1, result["applied"]
+    assert [(r["day"], r["activity_index"]) for r in result["rejected"]] == [(2, 0)]
+    check_summaries(itinerary_id)
+    print("Stale sync: 1 applied, the change older than the server's rejected")
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    toggles = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    itinerary_id, user_ids = seed()
+
+    # Every thread hammers the same few activities of one member, with
+    # completed flipping so deltas of both signs race
+    jobs = [
+        [
+            (itinerary_id, user_ids[n % MEMBERS], 1, i % 2, (n + i) % 2 == 0)
+            for i in range(toggles)
+        ]
+        for n in range(threads)
+    ]
+    errors = run_threads(jobs)
+    assert not errors, errors[:3]
+    summaries, rows = check_summaries(itinerary_id)
+    print(
+        f"Toggles: {threads} threads x {toggles} on the same activities, "
+        f"summaries {summaries} match the rows"
+    )
+
+    jobs = [[(itinerary_id, user_ids[0], 2, PER_DAY - 1, True)] for _ in range(threads)]
+    errors = run_threads(jobs)
+    assert not errors, errors[:3]
+    summaries, after = check_summaries(itinerary_id)
+    assert after == rows + 1, (rows, after)
+    print(f"First insert: {threads} threads marked a new activity, one row, no errors")
+
+    check_stale_sync(itinerary_id, user_ids[1])
@@ -0,0 +1,175 @@
+"""
+Test script for the review crawler against local fixture pages
+Serves fixtures/reviews/ on localhost (with simulated network latency) and
+scrapes it the way the crawler scrapes real sites, without network access.
+
+HTTP fetcher: sequential fetching with html.parser vs the async fetcher
+(cold, then from its disk cache), plus parser timings.
+Browser (needs Chrome and chromedriver, skipped otherwise): a fresh browser
+for every place, one at a time, vs the warm pool scraping concurrently.
+Prints pages per minute:
+    python test_review_crawler.py [places] [pool size]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from selenium.common.exceptions import WebDriverException
+
+from services.browser_pool import BrowserPool, chrome_options
+from services.review_fetcher import ReviewFetcher
+from services.review_parsers import (
+    parse_google_maps_reviews,
+    parse_tripadvisor_reviews,
+)
+from services.similarity_search_service import PlaceReviewCrawler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "reviews")
+# Added to every response, roughly a real site's time to first byte
+FIXTURE_LATENCY_SECONDS = 0.2
+
+# URL prefix -> fixture page
+ROUTES = {
+    "/maps/search/": "google_maps_search.html",
+    "/maps/place/": "google_maps_place.html",
+    "/tripadvisor/": "tripadvisor_place.html",
+}
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def translate_path(self, path):
+        for prefix, page in ROUTES.items():
+            if path.startswith(prefix):
+                return os.path.join(FIXTURES_DIR, page)
+        return super().translate_path(path)
+
+    def end_headers(self):
+        time.sleep(FIXTURE_LATENCY_SECONDS)
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures():
+    """Start the fixture server on a free port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_http_fetch(base_url: str, place_count: int):
+    urls = [f"{base_url}/tripadvisor/place-{i}" for i in range(place_count)]
+
+    start = time.perf_counter()
+    reviews = []
+    with httpx.Client() as client:
+        for url in urls:
+            html = client.get(url).text
+            reviews += parse_tripadvisor_reviews(html, 20, parser="html.parser")
+    elapsed = time.perf_counter() - start
+    print(
+        f"  sequential, html.parser: {len(reviews)} reviews in {elapsed:.2f}s "
+        f"-> {len(urls) / elapsed * 60:.0f} pages/min"
+    )
+
+    async def fetch_all(fetcher):
+        return await fetcher.fetch_tripadvisor_reviews(urls, 20)
+
+    cache_dir = tempfile.mkdtemp()
+    for label in ("async fetcher, cold", "async fetcher, cached"):
+        fetcher = ReviewFetcher(cache_dir=cache_dir)
+        start = time.perf_counter()
+        reviews = asyncio.run(fetch_all(fetcher))
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {label}: {len(reviews)} reviews in {elapsed:.2f}s "
+            f"-> {len(urls) / elapsed * 60:.0f} pages/min {fetcher.stats}"
+        )
+        asyncio.run(fetcher.close())
+    assert len(reviews) == place_count * 20, len(reviews)
+
+    for name, parse in (
+        (
+            "google_maps_place.html",
+            lambda html, parser: parse_google_maps_reviews(html, "p", "l", 40, parser),
+        ),
+        (
+            "tripadvisor_place.html",
+            lambda html, parser: parse_tripadvisor_reviews(html, 20, parser),
+        ),
+    ):
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            html = f.read()
+        timings = []
+        for parser in ("html.parser", "lxml"):
+            start = time.perf_counter()
+            for _ in range(20):
+                parse(html, parser)
+            timings.append(
+                f"{parser} {(time.perf_counter() - start) / 20 * 1000:.1f} ms"
+            )
+        print(f"  parse {name}: " + ", ".join(timings))
+
+
+def run_browser_scrape(base_url: str, places, pool: BrowserPool, concurrent: bool):
+    crawler = PlaceReviewCrawler(
+        pool=pool, maps_base_url=base_url, store_path=tempfile.mkdtemp()
+    )
+    start = time.perf_counter()
+    if concurrent:
+        reviews = crawler.scrape_places(places, max_reviews=40)
+    else:
+        reviews = []
+        for place, location in places:
+            reviews += crawler.scrape_google_maps_reviews(place, location, 40)
+    elapsed = time.perf_counter() - start
+    crawler.close()
+    # Each place is two page loads: the search and the place
+    pages = len(places) * 2
+    print(
+        f"  {len(reviews)} reviews, {pages} pages in {elapsed:.1f}s "
+        f"-> {pages / elapsed * 60:.0f} pages/min"
+    )
+    return reviews
+
+
+if __name__ == "__main__":
+    place_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    pool_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    places = [(f"place {i}", "Fixture City") for i in range(place_count)]
+    server, base_url = serve_fixtures()
+    print(f"Serving {FIXTURES_DIR} at {base_url}")
+
+    print(f"\nHTTP fetch of {place_count} TripAdvisor pages:")
+    run_http_fetch(base_url, place_count)
+
+    pool = BrowserPool(size=pool_size, options=chrome_options())
+    try:
+        pool.warm()
+    except WebDriverException as e:
+        print(f"\nChrome not available, skipping the browser comparison: {e.msg}")
+        server.shutdown()
+        sys.exit(0)
+
+    print("\nFresh browser per place, one place at a time:")
+    run_browser_scrape(
+        base_url, places, BrowserPool(size=1, max_pages=1), concurrent=False
+    )
+
+    print(f"\nWarm pool of {pool_size} browsers, places scraped concurrently:")
+    reviews = run_browser_scrape(base_url, places, pool, concurrent=True)
+
+    # Every place page holds 40 reviews; the waits must have loaded them all
+    assert len(reviews) == place_count * 40, len(reviews)
+    print("\nAll fixture reviews loaded")
+    server.shutdown()
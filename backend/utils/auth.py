@@ -1,12 +1,26 @@
 import jwt
 import bcrypt
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from models.database import get_db
 from models.user import User
-from utils.config import SECRET_KEY, ALGORITHM
+from utils.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    STREAM_TICKET_SECONDS,
+    BCRYPT_TARGET_MS,
+    BCRYPT_MIN_ROUNDS,
+    BCRYPT_MAX_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_QUEUE,
+)
 
 # Security
 security = HTTPBearer()
@@ -19,20 +33,54 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    token = credentials.credentials
+def decode_access_token(token: str) -> int:
+    """Validate a JWT and return the user id it was issued for"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("user_id")
-        if user_id is None:
+        # Stream tickets are signed with the same key but aren't logins
+        if user_id is None or "purpose" in payload:
             raise HTTPException(status_code=401, detail="Invalid authentication")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return user_id
+
+
+def create_stream_ticket(user_id: int, scope: str) -> dict:
+    """
+    Short-lived ticket that opens one kind of event stream (scope, e.g.
+    "notifications" or "itinerary:12"). EventSource can't send headers, so
+    the ticket goes in the URL instead of the access token.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TICKET_SECONDS)
+    ticket = jwt.encode(
+        {"user_id": user_id, "purpose": "stream", "scope": scope, "exp": expire},
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_SECONDS}
+
+
+def decode_stream_ticket(ticket: str, scope: str) -> int:
+    """Validate a stream ticket for scope and return its user id"""
+    try:
+        payload = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Stream ticket has expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    if payload.get("purpose") != "stream" or payload.get("scope") != scope:
+        raise HTTPException(status_code=401, detail="Invalid stream ticket")
+    return payload["user_id"]
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    user_id = decode_access_token(credentials.credentials)
 
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
@@ -41,6 +89,109 @@ def get_current_user(
     return user
 
 
+# Password hashing
+# bcrypt is deliberately slow, so hashing/verification runs on a dedicated,
+# size-limited thread pool instead of blocking the event loop.
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+# The cost hashes were made with before calibration; never go below it
+BCRYPT_FLOOR_ROUNDS = 12
+bcrypt_rounds = BCRYPT_FLOOR_ROUNDS
+# Calibration times this many hashes at a cheap cost and takes the median
+CALIBRATION_ROUNDS = 8
+CALIBRATION_SAMPLES = 5
+
+_hash_stats_lock = threading.Lock()
+_hash_stats = {
+    "queued": 0,  # submitted but not yet picked up by a worker
+    "running": 0,
+    "completed": 0,
+    "rejected": 0,
+    "max_queue_depth": 0,
+    "total_wait_ms": 0.0,
+    "total_run_ms": 0.0,
+}
+
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time stays within target_ms on this host.
+    Each extra round doubles the work, so we time a cheap cost a few times and
+    extrapolate instead of hashing at every candidate cost. The median of the
+    samples keeps the result steady across restarts, and the cost never goes
+    below BCRYPT_FLOOR_ROUNDS.
+    """
+    global bcrypt_rounds
+
+    sample = b"calibration-password"
+    timings = []
+    for _ in range(CALIBRATION_SAMPLES):
+        start = time.perf_counter()
+        bcrypt.hashpw(sample, bcrypt.gensalt(rounds=CALIBRATION_ROUNDS))
+        timings.append((time.perf_counter() - start) * 1000)
+    sample_ms = statistics.median(timings)
+
+    rounds = max(BCRYPT_MIN_ROUNDS, BCRYPT_FLOOR_ROUNDS)
+    elapsed_ms = sample_ms * 2 ** (rounds - CALIBRATION_ROUNDS)
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed_ms * 2 <= target_ms:
+        elapsed_ms *= 2
+        rounds += 1
+
+    bcrypt_rounds = rounds
+    print(
+        f"bcrypt cost calibrated to {rounds} rounds (~{elapsed_ms:.0f} ms per hash, target {target_ms:.0f} ms)"
+    )
+    return rounds
+
+
+def get_password_hash_stats() -> dict:
+    """Snapshot of the password hashing pool for health/metrics endpoints"""
+    with _hash_stats_lock:
+        stats = dict(_hash_stats)
+    completed = stats["completed"] or 1
+    stats["avg_wait_ms"] = round(stats.pop("total_wait_ms") / completed, 2)
+    stats["avg_run_ms"] = round(stats.pop("total_run_ms") / completed, 2)
+    stats["workers"] = PASSWORD_HASH_WORKERS
+    stats["max_queue"] = PASSWORD_HASH_MAX_QUEUE
+    stats["bcrypt_rounds"] = bcrypt_rounds
+    return stats
+
+
+async def _run_in_password_pool(func, *args):
+    """Run a bcrypt call on the password pool, rejecting when the queue is full"""
+    with _hash_stats_lock:
+        if _hash_stats["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+            _hash_stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please try again",
+            )
+        _hash_stats["queued"] += 1
+        _hash_stats["max_queue_depth"] = max(
+            _hash_stats["max_queue_depth"], _hash_stats["queued"]
+        )
+
+    submitted_at = time.perf_counter()
+
+    def job():
+        started_at = time.perf_counter()
+        with _hash_stats_lock:
+            _hash_stats["queued"] -= 1
+            _hash_stats["running"] += 1
+            _hash_stats["total_wait_ms"] += (started_at - submitted_at) * 1000
+        try:
+            return func(*args)
+        finally:
+            with _hash_stats_lock:
+                _hash_stats["running"] -= 1
+                _hash_stats["completed"] += 1
+                _hash_stats["total_run_ms"] += (time.perf_counter() - started_at) * 1000
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, job)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password using bcrypt"""
     try:
@@ -56,6 +207,25 @@ def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
     # Ensure password is not longer than 72 bytes (bcrypt limitation)
     password_bytes = password[:72].encode("utf-8")
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=bcrypt_rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode("utf-8")
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash was made with a lower cost than the current one"""
+    try:
+        # bcrypt hashes look like $2b$12$<salt+hash>
+        return int(hashed_password.split("$")[2]) < bcrypt_rounds
+    except (IndexError, ValueError, AttributeError):
+        return False
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool"""
+    return await _run_in_password_pool(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the password pool"""
+    return await _run_in_password_pool(hash_password, password)
@@ -0,0 +1,201 @@
+"""
+Text compression for large columns
+Itinerary JSON and chat messages are stored as zstd frames. Itinerary JSON is
+very repetitive across documents ("activity", "coordinates", "duration", city
+names...), so a dictionary trained on existing itineraries compresses even
+small documents well. Values below COMPRESSION_MIN_BYTES are stored as plain
+UTF-8, and rows written before compression (plain TEXT) still read back fine.
+
+New values are compressed with the dictionary at ZSTD_DICTIONARY_PATH. Every
+trained dictionary is also kept next to it as itinerary.<dict_id>.zstd.dict,
+and all of them are loaded, so rows written with an older dictionary still
+read back after retraining.
+
+Train a dictionary from the current database and compress existing rows with:
+    python -m utils.compression train
+    python -m utils.compression compact
+"""
+
+import os
+import sys
+import glob
+import json
+import threading
+from typing import Dict, Optional, Union
+
+import zstandard as zstd
+
+from utils.config import ZSTD_LEVEL, ZSTD_DICTIONARY_PATH, COMPRESSION_MIN_BYTES
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DICTIONARY_SIZE = 32 * 1024
+
+_dictionary: Optional[zstd.ZstdCompressionDict] = None  # used for new values
+_dictionaries: Dict[int, zstd.ZstdCompressionDict] = {}  # every known dict_id
+_local = threading.local()  # zstd (de)compressor objects aren't thread-safe
+
+
+def dictionary_path(dict_id: int, path: str = ZSTD_DICTIONARY_PATH) -> str:
+    """Where the dictionary with dict_id is kept, next to the current one"""
+    return os.path.join(os.path.dirname(path), f"itinerary.{dict_id}.zstd.dict")
+
+
+def _read_dictionary(path: str) -> zstd.ZstdCompressionDict:
+    with open(path, "rb") as f:
+        return zstd.ZstdCompressionDict(f.read())
+
+
+def load_dictionary(path: str = ZSTD_DICTIONARY_PATH):
+    global _dictionary
+    _dictionaries.clear()
+    pattern = dictionary_path("*", path)
+    for older_path in sorted(glob.glob(pattern)):
+        dictionary = _read_dictionary(older_path)
+        _dictionaries[dictionary.dict_id()] = dictionary
+
+    if os.path.exists(path):
+        _dictionary = _read_dictionary(path)
+        _dictionaries[_dictionary.dict_id()] = _dictionary
+        print(
+            f"Loaded zstd dictionary {_dictionary.dict_id()} from {path} "
+            f"({len(_dictionaries)} known)"
+        )
+    else:
+        _dictionary = None
+    # This thread's compressor was built with the previous dictionary
+    _local.__dict__.clear()
+
+
+def _compressor() -> zstd.ZstdCompressor:
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstd.ZstdCompressor(
+            level=ZSTD_LEVEL, dict_data=_dictionary, write_content_size=True
+        )
+    return _local.compressor
+
+
+def _decompressor(dict_id: int) -> zstd.ZstdDecompressor:
+    if not hasattr(_local, "decompressors"):
+        _local.decompressors = {}
+    decompressor = _local.decompressors.get(dict_id)
+    if decompressor is None:
+        if dict_id == 0:
+            decompressor = zstd.ZstdDecompressor()
+        elif dict_id in _dictionaries:
+            decompressor = zstd.ZstdDecompressor(dict_data=_dictionaries[dict_id])
+        else:
+            raise ValueError(
+                f"Value was compressed with zstd dictionary {dict_id}, which is not "
+                f"loaded (expected at {dictionary_path(dict_id)})"
+            )
+        _local.decompressors[dict_id] = decompressor
+    return decompressor
+
+
+def compress_text(value: str) -> bytes:
+    data = value.encode("utf-8")
+    if len(data) < COMPRESSION_MIN_BYTES:
+        # A UTF-8 string can't start with the zstd magic bytes
+        return data
+    return _compressor().compress(data)
+
+
+def decompress_text(value: Union[bytes, memoryview, str]) -> str:
+    if isinstance(value, str):
+        return value  # written before the column was compressed
+    data = bytes(value)
+    if not data.startswith(ZSTD_MAGIC):
+        return data.decode("utf-8")
+    dict_id = zstd.get_frame_parameters(data).dict_id
+    return _decompressor(dict_id).decompress(data).decode("utf-8")
+
+
+def train_dictionary(samples, path: str = ZSTD_DICTIONARY_PATH) -> int:
+    """Train a dictionary from itinerary JSON samples and write it to path"""
+    sample_bytes = []
+    for sample in samples:
+        # Days are the repeating unit - train on them as well as whole documents
+        sample_bytes.append(sample.encode("utf-8"))
+        try:
+            document = json.loads(sample)
+        except ValueError:
+            continue
+        itinerary_obj = document.get("itinerary", document)
+        for day in itinerary_obj.get("days", []):
+            sample_bytes.append(json.dumps(day, ensure_ascii=False).encode("utf-8"))
+
+    dictionary = zstd.train_dictionary(DICTIONARY_SIZE, sample_bytes)
+    # Keep the dictionary being replaced - existing rows still need it
+    if os.path.exists(path):
+        current = _read_dictionary(path)
+        older_path = dictionary_path(current.dict_id(), path)
+        if not os.path.exists(older_path):
+            with open(older_path, "wb") as f:
+                f.write(current.as_bytes())
+    for target in (dictionary_path(dictionary.dict_id(), path), path):
+        with open(target, "wb") as f:
+            f.write(dictionary.as_bytes())
+    print(
+        f"Trained zstd dictionary {dictionary.dict_id()} on {len(sample_bytes)} samples -> {path}"
+    )
+    return dictionary.dict_id()
+
+
+load_dictionary()
+
+
+if __name__ == "__main__":
+    from sqlalchemy import text
+    from sqlalchemy.orm.attributes import flag_modified
+    from models.database import (
+        SessionLocal,
+        engine,
+        add_missing_columns,
+        convert_compressed_columns,
+    )
+    from models.itinerary import Itinerary
+    from models.conversation import Message
+    from services.collaboration_service import link_message_to_itinerary
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    db = SessionLocal()
+    try:
+        if command == "train":
+            rows = db.execute(text("SELECT itinerary_data FROM itineraries")).all()
+            samples = [decompress_text(row[0]) for row in rows if row[0] is not None]
+            train_dictionary(samples)
+        elif command == "compact":
+            # The models may have columns this database doesn't have yet, and
+            # Postgres needs BYTEA before compressed values can be written
+            add_missing_columns(engine)
+            convert_compressed_columns(engine)
+
+            # Messages that still hold a copy of their itinerary's current
+            # version reference it instead
+            linked = 0
+            for itinerary in db.query(Itinerary).all():
+                messages = db.query(Message).filter(
+                    Message.conversation_id == itinerary.conversation_id,
+                    Message.role == "assistant",
+                    Message.itinerary_id.is_(None),
+                )
+                for message in messages:
+                    if message.content == itinerary.itinerary_data:
+                        link_message_to_itinerary(message, itinerary)
+                        linked += 1
+            db.commit()
+            print(f"Linked {linked} messages to their itinerary")
+
+            # Rewrite every value so it is stored with the current dictionary
+            for model, column in ((Itinerary, "itinerary_data"), (Message, "content")):
+                count = 0
+                for row in db.query(model).all():
+                    if getattr(row, column) is not None:
+                        flag_modified(row, column)
+                        count += 1
+                db.commit()
+                print(f"Recompressed {count} {model.__tablename__} rows")
+        else:
+            print("Usage: python -m utils.compression [train|compact]")
+    finally:
+        db.close()
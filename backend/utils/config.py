@@ -12,8 +12,172 @@ if DATABASE_URL.startswith("postgres://"):
 
 # Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Optional Gemini endpoint - an API gateway, or a local fake server for load
+# tests (fake_gemini_server.py). Calls then go over REST instead of gRPC
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
+# Server-Sent Events streams authenticate with a ticket in the URL, which
+# lands in access logs, so it is short-lived and only opens one stream
+STREAM_TICKET_SECONDS = int(os.getenv("STREAM_TICKET_SECONDS", "60"))
+
+# Password hashing - bcrypt work runs on a bounded thread pool, cost is
+# calibrated at startup so a single hash takes roughly BCRYPT_TARGET_MS, but
+# never less than 12 rounds. Login only rehashes passwords to a higher cost
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "12"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "14"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "200"))
+
+# Trips of at least LONG_TRIP_DAYS days are generated as a skeleton plus
+# parallel chunks of ITINERARY_CHUNK_DAYS days
+LONG_TRIP_DAYS = int(os.getenv("LONG_TRIP_DAYS", "8"))
+ITINERARY_CHUNK_DAYS = int(os.getenv("ITINERARY_CHUNK_DAYS", "4"))
+ITINERARY_CHUNK_CONCURRENCY = int(os.getenv("ITINERARY_CHUNK_CONCURRENCY", "3"))
+
+# Real-time notifications - "local" pushes within this process only,
+# "postgres" fans out through LISTEN/NOTIFY for multi-worker deployments
+NOTIFICATION_FANOUT = os.getenv("NOTIFICATION_FANOUT", "local")
+
+# Large text columns (itinerary JSON, chat messages) are stored zstd-compressed.
+# The dictionary is trained on itinerary JSON and must stay deployed as long as
+# rows compressed with it exist (see utils/compression.py)
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "10"))
+ZSTD_DICTIONARY_PATH = os.getenv("ZSTD_DICTIONARY_PATH", "./itinerary.zstd.dict")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "256"))
+
+# Sentence embedding model (services/embedding_models.py), loaded once per
+# process on first use. EMBEDDING_BACKEND is torch, int8 (dynamically quantized)
+# or onnx. paraphrase-multilingual-MiniLM-L12-v2 is a smaller, faster
+# multilingual alternative (384 dimensions - it needs its own review store)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-mpnet-base-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Concurrent encode calls are micro-batched (services/embedding_service.py):
+# a batch closes after EMBEDDING_MAX_WAIT_MS or EMBEDDING_BATCH_SIZE texts.
+# EMBEDDING_WORKERS > 0 shards batches across that many processes, each
+# loading its own model copy - only worth it with spare cores and memory
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+
+# Review embeddings for semantic search (services/review_embedding_store.py)
+REVIEW_STORE_PATH = os.getenv("REVIEW_STORE_PATH", "./review_store")
+REVIEW_EMBEDDING_DTYPE = os.getenv("REVIEW_EMBEDDING_DTYPE", "float16")
+# IVF index (services/review_ann_index.py): built once the store has
+# REVIEW_ANN_MIN_ROWS reviews; each query scans its REVIEW_ANN_NPROBE nearest
+# clusters. Filters matching at most REVIEW_ANN_EXACT_FILTER_ROWS rows are
+# searched exactly
+REVIEW_ANN_MIN_ROWS = int(os.getenv("REVIEW_ANN_MIN_ROWS", "50000"))
+REVIEW_ANN_NPROBE = int(os.getenv("REVIEW_ANN_NPROBE", "16"))
+REVIEW_ANN_EXACT_FILTER_ROWS = int(os.getenv("REVIEW_ANN_EXACT_FILTER_ROWS", "20000"))
+
+# Review crawler: warm Chrome instances shared across places, each recycled
+# after BROWSER_MAX_PAGES pages; waits for page elements time out after
+# SCRAPE_WAIT_SECONDS
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+SCRAPE_WAIT_SECONDS = float(os.getenv("SCRAPE_WAIT_SECONDS", "10"))
+
+# Plain-HTTP review fetching (services/review_fetcher.py) for pages that don't
+# need a browser. Responses are cached on disk for REVIEW_HTTP_CACHE_TTL
+# seconds, then revalidated. REVIEW_HTML_PARSER falls back to html.parser
+# when lxml isn't installed
+REVIEW_HTTP_CACHE_DIR = os.getenv("REVIEW_HTTP_CACHE_DIR", "./review_http_cache")
+REVIEW_HTTP_CACHE_TTL = float(os.getenv("REVIEW_HTTP_CACHE_TTL", "86400"))
+REVIEW_FETCH_PER_HOST = int(os.getenv("REVIEW_FETCH_PER_HOST", "4"))
+REVIEW_FETCH_MAX_CONNECTIONS = int(os.getenv("REVIEW_FETCH_MAX_CONNECTIONS", "20"))
+REVIEW_FETCH_RETRIES = int(os.getenv("REVIEW_FETCH_RETRIES", "3"))
+REVIEW_FETCH_TIMEOUT = float(os.getenv("REVIEW_FETCH_TIMEOUT", "15"))
+REVIEW_HTML_PARSER = os.getenv("REVIEW_HTML_PARSER", "lxml")
+
+# Background review ingestion (services/review_ingestion.py): destinations
+# people plan trips to are crawled and embedded every
+# REVIEW_INGEST_INTERVAL_MINUTES, at most REVIEW_INGEST_BATCH per run, and
+# refreshed after REVIEW_REFRESH_DAYS. Itinerary requests only do a top-k
+# lookup, abandoned after REVIEW_LOOKUP_TIMEOUT_MS
+REVIEW_INGESTION_ENABLED = os.getenv("REVIEW_INGESTION_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+REVIEW_INGEST_INTERVAL_MINUTES = int(os.getenv("REVIEW_INGEST_INTERVAL_MINUTES", "30"))
+REVIEW_INGEST_BATCH = int(os.getenv("REVIEW_INGEST_BATCH", "3"))
+REVIEW_INGEST_CATEGORIES = [
+    c.strip()
+    for c in os.getenv(
+        "REVIEW_INGEST_CATEGORIES", "tourist attractions,restaurants,hotels"
+    ).split(",")
+    if c.strip()
+]
+REVIEW_INGEST_MAX_REVIEWS = int(os.getenv("REVIEW_INGEST_MAX_REVIEWS", "40"))
+REVIEW_REFRESH_DAYS = int(os.getenv("REVIEW_REFRESH_DAYS", "30"))
+REVIEW_SNIPPETS_TOP_K = int(os.getenv("REVIEW_SNIPPETS_TOP_K", "8"))
+REVIEW_LOOKUP_TIMEOUT_MS = float(os.getenv("REVIEW_LOOKUP_TIMEOUT_MS", "300"))
+
+# Destination knowledge (services/destination_knowledge.py): places seen in
+# at least DESTINATION_POI_MIN_MENTIONS itineraries are offered to the model,
+# at most DESTINATION_PROMPT_POIS of them; lookups are cached in-process for
+# DESTINATION_KNOWLEDGE_TTL seconds. Coordinates further than
+# DESTINATION_POI_CONFLICT_KM from a place's mean count as conflicting
+DESTINATION_POI_MIN_MENTIONS = int(os.getenv("DESTINATION_POI_MIN_MENTIONS", "2"))
+DESTINATION_PROMPT_POIS = int(os.getenv("DESTINATION_PROMPT_POIS", "30"))
+DESTINATION_KNOWLEDGE_TTL = float(os.getenv("DESTINATION_KNOWLEDGE_TTL", "600"))
+DESTINATION_POI_CONFLICT_KM = float(os.getenv("DESTINATION_POI_CONFLICT_KM", "5"))
+
+# Cost analytics (services/cost_analytics.py): a day is flagged when it costs
+# more than DAY_OVERRUN_FACTOR x its even share of the budget, and the
+# model's total_estimated_cost when it is off from the activity costs by more
+# than COST_MISMATCH_RATIO
+DAY_OVERRUN_FACTOR = float(os.getenv("DAY_OVERRUN_FACTOR", "1.25"))
+COST_MISMATCH_RATIO = float(os.getenv("COST_MISMATCH_RATIO", "0.1"))
+
+# LLM workers (services/llm_jobs.py): Gemini calls run outside the web
+# process. LLM_QUEUE_BACKEND is "process" (LLM_WORKERS processes started with
+# the app), "database" (jobs in the llm_jobs table, run by
+# python -m services.llm_jobs, polled every LLM_POLL_INTERVAL_MS) or "inline"
+# (in the web process, as before). Each worker runs up to
+# LLM_WORKER_CONCURRENCY calls at once; with LLM_MAX_PENDING jobs in flight
+# new ones are turned away with a 503
+LLM_QUEUE_BACKEND = os.getenv("LLM_QUEUE_BACKEND", "process")
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "2"))
+LLM_WORKER_CONCURRENCY = int(os.getenv("LLM_WORKER_CONCURRENCY", "8"))
+LLM_MAX_PENDING = int(os.getenv("LLM_MAX_PENDING", "100"))
+LLM_JOB_TIMEOUT_SECONDS = float(os.getenv("LLM_JOB_TIMEOUT_SECONDS", "300"))
+LLM_POLL_INTERVAL_MS = float(os.getenv("LLM_POLL_INTERVAL_MS", "100"))
+
+# Gemini call pacing (services/llm_scheduler.py): a token bucket of
+# LLM_RATE_LIMIT calls per second (0 = unlimited) with bursts of
+# LLM_RATE_BURST. 429/503 responses halve the rate, down to LLM_RATE_MIN,
+# and the job is queued again up to LLM_THROTTLE_RETRIES times
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "2"))
+LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "5"))
+LLM_RATE_MIN = float(os.getenv("LLM_RATE_MIN", "0.1"))
+LLM_THROTTLE_RETRIES = int(os.getenv("LLM_THROTTLE_RETRIES", "3"))
+
+# Circuit breaker around Gemini (services/llm_breaker.py). Over the last
+# LLM_BREAKER_WINDOW_SECONDS, once at least LLM_BREAKER_MIN_CALLS calls have
+# finished, it opens when LLM_BREAKER_FAILURE_RATE of them failed or
+# LLM_BREAKER_SLOW_RATE took longer than LLM_BREAKER_SLOW_SECONDS, or the
+# last LLM_BREAKER_MIN_CALLS all did either. Open, LLM calls fail at once for
+# LLM_BREAKER_OPEN_SECONDS, then LLM_BREAKER_PROBES jobs are let through to
+# test it. GEMINI_TIMEOUT_SECONDS bounds each call
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", "60"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "90"))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_PROBES = int(os.getenv("LLM_BREAKER_PROBES", "2"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+
+# HTTP responses at least this large are gzip/brotli compressed when the
+# client accepts it
+RESPONSE_COMPRESSION_MIN_BYTES = int(
+    os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")
+)
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
 
 # Validate API key
 if not GEMINI_API_KEY:
@@ -0,0 +1,197 @@
+"""
+HTTP caching and response compression
+Strong ETags with If-None-Match support so clients that already have the
+current representation get an empty 304, and a middleware that gzip/brotli
+compresses large JSON responses depending on the client's Accept-Encoding.
+A compressed body is a different representation, so its ETag gets the coding
+appended ("…-gzip"); If-None-Match accepts either form.
+"""
+
+import gzip
+import hashlib
+import re
+from typing import Any, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from utils.json_repair import dumps_compact
+from utils.config import (
+    RESPONSE_COMPRESSION_MIN_BYTES,
+    GZIP_LEVEL,
+    BROTLI_QUALITY,
+)
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Clients must revalidate, but may keep the copy and send If-None-Match
+CACHE_CONTROL = "private, no-cache"
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+CODING_SUFFIX = re.compile(r'-(?:gzip|br)"$')
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8"))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak validators match too for If-None-Match (RFC 9110 weak comparison),
+    # and so do the ETags CompressionMiddleware gave the compressed bodies
+    candidates = {
+        CODING_SUFFIX.sub('"', tag.strip().removeprefix("W/"))
+        for tag in header.split(",")
+    }
+    return etag in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def cached_json_response(
+    request: Request, content: Any, etag: Optional[str] = None
+) -> Response:
+    """
+    JSON response with an ETag; 304 if the client already has it. Without an
+    explicit etag it is the hash of the serialized body.
+    """
+    body = dumps_compact(jsonable_encoder(content)).encode("utf-8")
+    if etag is None:
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def encoded_etag(etag: bytes, encoding: str) -> bytes:
+    """ETag of the body compressed with encoding: "abc" -> "abc-gzip" """
+    if not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + f'-{encoding}"'.encode("latin-1")
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compress single-body responses (JSONResponse and friends) with brotli or
+    gzip. Streaming responses such as Server-Sent Events pass through untouched
+    so events aren't held back in a compression buffer.
+    """
+
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = _choose_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1")
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = headers.get(b"if-none-match", b"")
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            response_headers = {k.lower(): v for k, v in start.get("headers", [])}
+            etag = response_headers.get(b"etag")
+            if start["status"] == 304 and etag:
+                # Confirm the compressed copy with the ETag the client holds
+                if encoded_etag(etag, encoding) in if_none_match:
+                    start = dict(
+                        start,
+                        headers=[
+                            (
+                                k,
+                                (
+                                    encoded_etag(v, encoding)
+                                    if k.lower() == b"etag"
+                                    else v
+                                ),
+                            )
+                            for k, v in start.get("headers", [])
+                        ],
+                    )
+            content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or b"content-encoding" in response_headers
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+            new_headers = [
+                (k, v)
+                for k, v in start.get("headers", [])
+                if k.lower() not in (b"content-length", b"vary", b"etag")
+            ]
+            if etag:
+                new_headers.append((b"etag", encoded_etag(etag, encoding)))
+            vary = response_headers.get(b"vary", b"")
+            new_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (
+                    b"vary",
+                    (vary + b", Accept-Encoding") if vary else b"Accept-Encoding",
+                ),
+            ]
+            await send(dict(start, headers=new_headers))
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,125 @@
+"""
+Minimal JSON Patch (RFC 6902) support for itinerary documents
+Only the add / remove / replace operations are produced and applied, which is
+all that's needed to describe edits between two versions of an itinerary.
+"""
+
+import copy
+import re
+
+# An array index in a JSON Pointer: no sign, no leading zeros (RFC 6901)
+ARRAY_INDEX = re.compile(r"0|[1-9][0-9]*")
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old, new, path: str = "") -> list:
+    """Compute the operations that turn old into new"""
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(make_patch(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            ops.extend(make_patch(old[i], new[i], f"{path}/{i}"))
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        # Remove from the end so earlier indexes stay valid
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _list_index(token: str, path: str) -> int:
+    if not ARRAY_INDEX.fullmatch(token):
+        raise JsonPatchError(f"Invalid array index {token!r} in {path}")
+    return int(token)
+
+
+def _resolve_parent(doc, path: str):
+    if not path.startswith("/"):
+        raise JsonPatchError(f"Invalid patch path: {path!r}")
+    tokens = [_unescape(t) for t in path[1:].split("/")]
+    parent = doc
+    for token in tokens[:-1]:
+        try:
+            if isinstance(parent, list):
+                parent = parent[_list_index(token, path)]
+            else:
+                parent = parent[token]
+        except JsonPatchError:
+            raise
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise JsonPatchError(f"Path not found: {path}")
+    return parent, tokens[-1]
+
+
+def apply_patch(doc, ops: list):
+    """Apply operations to a copy of doc and return it"""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        kind = op.get("op")
+        path = op.get("path", "")
+
+        if path == "":
+            if kind not in ("add", "replace"):
+                raise JsonPatchError("Cannot remove the document root")
+            doc = copy.deepcopy(op.get("value"))
+            continue
+
+        parent, token = _resolve_parent(doc, path)
+        try:
+            if isinstance(parent, list):
+                index = len(parent) if token == "-" else _list_index(token, path)
+                if kind == "add":
+                    if index > len(parent):
+                        raise IndexError
+                    parent.insert(index, copy.deepcopy(op["value"]))
+                elif kind == "replace":
+                    parent[index] = copy.deepcopy(op["value"])
+                elif kind == "remove":
+                    del parent[index]
+                else:
+                    raise JsonPatchError(f"Unsupported patch op: {kind!r}")
+            elif isinstance(parent, dict):
+                if kind in ("add", "replace"):
+                    if kind == "replace" and token not in parent:
+                        raise KeyError
+                    parent[token] = copy.deepcopy(op["value"])
+                elif kind == "remove":
+                    del parent[token]
+                else:
+                    raise JsonPatchError(f"Unsupported patch op: {kind!r}")
+            else:
+                raise JsonPatchError(f"Path not found: {path}")
+        except JsonPatchError:
+            raise
+        except (KeyError, IndexError, ValueError):
+            raise JsonPatchError(f"Cannot apply {kind} at {path}")
+    return doc
@@ -0,0 +1,237 @@
+"""
+Tolerant JSON parsing for LLM output
+parse_llm_json() parses a model response once and hands back both the object
+and its canonical serialization, instead of the old extract / regex-clean /
+loads / dumps / loads chain. Well-formed JSON takes the fast path (a single
+parse); anything else gets one repair scan for the failure modes we see from
+Gemini, then a single parse:
+- markdown code fences and text around the JSON
+- stray quotes before keys, e.g. {"lat": 1, " "lng": 2}
+- trailing commas before } or ]
+- raw newlines inside strings
+- truncated output (unterminated strings, dangling keys, unclosed brackets)
+orjson is used for parsing and serializing when it is installed.
+"""
+
+import json
+import re
+from typing import Any, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+_NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?")
+_PARTIAL_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+_LITERALS = {"true", "false", "null"}
+_DELIMITERS = set(' \t\r\n,:{}[]"')
+_WHITESPACE = re.compile(r"[ \t\r\n]+")
+_LIST_OF_OBJECTS = re.compile(r"\[[ \t\r\n]*\{")
+_STRING_SPECIAL = re.compile(r'["\\\n\r\t]')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class JsonRepairError(ValueError):
+    def __init__(self, msg: str, pos: int = 0):
+        super().__init__(f"{msg} at position {pos}")
+        self.msg = msg
+        self.pos = pos
+
+
+def _loads(text: str):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps_compact(obj) -> str:
+    """Canonical compact serialization used for storage"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _strip_wrappers(text: str, top_level: type = dict) -> Tuple[str, str]:
+    """
+    Drop BOM, markdown fences and any prose before the JSON. For an object,
+    the JSON starts at the first { so brackets in the prose ("Here is your
+    [updated] plan: {...}") are skipped - unless a [ before it opens a list
+    of objects, which callers accept too. For a list, at the first [.
+    """
+    text = text.strip("﻿\x00 \t\r\n")
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1 :] if newline != -1 else ""
+    brace, bracket = text.find("{"), text.find("[")
+    if brace == -1 and bracket == -1:
+        raise JsonRepairError("No JSON object found", 0)
+    if top_level is list:
+        start = bracket if bracket != -1 else brace
+    elif brace == -1 or (
+        0 <= bracket < brace and _LIST_OF_OBJECTS.match(text, bracket)
+    ):
+        start = bracket
+    else:
+        start = brace
+    text = text[start:]
+    # Fast path needs the end trimmed too; the repair scan stops by itself
+    end = text.rfind("}" if text[0] == "{" else "]")
+    return text, (text[: end + 1] if end != -1 else text)
+
+
+def _is_key_position(tokens: list, stack: list) -> bool:
+    return (
+        bool(stack) and stack[-1] == "}" and bool(tokens) and tokens[-1] in ("{", ",")
+    )
+
+
+def _drop_dangling(tokens: list, stack: list):
+    """Remove an incomplete trailing member left by truncated output"""
+    while tokens:
+        last = tokens[-1]
+        if last in (",", ":"):
+            tokens.pop()
+            if last == ":" and tokens:
+                tokens.pop()  # the key that had no value
+            continue
+        if last.startswith('"') and len(tokens) >= 2 and tokens[-2] in ("{", ","):
+            # A string right after { or , inside an object is a key without value
+            if stack and stack[-1] == "}":
+                tokens.pop()
+                continue
+        break
+
+
+def repair_json(text: str) -> str:
+    """Single scan that rewrites common LLM JSON damage into valid JSON text"""
+    tokens = []
+    stack = []
+    i = 0
+    n = len(text)
+
+    while i < n:
+        c = text[i]
+
+        if c in " \t\r\n":
+            i = _WHITESPACE.match(text, i).end()
+            continue
+
+        if c == '"':
+            # Stray quote before a key: {"lat": 1, " "lng": 2}
+            if _is_key_position(tokens, stack):
+                k = i + 1
+                while k < n and text[k] in " \t\r\n":
+                    k += 1
+                if k > i + 1 and k + 1 < n and text[k] == '"':
+                    if text[k + 1] not in ' \t\r\n:"':
+                        i = k
+                        continue
+
+            j = i + 1
+            buf = ['"']
+            while j < n:
+                # Copy plain runs in one go; stop at quotes, escapes and raw
+                # control characters
+                special = _STRING_SPECIAL.search(text, j)
+                if special is None:
+                    buf.append(text[j:])
+                    j = n
+                    break
+                k = special.start()
+                if k > j:
+                    buf.append(text[j:k])
+                j = k
+                ch = text[j]
+                if ch == "\\":
+                    if j + 1 < n:
+                        buf.append(text[j : j + 2])
+                    j += 2
+                    continue
+                if ch == '"':
+                    break
+                buf.append(_CONTROL_ESCAPES[ch])
+                j += 1
+            truncated = j >= n
+            string = "".join(buf)
+            if truncated:
+                string = _PARTIAL_ESCAPE.sub("", string)
+            string += '"'
+            i = j + 1
+
+            if truncated and _is_key_position(tokens, stack):
+                break  # truncated inside a key - nothing usable
+            tokens.append(string)
+            if truncated:
+                break
+            continue
+
+        if c in "{[":
+            tokens.append(c)
+            stack.append("}" if c == "{" else "]")
+            i += 1
+            continue
+
+        if c in "}]":
+            i += 1
+            if c not in stack:
+                continue  # unmatched closer - ignore it
+            while stack:
+                closer = stack.pop()
+                _drop_dangling(tokens, stack + [closer])
+                tokens.append(closer)
+                if closer == c:
+                    break
+            if not stack:
+                break  # document complete; ignore trailing text/fences
+            continue
+
+        if c in ",:":
+            tokens.append(c)
+            i += 1
+            continue
+
+        # Bare literal: number, true/false/null, or garbage
+        j = i
+        while j < n and text[j] not in _DELIMITERS:
+            j += 1
+        literal = text[i:j]
+        i = j
+        if literal in _LITERALS or _NUMBER.fullmatch(literal):
+            tokens.append(literal)
+        elif i >= n:
+            break  # truncated literal at the end - dropped below
+        else:
+            tokens.append("null")
+
+    # Close whatever truncation left open
+    while stack:
+        closer = stack.pop()
+        _drop_dangling(tokens, stack + [closer])
+        tokens.append(closer)
+
+    return "".join(tokens)
+
+
+def parse_llm_json(text: str, top_level: type = dict) -> Tuple[Any, str]:
+    """
+    Parse a model response into (object, canonical compact JSON string).
+    top_level is the type the response should hold (dict or list), used to
+    find where the JSON starts. Raises JsonRepairError if the text can't be
+    turned into JSON.
+    """
+    if not isinstance(text, str):
+        raise JsonRepairError("Expected a string", 0)
+
+    scan_text, trimmed = _strip_wrappers(text, top_level)
+
+    try:
+        obj = _loads(trimmed)
+    except ValueError:
+        repaired = repair_json(scan_text)
+        try:
+            obj = json.loads(repaired)
+        except json.JSONDecodeError as e:
+            raise JsonRepairError(e.msg, e.pos)
+
+    return obj, dumps_compact(obj)
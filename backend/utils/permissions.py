@@ -0,0 +1,130 @@
+import threading
+import time
+from typing import Optional, Set
+from fastapi import Depends, HTTPException
+from sqlalchemy.orm import Session
+from models.database import get_db
+from models.user import User
+from models.itinerary import Itinerary
+from models.group import GroupMember
+from utils.auth import get_current_user
+from services.notification_hub import notification_hub
+
+# Group memberships per user, cached so the "owner or group member" check on
+# itinerary/progress routes doesn't hit group_members on every request.
+# Writers that change membership call invalidate_user_groups(), which reaches
+# every worker through the notification hub (with NOTIFICATION_FANOUT=postgres);
+# the TTL bounds staleness when it can't. A group the cached set lacks is
+# re-read before access is denied, so joining a group takes effect at once.
+MEMBERSHIP_CACHE_TTL_SECONDS = 60
+MEMBERSHIP_CHANGED = "membership_changed"
+
+_membership_cache = {}  # user_id -> (expires_at, frozenset of group ids)
+_membership_lock = threading.Lock()
+
+
+def _cached_group_ids(user_id: int) -> Optional[Set[int]]:
+    """The user's group ids if the cache has them fresh, else None"""
+    with _membership_lock:
+        cached = _membership_cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+    return None
+
+
+def _load_group_ids(db: Session, user_id: int) -> Set[int]:
+    """Read the user's group ids from the database and cache them"""
+    now = time.monotonic()
+    group_ids = frozenset(
+        group_id
+        for (group_id,) in db.query(GroupMember.group_id).filter(
+            GroupMember.user_id == user_id
+        )
+    )
+    with _membership_lock:
+        _membership_cache[user_id] = (now + MEMBERSHIP_CACHE_TTL_SECONDS, group_ids)
+    return group_ids
+
+
+def get_user_group_ids(db: Session, user_id: int) -> Set[int]:
+    """Group ids the user belongs to, served from cache when fresh"""
+    cached = _cached_group_ids(user_id)
+    if cached is not None:
+        return cached
+    return _load_group_ids(db, user_id)
+
+
+def _drop_cached_groups(user_id: int, event: Optional[dict] = None):
+    with _membership_lock:
+        _membership_cache.pop(user_id, None)
+
+
+def invalidate_user_groups(user_id: int):
+    """
+    Drop a user's cached memberships, in every worker, after they join or
+    leave a group. Call it after the change is committed.
+    """
+    _drop_cached_groups(user_id)
+    notification_hub.publish(user_id, {"type": MEMBERSHIP_CHANGED})
+
+
+notification_hub.on_event(MEMBERSHIP_CHANGED, _drop_cached_groups)
+
+
+def can_access_itinerary(db: Session, itinerary: Itinerary, user_id: int) -> bool:
+    """Owner, or member of the group the itinerary is shared with"""
+    if itinerary.user_id == user_id:
+        return True
+    if not (itinerary.is_group and itinerary.group_id):
+        return False
+    cached = _cached_group_ids(user_id)
+    if cached is not None and itinerary.group_id in cached:
+        return True
+    # Not cached, or cached before the user joined (maybe on another worker):
+    # the database has the final say before access is denied
+    return itinerary.group_id in _load_group_ids(db, user_id)
+
+
+def require_itinerary_access(
+    db: Session,
+    itinerary_id: int,
+    user: User,
+    denied_status: int = 403,
+) -> Itinerary:
+    """
+    Load an itinerary and check the user may see it.
+    Raises 404 if missing and denied_status (403, or 404 to hide it) otherwise.
+    """
+    itinerary = db.query(Itinerary).filter(Itinerary.id == itinerary_id).first()
+    if not itinerary:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+
+    # Owners never touch group_members; group members read their memberships
+    # once, after which the check is the itinerary query alone until the TTL.
+    # A miss costs a second query rather than an EXISTS joined to this one,
+    # because it loads every membership and serves the next requests too
+    has_access = can_access_itinerary(db, itinerary, user.id)
+    if not has_access:
+        if denied_status == 404:
+            raise HTTPException(status_code=404, detail="Itinerary not found")
+        raise HTTPException(status_code=denied_status, detail="Access denied")
+
+    return itinerary
+
+
+def get_accessible_itinerary(
+    itinerary_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Itinerary:
+    """Dependency for routes with an itinerary_id path parameter"""
+    return require_itinerary_access(db, itinerary_id, current_user)
+
+
+def get_visible_itinerary(
+    itinerary_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Itinerary:
+    """Like get_accessible_itinerary but answers 404 instead of 403"""
+    return require_itinerary_access(db, itinerary_id, current_user, denied_status=404)
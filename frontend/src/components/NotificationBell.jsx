@@ -12,8 +12,72 @@ export default function NotificationBell({ darkMode = true }) {
 
   useEffect(() => {
     fetchUnreadCount();
-    const interval = setInterval(fetchUnreadCount, 30000);
-    return () => clearInterval(interval);
+
+    // Prefer the server push stream; fall back to polling if it's unavailable
+    const token = localStorage.getItem("token");
+    let interval = null;
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchUnreadCount, 30000);
+    };
+
+    // The stream URL carries a short-lived ticket, not the login token, so
+    // every (re)connect asks for a fresh one
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = (await api.post("/notifications/stream/ticket")).data.ticket;
+      } catch (error) {
+        startPolling();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(
+        `${api.defaults.baseURL}/notifications/stream?ticket=${encodeURIComponent(ticket)}`
+      );
+      source.addEventListener("unread_count", (e) => {
+        setUnreadCount(JSON.parse(e.data).count);
+      });
+      source.addEventListener("notification_created", (e) => {
+        const { notification } = JSON.parse(e.data);
+        setUnreadCount((count) => count + 1);
+        setNotifications((prev) => [notification, ...prev]);
+      });
+      source.addEventListener("notification_updated", () => {
+        fetchUnreadCount();
+      });
+      source.onerror = () => {
+        // A browser reconnect would reuse the expired ticket
+        source.close();
+        startPolling();
+        if (!retry) {
+          retry = setTimeout(() => {
+            retry = null;
+            connect();
+          }, 10000);
+        }
+      };
+      source.onopen = () => {
+        if (interval) clearInterval(interval);
+        interval = null;
+      };
+    };
+
+    if (token && typeof EventSource !== "undefined") {
+      connect();
+    } else {
+      startPolling();
+    }
+
+    return () => {
+      closed = true;
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+      if (retry) clearTimeout(retry);
+    };
   }, []);
 
   useEffect(() => {
@@ -200,7 +200,7 @@ const ItineraryDisplay = ({ content, darkMode, openMapModal }) => {
                         )}
                       </div>
                       <div className="text-xs font-medium text-gray-400 flex-shrink-0">
-                        ₹{activity.cost}
+                        {activity.cost_text || `₹${activity.cost ?? 0}`}
                       </div>
                     </div>
                   </div>
@@ -295,6 +295,8 @@ export default function ChatPage() {
         conversation_id,
         response: aiResponse,
         query_rejected,
+        itinerary_conflict,
+        itinerary_error,
       } = response.data;
 
       if (!conversationId) {
@@ -316,6 +318,12 @@ export default function ChatPage() {
           "warning"
         );
       }
+      if (itinerary_conflict) {
+        showToast(itinerary_conflict, "warning");
+      }
+      if (itinerary_error) {
+        showToast(itinerary_error, "warning");
+      }
     } catch (error) {
       console.error("Error sending message:", error);
       const errorMsg = error.response?.data?.detail || "Failed to send message";
@@ -140,7 +140,7 @@ export default function ItineraryPage() {
 
   const fetchProgress = async () => {
     try {
-      const response = await api.get(`/activity/progress/${id}`);
+      const response = await api.get(`/activity/progress/${id}?include_details=true`);
       setProgress(response.data);
     } catch {
       console.error("Failed to load progress");
@@ -344,7 +344,7 @@ export default function ItineraryPage() {
                                 {activity.time} - {activity.activity}
                               </p>
                               <p className="text-xs font-medium text-gray-400 whitespace-nowrap">
-                                ₹{activity.cost.toLocaleString("en-IN")}
+                                {activity.cost_text || `₹${(activity.cost ?? 0).toLocaleString("en-IN")}`}
                               </p>
                             </div>
                             <div className="flex items-center gap-2 mb-1">
@@ -380,7 +380,7 @@ export default function ItineraryPage() {
                     <p className="text-gray-500">{day.activities.length} activities</p>
                     <p className="font-medium text-gray-400">
                       Daily Total: ₹
-                      {day.activities.reduce((sum, act) => sum + act.cost, 0).toLocaleString("en-IN")}
+                      {day.activities.reduce((sum, act) => sum + (act.cost || 0), 0).toLocaleString("en-IN")}
                     </p>
                   </div>
                 </div>